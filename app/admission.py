@@ -0,0 +1,193 @@
+"""Admission control for purchases, so overload is refused early instead of queued forever.
+
+A machine dispenses one order at a time. Without a limit, purchases arriving
+while a slow dispense is running pile up in the threadpool and time out. Each of
+them has already taken a worker thread and possibly a database session.
+:class:`AdmissionMiddleware` sits in front of the purchase route. It lets
+``settings.admission_concurrency`` purchases run at once and holds the rest in a
+bounded queue:
+
+* Requests from ``settings.admission_kiosk_hosts`` (the touch screen on the
+  machine itself) are ``kiosk`` priority and are always admitted ahead of
+  queued ``remote`` callers, such as the mobile app.
+* Each class has its own queue bound. A purchase that finds its queue full gets
+  an immediate ``429 Too Many Requests``.
+* A queued purchase that is not admitted within
+  ``settings.admission_max_wait_seconds`` gets ``503 Service Unavailable``.
+
+Both carry ``Retry-After``, estimated from the queue ahead and the recent
+service time. Rejections never reach the route, so nothing was charged or
+dispensed, and the idempotency layer does not store them. Queue depth,
+counters and recent wait times are returned by :meth:`AdmissionController.state`
+and served at ``GET /admin/admission``. Everything runs on the event loop, so
+no locks are needed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import suppress
+from typing import Iterable
+
+from .asgi import send_json
+from .config import settings
+from .timing import record_phase
+
+PRIORITIES = ("kiosk", "remote")
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class AdmissionController:
+    """Bounded, prioritised admission of purchases on one machine."""
+
+    def __init__(
+        self,
+        concurrency: int | None = None,
+        queue_limits: dict[str, int] | None = None,
+        max_wait: float | None = None,
+        kiosk_hosts: Iterable[str] | None = None,
+    ) -> None:
+        self.concurrency = settings.admission_concurrency if concurrency is None else concurrency
+        self.queue_limits = queue_limits or {
+            "kiosk": settings.admission_kiosk_queue,
+            "remote": settings.admission_remote_queue,
+        }
+        self.max_wait = settings.admission_max_wait_seconds if max_wait is None else max_wait
+        self.kiosk_hosts = frozenset(settings.admission_kiosk_hosts if kiosk_hosts is None else kiosk_hosts)
+        self.in_flight = 0
+        # Recent service time, seeded with a typical dispense until real ones arrive.
+        self.service_seconds = 1.0
+        self._queues: dict[str, deque[asyncio.Future]] = {priority: deque() for priority in PRIORITIES}
+        self._waits: dict[str, deque[float]] = {priority: deque(maxlen=500) for priority in PRIORITIES}
+        self._counts = {priority: {"admitted": 0, "rejected": 0, "timed_out": 0} for priority in PRIORITIES}
+
+    def priority(self, scope) -> str:
+        client = scope.get("client")
+        return "kiosk" if client and client[0] in self.kiosk_hosts else "remote"
+
+    def retry_after(self, priority: str) -> int:
+        ahead = len(self._queues["kiosk"]) + (len(self._queues["remote"]) if priority == "remote" else 0)
+        return max(1, math.ceil((ahead + 1) * self.service_seconds / max(1, self.concurrency)))
+
+    async def acquire(self, priority: str) -> float:
+        """Wait for a slot; returns seconds queued or raises :class:`Rejected`."""
+        queue = self._queues[priority]
+        counts = self._counts[priority]
+        if self.in_flight < self.concurrency and not any(self._queues.values()):
+            self.in_flight += 1
+            return self._admitted(priority, 0.0)
+        if len(queue) >= self.queue_limits[priority]:
+            counts["rejected"] += 1
+            raise Rejected(429, "Machine busy; purchase queue is full", self.retry_after(priority))
+
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            with suppress(ValueError):
+                queue.remove(future)
+            if future.done() and not future.cancelled():
+                self.release()  # the slot was handed over just as the wait expired
+            counts["timed_out"] += 1
+            raise Rejected(503, "Machine busy; purchase was not admitted in time", self.retry_after(priority))
+        except asyncio.CancelledError:  # client went away while queued
+            with suppress(ValueError):
+                queue.remove(future)
+            if future.done() and not future.cancelled():
+                self.release()  # the slot was handed over just before the cancellation
+            raise
+        return self._admitted(priority, time.monotonic() - started)
+
+    def release(self, service_seconds: float | None = None) -> None:
+        """Free a slot, handing it straight to the next waiter, kiosk first."""
+        if service_seconds is not None:
+            self.service_seconds += 0.2 * (service_seconds - self.service_seconds)
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue:
+                future = queue.popleft()
+                if not future.done():
+                    future.set_result(None)
+                    return
+        self.in_flight -= 1
+
+    def state(self) -> dict:
+        classes = {}
+        for priority in PRIORITIES:
+            waits = list(self._waits[priority])
+            classes[priority] = {
+                **self._counts[priority],
+                "queued": len(self._queues[priority]),
+                "queue_limit": self.queue_limits[priority],
+                "wait_ms_p50": round(_percentile(waits, 0.5) * 1000, 1),
+                "wait_ms_p95": round(_percentile(waits, 0.95) * 1000, 1),
+                "wait_ms_max": round(max(waits, default=0.0) * 1000, 1),
+            }
+        return {
+            "in_flight": self.in_flight,
+            "concurrency": self.concurrency,
+            "max_wait_seconds": self.max_wait,
+            "service_ms": round(self.service_seconds * 1000, 1),
+            "classes": classes,
+        }
+
+    def _admitted(self, priority: str, waited: float) -> float:
+        self._counts[priority]["admitted"] += 1
+        self._waits[priority].append(waited)
+        return waited
+
+
+_controller: AdmissionController | None = None
+
+
+def get_admission() -> AdmissionController:
+    # Only touched from the event loop, so no lock is needed around creation.
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an :class:`AdmissionController` to POSTs on ``paths``."""
+
+    def __init__(self, app, paths: Iterable[str], controller: AdmissionController | None = None) -> None:
+        self.app = app
+        self.paths = frozenset(paths)
+        self.controller = controller or get_admission()
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        try:
+            waited = await self.controller.acquire(self.controller.priority(scope))
+        except Rejected as exc:
+            headers = [(b"retry-after", str(exc.retry_after).encode())]
+            await send_json(send, exc.status_code, {"detail": exc.detail}, headers)
+            return
+        record_phase("admission", waited)
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(time.monotonic() - started)
@@ -5,16 +5,20 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from ...dependencies import get_db_session
+from ...dependencies import get_db_session, get_read_db_session
 from ...schemas import (
     DeviceStateRead,
     DeviceStateUpdate,
+    DoorStateRead,
     InventoryAdjustment,
     ProductCreate,
     ProductRead,
     ProductUpdate,
+    ReconciliationReport,
 )
+from ...services.hardware import get_hardware
 from ...services.inventory import InventoryService
+from ...services.reconciliation import reconcile
 from ...services.tasks import DeviceService
 
 router = APIRouter()
@@ -31,7 +35,7 @@ def create_product(payload: ProductCreate, session: Session = Depends(get_db_ses
 
 
 @router.get("/products", response_model=list[ProductRead])
-def list_products(session: Session = Depends(get_db_session)):
+def list_products(session: Session = Depends(get_read_db_session)):
     service = InventoryService(session)
     return service.list_products(active_only=False)
 
@@ -56,6 +60,12 @@ def adjust_inventory(payload: InventoryAdjustment, session: Session = Depends(ge
     return product
 
 
+@router.post("/inventory/reconcile", response_model=ReconciliationReport)
+def reconcile_inventory(repair: bool = False):
+    # Reads from its own snapshot on the read pool; no request session needed.
+    return reconcile(repair=repair)
+
+
 @router.get("/device-state", response_model=DeviceStateRead)
 def read_device_state(session: Session = Depends(get_db_session)):
     service = DeviceService(session)
@@ -68,3 +78,9 @@ def update_device_state(payload: DeviceStateUpdate, session: Session = Depends(g
     service = DeviceService(session)
     state = service.set_lock(payload.door_locked)
     return state
+
+
+@router.get("/door", response_model=DoorStateRead)
+def read_door(limit: int = 20):
+    # Kept current by the sensor's edge callbacks; no database session needed.
+    return get_hardware().door.state(limit=limit)
@@ -0,0 +1,89 @@
+"""Async variants of the administrative routes backed by :class:`AsyncSession`."""
+
+from __future__ import annotations
+
+from anyio import to_thread
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...dependencies import get_async_db_session, get_async_read_db_session
+from ...schemas import (
+    DeviceStateRead,
+    DeviceStateUpdate,
+    DoorStateRead,
+    InventoryAdjustment,
+    ProductCreate,
+    ProductRead,
+    ProductUpdate,
+    ReconciliationReport,
+)
+from ...services.hardware import get_hardware
+from ...services.inventory import AsyncInventoryService
+from ...services.reconciliation import reconcile
+from ...services.tasks import AsyncDeviceService
+
+router = APIRouter()
+
+
+@router.post("/products", response_model=ProductRead, status_code=status.HTTP_201_CREATED)
+async def create_product(payload: ProductCreate, session: AsyncSession = Depends(get_async_db_session)):
+    service = AsyncInventoryService(session)
+    try:
+        product = await service.create_product(payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return product
+
+
+@router.get("/products", response_model=list[ProductRead])
+async def list_products(session: AsyncSession = Depends(get_async_read_db_session)):
+    service = AsyncInventoryService(session)
+    return await service.list_products(active_only=False)
+
+
+@router.patch("/products/{product_id}", response_model=ProductRead)
+async def update_product(
+    product_id: int, payload: ProductUpdate, session: AsyncSession = Depends(get_async_db_session)
+):
+    service = AsyncInventoryService(session)
+    try:
+        product = await service.update_product(product_id, payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+    return product
+
+
+@router.post("/inventory/adjust", response_model=ProductRead)
+async def adjust_inventory(payload: InventoryAdjustment, session: AsyncSession = Depends(get_async_db_session)):
+    service = AsyncInventoryService(session)
+    try:
+        product = await service.adjust_inventory(payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+    return product
+
+
+@router.post("/inventory/reconcile", response_model=ReconciliationReport)
+async def reconcile_inventory(repair: bool = False):
+    # Reads from its own snapshot on the read pool; no request session needed.
+    return await to_thread.run_sync(reconcile, repair)
+
+
+@router.get("/device-state", response_model=DeviceStateRead)
+async def read_device_state(session: AsyncSession = Depends(get_async_db_session)):
+    service = AsyncDeviceService(session)
+    state = await service.get_state()
+    return state
+
+
+@router.post("/device-state", response_model=DeviceStateRead)
+async def update_device_state(payload: DeviceStateUpdate, session: AsyncSession = Depends(get_async_db_session)):
+    service = AsyncDeviceService(session)
+    state = await service.set_lock(payload.door_locked)
+    return state
+
+
+@router.get("/door", response_model=DoorStateRead)
+async def read_door(limit: int = 20):
+    # Kept current by the sensor's edge callbacks; no database session needed. With a daemon it is a socket call.
+    return await to_thread.run_sync(get_hardware().door.state, limit)
@@ -1,38 +1,74 @@
-diff --git a//dev/null b/app/api/endpoints/analytics.py
-index 0000000000000000000000000000000000000000..69940434a46dc758020312f0436b33bc6e73b019 100644
---- a//dev/null
-+++ b/app/api/endpoints/analytics.py
-@@ -0,0 +1,33 @@
-+"""Endpoints providing analytics and reporting data."""
-+
-+from __future__ import annotations
-+
-+from fastapi import APIRouter, Depends
-+from sqlalchemy.orm import Session
-+
-+from ...dependencies import get_db_session
-+from ...schemas import InventoryTurnoverResponse, SaleSummary, TelemetryRead
-+from ...services.analytics import AnalyticsService
-+
-+router = APIRouter()
-+
-+
-+@router.get("/sales/summary", response_model=SaleSummary)
-+def sales_summary(days: int = 30, session: Session = Depends(get_db_session)):
-+    service = AnalyticsService(session)
-+    summary = service.sales_summary(days=days)
-+    return summary
-+
-+
-+@router.get("/telemetry/trend", response_model=list[TelemetryRead])
-+def telemetry_trend(hours: int = 24, session: Session = Depends(get_db_session)):
-+    service = AnalyticsService(session)
-+    telemetry = service.telemetry_trend(hours=hours)
-+    return telemetry
-+
-+
-+@router.get("/inventory/turnover", response_model=InventoryTurnoverResponse)
-+def inventory_turnover(days: int = 30, session: Session = Depends(get_db_session)):
-+    service = AnalyticsService(session)
-+    return service.inventory_turnover(days=days)
-+
+"""Endpoints providing analytics and reporting data."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ...dependencies import get_read_db_session
+from ...query_params import sales_query
+from ...schemas import (
+    InventoryTurnoverResponse,
+    RestockPlanResponse,
+    SaleSummary,
+    SalesQueryResponse,
+    TelemetryAlertState,
+    TelemetryRead,
+)
+from ...services.analytics import AnalyticsService
+from ...services.monitoring import get_monitor
+from ...services.retention import ExportDataset, export_rows, iter_csv
+from ...services.sales_columns import slice_sales
+
+router = APIRouter()
+
+
+@router.get("/sales/summary", response_model=SaleSummary)
+def sales_summary(days: int = 30, session: Session = Depends(get_read_db_session)):
+    service = AnalyticsService(session)
+    summary = service.sales_summary(days=days)
+    return summary
+
+
+@router.get("/sales/query", response_model=SalesQueryResponse)
+def query_sales(query: dict = Depends(sales_query)):
+    # Answered from the in-memory columnar copy of the sales table; no database session.
+    return slice_sales(**query)
+
+
+@router.get("/telemetry/trend", response_model=list[TelemetryRead])
+def telemetry_trend(hours: int = 24, session: Session = Depends(get_read_db_session)):
+    service = AnalyticsService(session)
+    telemetry = service.telemetry_trend(hours=hours)
+    return telemetry
+
+
+@router.get("/telemetry/alerts", response_model=TelemetryAlertState)
+def telemetry_alerts():
+    # Served from the in-process monitor; deliberately no database session.
+    return get_monitor().state()
+
+
+@router.get("/inventory/turnover", response_model=InventoryTurnoverResponse)
+def inventory_turnover(days: int = 30, session: Session = Depends(get_read_db_session)):
+    service = AnalyticsService(session)
+    return service.inventory_turnover(days=days)
+
+
+@router.get("/inventory/restock-plan", response_model=RestockPlanResponse)
+def restock_plan(
+    horizon_hours: int = Query(default=168, ge=1, le=672), session: Session = Depends(get_read_db_session)
+):
+    service = AnalyticsService(session)
+    return service.restock_plan(horizon_hours=horizon_hours)
+
+
+@router.get("/export/{dataset}")
+def export_dataset(dataset: ExportDataset, start: datetime | None = None, end: datetime | None = None):
+    # Archived months first, then live rows; streamed so exports of any size stay flat in memory.
+    rows = export_rows(dataset.value, start, end)
+    headers = {"Content-Disposition": f'attachment; filename="{dataset.value}.csv"'}
+    return StreamingResponse(iter_csv(rows), media_type="text/csv", headers=headers)
@@ -0,0 +1,76 @@
+"""Async variants of the analytics routes backed by :class:`AsyncSession`."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from functools import partial
+
+from anyio import to_thread
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...dependencies import get_async_read_db_session
+from ...query_params import sales_query
+from ...schemas import (
+    InventoryTurnoverResponse,
+    RestockPlanResponse,
+    SaleSummary,
+    SalesQueryResponse,
+    TelemetryAlertState,
+    TelemetryRead,
+)
+from ...services.analytics import AsyncAnalyticsService
+from ...services.monitoring import get_monitor
+from ...services.retention import ExportDataset, export_rows, iter_csv
+from ...services.sales_columns import slice_sales
+
+router = APIRouter()
+
+
+@router.get("/sales/summary", response_model=SaleSummary)
+async def sales_summary(days: int = 30, session: AsyncSession = Depends(get_async_read_db_session)):
+    service = AsyncAnalyticsService(session)
+    summary = await service.sales_summary(days=days)
+    return summary
+
+
+@router.get("/sales/query", response_model=SalesQueryResponse)
+async def query_sales(query: dict = Depends(sales_query)):
+    # Answered from the in-memory columnar copy; vectorised, but kept off the event loop.
+    return await to_thread.run_sync(partial(slice_sales, **query))
+
+
+@router.get("/telemetry/trend", response_model=list[TelemetryRead])
+async def telemetry_trend(hours: int = 24, session: AsyncSession = Depends(get_async_read_db_session)):
+    service = AsyncAnalyticsService(session)
+    telemetry = await service.telemetry_trend(hours=hours)
+    return telemetry
+
+
+@router.get("/telemetry/alerts", response_model=TelemetryAlertState)
+async def telemetry_alerts():
+    # Served from the in-process monitor; deliberately no database session.
+    return get_monitor().state()
+
+
+@router.get("/inventory/turnover", response_model=InventoryTurnoverResponse)
+async def inventory_turnover(days: int = 30, session: AsyncSession = Depends(get_async_read_db_session)):
+    service = AsyncAnalyticsService(session)
+    return await service.inventory_turnover(days=days)
+
+
+@router.get("/inventory/restock-plan", response_model=RestockPlanResponse)
+async def restock_plan(
+    horizon_hours: int = Query(default=168, ge=1, le=672), session: AsyncSession = Depends(get_async_read_db_session)
+):
+    service = AsyncAnalyticsService(session)
+    return await service.restock_plan(horizon_hours=horizon_hours)
+
+
+@router.get("/export/{dataset}")
+def export_dataset(dataset: ExportDataset, start: datetime | None = None, end: datetime | None = None):
+    # Archived months first, then live rows; streamed so exports of any size stay flat in memory.
+    rows = export_rows(dataset.value, start, end)
+    headers = {"Content-Disposition": f'attachment; filename="{dataset.value}.csv"'}
+    return StreamingResponse(iter_csv(rows), media_type="text/csv", headers=headers)
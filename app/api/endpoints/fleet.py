@@ -0,0 +1,24 @@
+"""Analytics merged across the fleet's uploaded machine databases.
+
+Mounted under ``/analytics/fleet`` when ``settings.fleet_database_dir`` is set,
+whatever the storage backend; these routes never touch the local database.
+"""
+
+from __future__ import annotations
+
+from fastapi import APIRouter, Query
+
+from ...schemas import FleetSaleSummary, FleetTurnoverResponse
+from ...services.fleet import get_fleet
+
+router = APIRouter()
+
+
+@router.get("/sales/summary", response_model=FleetSaleSummary)
+def fleet_sales_summary(days: int = 30, top: int = Query(default=5, ge=1, le=100)):
+    return get_fleet().sales_summary(days=days, top=top)
+
+
+@router.get("/inventory/turnover", response_model=FleetTurnoverResponse)
+def fleet_inventory_turnover(days: int = 30):
+    return get_fleet().inventory_turnover(days=days)
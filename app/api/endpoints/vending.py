@@ -5,8 +5,9 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from ...dependencies import get_db_session
-from ...schemas import ProductRead, SaleBase, SaleRead, TelemetryRead
+from ...dependencies import get_db_session, get_read_db_session
+from ...ingest import telemetry_batch
+from ...schemas import ProductRead, SaleBase, SaleRead, TelemetryIn, TelemetryIngestResult, TelemetryRead
 from ...services.inventory import InventoryService
 from ...services.tasks import TelemetryService
 from ...services.vending import VendingError, VendingService
@@ -15,7 +16,7 @@ router = APIRouter()
 
 
 @router.get("/products", response_model=list[ProductRead])
-def list_products(active_only: bool = False, session: Session = Depends(get_db_session)):
+def list_products(active_only: bool = False, session: Session = Depends(get_read_db_session)):
     service = InventoryService(session)
     return service.list_products(active_only=active_only)
 
@@ -37,7 +38,13 @@ def capture_telemetry(session: Session = Depends(get_db_session)):
     return telemetry
 
 
+@router.post("/telemetry/ingest", response_model=TelemetryIngestResult)
+def ingest_telemetry(samples: list[TelemetryIn] = Depends(telemetry_batch), session: Session = Depends(get_db_session)):
+    telemetry_service = TelemetryService(session)
+    return telemetry_service.ingest(samples)
+
+
 @router.get("/telemetry", response_model=list[TelemetryRead])
-def latest_telemetry(session: Session = Depends(get_db_session), limit: int = 50):
+def latest_telemetry(session: Session = Depends(get_read_db_session), limit: int = 50):
     telemetry_service = TelemetryService(session)
     return telemetry_service.repo.latest(limit=limit)
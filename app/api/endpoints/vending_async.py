@@ -0,0 +1,52 @@
+"""Async variants of the vending routes backed by :class:`AsyncSession`."""
+
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...dependencies import get_async_db_session, get_async_read_db_session
+from ...ingest import telemetry_batch
+from ...schemas import ProductRead, SaleBase, SaleRead, TelemetryIn, TelemetryIngestResult, TelemetryRead
+from ...services.inventory import AsyncInventoryService
+from ...services.tasks import AsyncTelemetryService
+from ...services.vending import AsyncVendingService, VendingError
+
+router = APIRouter()
+
+
+@router.get("/products", response_model=list[ProductRead])
+async def list_products(active_only: bool = False, session: AsyncSession = Depends(get_async_read_db_session)):
+    service = AsyncInventoryService(session)
+    return await service.list_products(active_only=active_only)
+
+
+@router.post("/purchase", response_model=SaleRead, status_code=status.HTTP_201_CREATED)
+async def purchase(payload: SaleBase, session: AsyncSession = Depends(get_async_db_session)):
+    service = AsyncVendingService(session)
+    try:
+        sale = await service.vend(payload)
+    except VendingError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return sale
+
+
+@router.post("/telemetry/capture", response_model=TelemetryRead)
+async def capture_telemetry(session: AsyncSession = Depends(get_async_db_session)):
+    telemetry_service = AsyncTelemetryService(session)
+    telemetry = await telemetry_service.capture()
+    return telemetry
+
+
+@router.post("/telemetry/ingest", response_model=TelemetryIngestResult)
+async def ingest_telemetry(
+    samples: list[TelemetryIn] = Depends(telemetry_batch), session: AsyncSession = Depends(get_async_db_session)
+):
+    telemetry_service = AsyncTelemetryService(session)
+    return await telemetry_service.ingest(samples)
+
+
+@router.get("/telemetry", response_model=list[TelemetryRead])
+async def latest_telemetry(session: AsyncSession = Depends(get_async_read_db_session), limit: int = 50):
+    telemetry_service = AsyncTelemetryService(session)
+    return await telemetry_service.repo.latest(limit=limit)
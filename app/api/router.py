@@ -4,12 +4,18 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
-from .endpoints import admin, analytics, vending
+from .endpoints import admin, admin_async, analytics, analytics_async, vending, vending_async
 
 api_router = APIRouter()
 api_router.include_router(vending.router, prefix="/vending", tags=["vending"])
 api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
 api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
 
+# Same routes served natively on the event loop through ``AsyncSession``.
+async_api_router = APIRouter()
+async_api_router.include_router(vending_async.router, prefix="/vending", tags=["vending"])
+async_api_router.include_router(admin_async.router, prefix="/admin", tags=["admin"])
+async_api_router.include_router(analytics_async.router, prefix="/analytics", tags=["analytics"])
 
-__all__ = ["api_router"]
+
+__all__ = ["api_router", "async_api_router"]
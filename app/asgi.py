@@ -0,0 +1,44 @@
+"""Small helpers shared by the plain ASGI middlewares (idempotency, admission, capture)."""
+
+from __future__ import annotations
+
+import json
+
+
+def header(message, name: str) -> str | None:
+    """Value of header ``name`` (lower case) in a scope or ``http.response.start`` message."""
+    encoded = name.encode()
+    for key, value in message.get("headers", ()):
+        if key.lower() == encoded:
+            return value.decode("latin-1")
+    return None
+
+
+async def read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def replay_body(body: bytes):
+    """A ``receive`` callable handing an already-read ``body`` to the app once."""
+    delivered = False
+
+    async def receive():
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    return receive
+
+
+async def send_json(send, status_code: int, payload: dict, headers: list | None = None) -> None:
+    body = json.dumps(payload).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *(headers or ())]
+    await send({"type": "http.response.start", "status": status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
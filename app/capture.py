@@ -0,0 +1,369 @@
+"""Traffic capture for replaying a real day of requests against a build.
+
+When ``settings.capture_dir`` is set, :class:`CaptureMiddleware` records every
+request under ``/api/`` as one JSON line. A record holds the arrival time, method,
+path, query, content type, ``Idempotency-Key``, body, whether the caller had
+kiosk priority, and the response status, size and duration. Before anything is
+written, every field named in ``settings.capture_redact_fields`` is replaced with
+``"[redacted]"``. That covers query parameters, form fields, and JSON keys at any
+depth or on any NDJSON line. JSON is detected whatever the ``Content-Type``
+says. A body that cannot be parsed is stored as ``"[unparsed body]"``, never
+raw. Bodies over ``settings.capture_max_body_bytes`` are left out, and only
+their size is kept. Other headers and client addresses are never stored.
+
+Records are queued to a writer thread, so request handling does no file I/O.
+The thread appends them to gzip files named ``capture-<UTC start>.ndjson.gz``.
+A new file is started after ``settings.capture_file_bytes`` of uncompressed
+records, and only the newest ``settings.capture_keep_files`` files are kept.
+
+:func:`replay` sends records to an ASGI app at their original spacing divided
+by ``speed``, or back to back with ``speed=0``. Overlapping requests stay
+concurrent. It reports latency percentiles per route next to the captured ones,
+and lists requests whose status differs from production (divergences).
+``benchmarks/replay_capture.py`` runs it against :func:`app.main.create_app`
+with mock hardware and a copy of the machine's database.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator
+from urllib.parse import parse_qsl, urlencode
+
+from .asgi import header, read_body, replay_body
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+REDACTED = "[redacted]"
+# Stored instead of a body that could not be parsed, and therefore not redacted.
+UNPARSED = "[unparsed body]"
+CAPTURE_PREFIX = "/api/"
+BODY_METHODS = frozenset({"POST", "PUT", "PATCH"})
+# Identifier-like path segments collapse into one route for the report.
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def route_key(method: str, path: str) -> str:
+    return f"{method} {_ID_SEGMENT.sub('/{id}', path)}"
+
+
+def _redact(value, fields: frozenset[str]):
+    if isinstance(value, dict):
+        return {key: REDACTED if key.lower() in fields else _redact(item, fields) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact(item, fields) for item in value]
+    return value
+
+
+def _fields(fields: Iterable[str] | None) -> frozenset[str]:
+    return frozenset(name.lower() for name in (settings.capture_redact_fields if fields is None else fields))
+
+
+def _json_document(text: str):
+    # Bare scalars carry no field name to redact against, so they count as unparsed.
+    document = json.loads(text)
+    if not isinstance(document, (dict, list)):
+        raise ValueError("not a JSON object or array")
+    return document
+
+
+def _redact_pairs(text: str, fields: frozenset[str]) -> str:
+    pairs = parse_qsl(text, keep_blank_values=True)
+    return urlencode([(key, REDACTED if key.lower() in fields else value) for key, value in pairs])
+
+
+def redact_query(query_string: bytes, fields: Iterable[str] | None = None) -> str:
+    """The query string with parameters named in ``capture_redact_fields`` replaced."""
+    return _redact_pairs(query_string.decode("latin-1"), _fields(fields))
+
+
+def redact_body(body: bytes, content_type: str | None, fields: Iterable[str] | None = None) -> str | None:
+    """``body`` as text with sensitive fields replaced.
+
+    JSON and NDJSON are recognised whatever the ``Content-Type`` says, since the
+    app parses JSON without one. Form-encoded bodies are redacted field by field.
+    Anything else, malformed JSON included, becomes :data:`UNPARSED` so that no
+    body is ever written unredacted. Returns ``None`` for non-text bodies.
+    """
+    fields = _fields(fields)
+    if not body:
+        return ""
+    try:
+        text = body.decode()
+    except UnicodeDecodeError:
+        return None
+    try:
+        return json.dumps(_redact(_json_document(text), fields), separators=(",", ":"))
+    except ValueError:
+        pass
+    try:
+        lines = [_json_document(line) for line in text.splitlines() if line.strip()]
+        return "\n".join(json.dumps(_redact(line, fields), separators=(",", ":")) for line in lines)
+    except ValueError:
+        pass
+    if (content_type or "").split(";")[0].strip().lower() == "application/x-www-form-urlencoded":
+        return _redact_pairs(text, fields)
+    return UNPARSED
+
+
+class CaptureLog:
+    """Rotating gzip NDJSON files fed from a queue by one writer thread."""
+
+    def __init__(self, directory: str | Path, file_bytes: int | None = None, keep_files: int | None = None) -> None:
+        self.directory = Path(directory)
+        self.file_bytes = settings.capture_file_bytes if file_bytes is None else file_bytes
+        self.keep_files = settings.capture_keep_files if keep_files is None else keep_files
+        self.dropped = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record: dict) -> None:
+        self._queue.put(record)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        stream, written = None, 0
+        while True:
+            records = [self._queue.get()]
+            while not self._queue.empty():
+                records.append(self._queue.get())
+            closing = records[-1] is None
+            try:
+                for record in records:
+                    if record is None:
+                        continue
+                    if stream is None or written >= self.file_bytes:
+                        stream, written = self._rotate(stream), 0
+                    line = json.dumps(record, separators=(",", ":"), default=str).encode() + b"\n"
+                    stream.write(line)
+                    written += len(line)
+                if stream is not None:
+                    stream.flush()
+            except OSError:
+                self.dropped += len(records)
+                logger.exception("Writing the traffic capture failed")
+                stream = None
+            if closing:
+                if stream is not None:
+                    stream.close()
+                return
+
+    def _rotate(self, stream):
+        if stream is not None:
+            stream.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"capture-{datetime.utcnow():%Y%m%dT%H%M%S%f}.ndjson.gz"
+        for old in sorted(self.directory.glob("capture-*.ndjson.gz"))[: -self.keep_files + 1 or None]:
+            old.unlink()
+        return gzip.open(self.directory / name, "wb", compresslevel=6)
+
+
+def read_capture(paths: Iterable[str | Path]) -> Iterator[dict]:
+    """Records from capture files (or directories of them) in arrival order."""
+    files: list[Path] = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob("capture-*.ndjson.gz")) if path.is_dir() else [path])
+    records: list[dict] = []
+    for file in files:
+        with gzip.open(file, "rt") as stream:
+            try:
+                records.extend(json.loads(line) for line in stream if line.strip())
+            except EOFError:
+                pass  # the last file of a machine that lost power mid-write
+    return iter(sorted(records, key=lambda record: record["at"]))
+
+
+class CaptureMiddleware:
+    """ASGI middleware writing one :class:`CaptureLog` record per API request."""
+
+    def __init__(self, app, log: CaptureLog | None = None) -> None:
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(CAPTURE_PREFIX):
+            await self.app(scope, receive, send)
+            return
+        from .admission import get_admission
+
+        log = self.log or get_capture_log()
+        content_type = header(scope, "content-type")
+        record = {
+            "at": time.time(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": redact_query(scope.get("query_string", b"")),
+            "content_type": content_type,
+            "idempotency_key": header(scope, "idempotency-key"),
+            "kiosk": get_admission().priority(scope) == "kiosk",
+            "body": None,
+        }
+        if scope["method"] in BODY_METHODS:
+            body = await read_body(receive)
+            record["body_bytes"] = len(body)
+            if len(body) <= settings.capture_max_body_bytes:
+                record["body"] = redact_body(body, content_type)
+            receive = replay_body(body)
+
+        status_code, size = 500, 0
+
+        async def capture(message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            record.update(status=status_code, bytes=size, ms=round((time.perf_counter() - started) * 1000, 2))
+            log.write(record)
+
+
+_capture_log: CaptureLog | None = None
+_capture_lock = threading.Lock()
+
+
+def get_capture_log() -> CaptureLog:
+    global _capture_log
+    if _capture_log is None:
+        with _capture_lock:
+            if _capture_log is None:
+                _capture_log = CaptureLog(settings.capture_dir)
+    return _capture_log
+
+
+def close_capture_log() -> None:
+    global _capture_log
+    with _capture_lock:
+        log, _capture_log = _capture_log, None
+    if log is not None:
+        log.close()
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def at(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 2)
+
+    return {"p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "max": round(ordered[-1], 2)}
+
+
+async def replay(records: Iterable[dict], app, speed: float = 1.0, divergence_limit: int = 20) -> dict:
+    """Send ``records`` to ``app`` on their captured schedule; returns the latency and divergence report."""
+    import httpx
+
+    records = list(records)
+    # Replayed from the addresses admission control classifies as kiosk and remote.
+    kiosk, remote = (
+        httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(host, 1)), base_url="http://pivend")
+        for host in ("127.0.0.1", "192.0.2.1")
+    )
+    routes: dict[str, dict[str, list[float]]] = {}
+    divergences: list[dict] = []
+    diverged = skipped = 0
+    lateness: list[float] = []
+
+    async def send(record: dict) -> None:
+        nonlocal diverged
+        client = kiosk if record.get("kiosk") else remote
+        headers = {}
+        if record.get("content_type"):
+            headers["content-type"] = record["content_type"]
+        if record.get("idempotency_key"):
+            headers["idempotency-key"] = record["idempotency_key"]
+        url = record["path"] + (f"?{record['query']}" if record.get("query") else "")
+        started = time.perf_counter()
+        response = await client.request(record["method"], url, content=record.get("body"), headers=headers)
+        elapsed = (time.perf_counter() - started) * 1000
+        timings = routes.setdefault(route_key(record["method"], record["path"]), {"replay": [], "captured": []})
+        timings["replay"].append(elapsed)
+        timings["captured"].append(record["ms"])
+        if response.status_code != record["status"]:
+            diverged += 1
+            if len(divergences) < divergence_limit:
+                divergences.append(
+                    {
+                        "at": record["at"],
+                        "request": f"{record['method']} {url}",
+                        "captured": record["status"],
+                        "replayed": response.status_code,
+                        "detail": response.text[:200],
+                    }
+                )
+
+    tasks = []
+    async with kiosk, remote:
+        if records:
+            origin, clock = records[0]["at"], time.perf_counter()
+            for record in records:
+                if record.get("method") in BODY_METHODS and record.get("body") in (None, UNPARSED):
+                    skipped += 1  # binary, oversized or unparseable body, not captured
+                    continue
+                if speed > 0:
+                    due = (record["at"] - origin) / speed
+                    delay = due - (time.perf_counter() - clock)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    else:
+                        lateness.append(-delay * 1000)
+                    tasks.append(asyncio.create_task(send(record)))
+                else:
+                    await send(record)
+            await asyncio.gather(*tasks)
+
+    return {
+        "requests": len(records) - skipped,
+        "skipped": skipped,
+        "speed": speed,
+        "diverged": diverged,
+        "divergences": divergences,
+        "late_ms": _percentiles(lateness),
+        "routes": {
+            route: {
+                "count": len(timings["replay"]),
+                "replay_ms": _percentiles(timings["replay"]),
+                "captured_ms": _percentiles(timings["captured"]),
+            }
+            for route, timings in sorted(routes.items(), key=lambda item: -len(item[1]["replay"]))
+        },
+    }
+
+
+def format_report(report: dict) -> str:
+    pace = f"{report['speed']:g}x" if report["speed"] > 0 else "full speed"
+    totals = f"{report['requests']} requests replayed at {pace}, {report['diverged']} diverged"
+    lines = [f"{totals}, {report['skipped']} skipped"]
+    if report["late_ms"]:
+        lines.append(f"scheduler lateness: p95 {report['late_ms']['p95']} ms, max {report['late_ms']['max']} ms")
+    lines.append(f"{'route':<48} {'count':>6}  {'replay p50/p95/p99 ms':>24}  {'captured p50/p95/p99 ms':>24}")
+    for route, row in report["routes"].items():
+        replayed = "/".join(str(row["replay_ms"][key]) for key in ("p50", "p95", "p99"))
+        captured = "/".join(str(row["captured_ms"][key]) for key in ("p50", "p95", "p99"))
+        lines.append(f"{route:<48} {row['count']:>6}  {replayed:>24}  {captured:>24}")
+    for divergence in report["divergences"]:
+        lines.append(
+            f"diverged: {divergence['request']} captured {divergence['captured']}, replayed {divergence['replayed']}:"
+            f" {divergence['detail']}"
+        )
+    return "\n".join(lines)
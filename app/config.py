@@ -2,8 +2,8 @@ from pathlib import Path
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+# Created lazily by the database layer on first connection, not at import time.
 data_dir = Path("data")
-data_dir.mkdir(parents=True, exist_ok=True)
 
 
 class Settings(BaseSettings):
@@ -13,9 +13,93 @@ class Settings(BaseSettings):
     api_v1_prefix: str = "/api/v1"
     database_url: str = f"sqlite:///{data_dir / 'vending.db'}"
     gpio_mode: str = "mock"
+    # Path of the hardware daemon's Unix socket; unset drives GPIO from this process.
+    hardware_socket: str | None = None
+    hardware_timeout_seconds: float = 30.0
+    # A dispense may queue behind other workers' dispenses on the daemon; unset waits for it however long it takes.
+    hardware_dispense_timeout_seconds: float | None = None
     analytics_cache_seconds: int = 60
     default_currency: str = "USD"
     telemetry_enabled: bool = True
+    # "memory" serves the API from app.store with periodic SQLite snapshots;
+    # "sql" serves it through the SQLAlchemy routers in app.api.
+    storage_backend: str = "memory"
+    async_database: bool = False
+    snapshot_interval_seconds: float = 30.0
+    # Reports and listings run on their own query-only pool; runaway statements are interrupted.
+    read_pool_size: int = 2
+    read_statement_timeout_seconds: float = 10.0
+    store_recent_sales: int = 10_000
+    store_telemetry_samples: int = 2_880
+    telemetry_ingest_max_samples: int = 10_000
+    # Checked while the body is read, before a JSON array is parsed; about 400 bytes per sample at the limit.
+    telemetry_ingest_max_bytes: int = 4 * 1024 * 1024
+    # "rows" keeps one telemetry row per sample; "blocks" packs each hour into arrays.
+    telemetry_storage: str = "rows"
+    forecast_alpha: float = 0.3
+    forecast_history_weeks: int = 12
+    monitor_temperature_high_c: float = 8.0
+    monitor_temperature_low_c: float = -2.0
+    monitor_hysteresis_c: float = 0.5
+    monitor_debounce_samples: int = 3
+    monitor_door_open_alert_seconds: float = 120.0
+    monitor_zscore_threshold: float = 4.0
+    monitor_warmup_samples: int = 30
+    # Door switch changes must hold this long to count; accepted changes are written in batches.
+    door_debounce_ms: float = 50.0
+    door_event_flush_seconds: float = 5.0
+    # Rows older than this many days move to compressed monthly archives; 0 disables.
+    retention_days: int = 365
+    retention_interval_hours: float = 24.0
+    archive_dir: str = str(data_dir / "archive")
+    # Checks Product.quantity against the inventory event log; 0 disables the schedule.
+    reconcile_interval_hours: float = 24.0
+    reconcile_repair: bool = False
+    # Responses replayed for repeated Idempotency-Key headers on purchase and admin writes.
+    idempotency_cache_size: int = 1_024
+    idempotency_ttl_hours: float = 24.0
+    # A key claimed by a worker that never finished (crash, kill) may be taken over after this long.
+    idempotency_claim_seconds: float = 300.0
+    # How often a duplicate polls for the outcome of a request another worker is running.
+    idempotency_poll_seconds: float = 0.1
+    # Directory scanned for machines' uploaded vending.db copies; enables /analytics/fleet.
+    fleet_database_dir: str | None = None
+    fleet_workers: int = 8
+    # "thread" or "process"; see app/services/fleet.py.
+    fleet_executor: str = "thread"
+    # Fleet reporting windows start on this boundary, so per-file results stay cached in between.
+    fleet_window_seconds: int = 3_600
+    # Per-file partials kept for reuse (one per machine, report and period); least recently used go first.
+    fleet_cache_entries: int = 1_024
+    # Purchases running at once, and how many more may wait per class before a 429.
+    admission_concurrency: int = 1
+    admission_kiosk_queue: int = 4
+    admission_remote_queue: int = 2
+    admission_max_wait_seconds: float = 10.0
+    # Clients served with kiosk priority: the touch screen talks to the API over loopback.
+    admission_kiosk_hosts: list[str] = ["127.0.0.1", "::1"]
+    # Directory for rotating request captures replayed by benchmarks/replay_capture.py; unset disables capture.
+    capture_dir: str | None = None
+    capture_file_bytes: int = 16 * 1024 * 1024
+    capture_keep_files: int = 20
+    capture_max_body_bytes: int = 64 * 1024
+    # Fields written as "[redacted]" in captured JSON and form bodies and query strings, matched case-insensitively.
+    capture_redact_fields: list[str] = [
+        "password",
+        "token",
+        "api_key",
+        "secret",
+        "authorization",
+        "card_number",
+        "cvv",
+        "pin",
+    ]
+    # Per-phase timings on API responses, and the threshold for app.slow_requests log lines (0 disables).
+    server_timing: bool = True
+    slow_request_ms: float = 1_500.0
+    slow_request_statements: int = 50
+    # Kiosk UI sources, served fingerprinted and precompressed under /ui.
+    ui_dir: str = str(Path(__file__).resolve().parent.parent / "ui")
 
     model_config = SettingsConfigDict(env_file=".env", env_prefix="PIVEND_")
 
@@ -1,14 +1,36 @@
-"""Database session management for the vending machine service."""
+"""Database session management for the vending machine service.
+
+Engines are created lazily on first use rather than at import time so that the
+application can start answering requests before SQLAlchemy has connected to
+the SD card. The async stack (and aiosqlite) is only imported when an async
+session is actually requested.
+
+Reports and list endpoints use separate read engines (:func:`get_read_session`,
+:func:`get_async_read_session`). SQLite runs in WAL mode, so their readers never
+block the purchase path's writer. Read connections come from their own small
+pool and are ``query_only``. Each session reads one snapshot inside an explicit
+``BEGIN`` and is rolled back rather than committed. A progress handler aborts
+any statement that runs longer than ``settings.read_statement_timeout_seconds``.
+"""
 
 from __future__ import annotations
 
+import logging
+import threading
+import time
 from pathlib import Path
-from typing import Iterator
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Iterator
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, event
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 from .config import settings
+from .timing import install_sql_timing, phase
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+logger = logging.getLogger(__name__)
 
 
 def _sqlite_connect_args(database_url: str) -> dict:
@@ -20,30 +42,299 @@ def _sqlite_connect_args(database_url: str) -> dict:
     return {}
 
 
-database_url = settings.database_url
-engine = create_engine(database_url, connect_args=_sqlite_connect_args(database_url))
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, expire_on_commit=False)
+def _async_database_url(database_url: str) -> str:
+    # The async engine needs an asyncio-capable DBAPI; aiosqlite wraps sqlite3.
+    if database_url.startswith("sqlite:"):
+        return database_url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    return database_url
+
+
+# SQLite VM instructions between statement-timeout checks.
+_PROGRESS_STEPS = 10_000
+
+
+def _enable_wal(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+def _configure_read_connection(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only = ON")
+    cursor.close()
+    # Let the "begin" hook below issue BEGIN itself so a session reads one snapshot.
+    dbapi_connection.isolation_level = None
+
+    info = connection_record.info
+
+    def interrupt() -> int:
+        deadline = info.get("deadline")
+        return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+    driver_connection = getattr(dbapi_connection, "driver_connection", None)
+    if driver_connection is not None and driver_connection is not dbapi_connection:
+        dbapi_connection.await_(driver_connection.set_progress_handler(interrupt, _PROGRESS_STEPS))
+    else:
+        dbapi_connection.set_progress_handler(interrupt, _PROGRESS_STEPS)
+
+
+def _begin_snapshot(conn) -> None:
+    conn.exec_driver_sql("BEGIN")
+
+
+def _start_statement_clock(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info["deadline"] = time.monotonic() + settings.read_statement_timeout_seconds
+
+
+def _stop_statement_clock(dbapi_connection, connection_record, reset_state) -> None:
+    # Before the pool's rollback, so an expired deadline cannot interrupt it.
+    connection_record.info.pop("deadline", None)
+
+
+def _make_read_only(sync_engine: Engine) -> None:
+    event.listen(sync_engine, "connect", _configure_read_connection)
+    event.listen(sync_engine, "begin", _begin_snapshot)
+    event.listen(sync_engine, "before_cursor_execute", _start_statement_clock)
+    event.listen(sync_engine, "reset", _stop_statement_clock)
+
+
+_AFTER_COMMIT = "after_commit_callbacks"
+
+
+def after_commit(session: Session | AsyncSession, callback: Callable[[], None]) -> None:
+    """Run ``callback`` once ``session``'s transaction has committed; it is dropped on rollback.
+
+    For in-process copies of committed data (the columnar sales copy, forecasts)
+    that must never see a row the database did not keep.
+    """
+    session = getattr(session, "sync_session", session)
+    session.info.setdefault(_AFTER_COMMIT, []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session) -> None:
+    for callback in session.info.pop(_AFTER_COMMIT, ()):
+        try:
+            callback()
+        except Exception:  # the commit stands; the copy catches up on its next rebuild
+            logger.exception("After-commit callback failed")
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_after_commit(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_AFTER_COMMIT, None)
+
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
+_engine: Engine | None = None
+_read_engine: Engine | None = None
+_async_engine: AsyncEngine | None = None
+_async_read_engine: AsyncEngine | None = None
+_async_session_factory: async_sessionmaker | None = None
+_async_read_session_factory: async_sessionmaker | None = None
+_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """Return the process-wide engine, creating it on first use."""
+
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                database_url = settings.database_url
+                engine = create_engine(database_url, connect_args=_sqlite_connect_args(database_url))
+                if database_url.startswith("sqlite"):
+                    event.listen(engine, "connect", _enable_wal)
+                install_sql_timing(engine)
+                SessionLocal.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+
+def get_read_engine() -> Engine:
+    """Return the process-wide read-only engine used by reports and listings."""
+
+    global _read_engine
+    if _read_engine is None:
+        with _lock:
+            if _read_engine is None:
+                database_url = settings.database_url
+                engine = create_engine(
+                    database_url,
+                    connect_args=_sqlite_connect_args(database_url),
+                    pool_size=settings.read_pool_size,
+                    max_overflow=0,
+                )
+                if database_url.startswith("sqlite"):
+                    _make_read_only(engine)
+                install_sql_timing(engine)
+                ReadSessionLocal.configure(bind=engine)
+                _read_engine = engine
+    return _read_engine
+
+
+def get_async_engine() -> AsyncEngine:
+    """Return the process-wide async engine, creating it on first use."""
+
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        with _lock:
+            if _async_engine is None:
+                database_url = settings.database_url
+                _sqlite_connect_args(database_url)
+                engine = create_async_engine(_async_database_url(database_url))
+                if database_url.startswith("sqlite"):
+                    event.listen(engine.sync_engine, "connect", _enable_wal)
+                install_sql_timing(engine.sync_engine)
+                _async_session_factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+                _async_engine = engine
+    return _async_engine
+
+
+def get_async_read_engine() -> AsyncEngine:
+    """Async counterpart of :func:`get_read_engine`."""
+
+    global _async_read_engine, _async_read_session_factory
+    if _async_read_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+        with _lock:
+            if _async_read_engine is None:
+                database_url = settings.database_url
+                _sqlite_connect_args(database_url)
+                # aiosqlite defaults to NullPool; keep a bounded pool of configured read connections.
+                engine = create_async_engine(
+                    _async_database_url(database_url),
+                    poolclass=AsyncAdaptedQueuePool,
+                    pool_size=settings.read_pool_size,
+                    max_overflow=0,
+                )
+                if database_url.startswith("sqlite"):
+                    _make_read_only(engine.sync_engine)
+                install_sql_timing(engine.sync_engine)
+                _async_read_session_factory = async_sessionmaker(
+                    bind=engine, autoflush=False, expire_on_commit=False
+                )
+                _async_read_engine = engine
+    return _async_read_engine
+
+
+def __getattr__(name: str):
+    # Keep ``database.engine`` / ``database.async_engine`` working for callers
+    # written against the previous eagerly-initialised module.
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Money columns that used to hold NUMERIC(10, 2) amounts, now integer cents.
+_CENT_COLUMNS = (("products", "price", "price_cents"), ("sales", "total_price", "total_cents"))
+
+
+def _migrate_money_columns(conn) -> None:
+    """Convert decimal money columns left by older releases to integer cents, in place."""
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(conn)
+    for table, old, new in _CENT_COLUMNS:
+        if not inspector.has_table(table):
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        if old not in columns:
+            continue
+        if new not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {new} INTEGER NOT NULL DEFAULT 0"))
+        conn.execute(text(f"UPDATE {table} SET {new} = CAST(round({old} * 100) AS INTEGER)"))
+        conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {old}"))
+
 
 def init_db() -> None:
-    """Create database tables on startup."""
+    """Create database tables on startup and bring older schemas up to date."""
 
     from . import models  # noqa: F401 - ensures models are imported for metadata
 
+    engine = get_engine()
+    with engine.begin() as conn:
+        _migrate_money_columns(conn)
     Base.metadata.create_all(bind=engine)
 
 
+async def dispose_engines() -> None:
+    """Close pooled connections at shutdown so the SQLite file is left clean."""
+
+    global _engine, _read_engine, _async_engine, _async_read_engine
+    for async_engine in (_async_engine, _async_read_engine):
+        if async_engine is not None:
+            await async_engine.dispose()
+    _async_engine = _async_read_engine = None
+    for engine in (_engine, _read_engine):
+        if engine is not None:
+            engine.dispose()
+    _engine = _read_engine = None
+
+
 def get_session() -> Iterator[Session]:
     """Provide a transactional scope for database operations."""
 
+    get_engine()
     session: Session = SessionLocal()
     try:
         yield session
-        session.commit()
+        with phase("commit"):
+            session.commit()
     except Exception:
         session.rollback()
         raise
     finally:
         session.close()
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """Async counterpart of :func:`get_session` for natively async endpoints."""
+
+    get_async_engine()
+    session: AsyncSession = _async_session_factory()
+    try:
+        yield session
+        with phase("commit"):
+            await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+def get_read_session() -> Iterator[Session]:
+    """Provide a read-only session on the read pool; never commits."""
+
+    get_read_engine()
+    session: Session = ReadSessionLocal()
+    try:
+        yield session
+    finally:
+        # Closing rolls back, ending the snapshot and returning the connection.
+        session.close()
+
+
+async def get_async_read_session() -> AsyncIterator[AsyncSession]:
+    """Async counterpart of :func:`get_read_session`."""
+
+    get_async_read_engine()
+    session: AsyncSession = _async_read_session_factory()
+    try:
+        yield session
+    finally:
+        await session.close()
@@ -3,10 +3,23 @@
 from __future__ import annotations
 
 from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .database import get_session
+from .database import get_async_read_session, get_async_session, get_read_session, get_session
 
 
 def get_db_session(session: Session = Depends(get_session)) -> Session:
     return session
+
+
+def get_read_db_session(session: Session = Depends(get_read_session)) -> Session:
+    return session
+
+
+async def get_async_db_session(session: AsyncSession = Depends(get_async_session)) -> AsyncSession:
+    return session
+
+
+async def get_async_read_db_session(session: AsyncSession = Depends(get_async_read_session)) -> AsyncSession:
+    return session
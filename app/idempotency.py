@@ -0,0 +1,272 @@
+"""``Idempotency-Key`` handling for purchases and admin writes.
+
+Kiosks retry writes when a response is lost on the way back. A request that
+carries an ``Idempotency-Key`` header is executed at most once per key: the
+first response is kept in a bounded in-memory LRU and in the
+``idempotency_keys`` table, and every repeat gets that response back (marked
+with ``Idempotent-Replayed: true``) without reaching the route. A repeat that
+arrives while the first request is still running waits for it instead of
+running alongside it.
+
+Before running a request, the worker claims its key by inserting a pending row
+(``status_code`` 0) into ``idempotency_keys``. The primary key makes the claim
+atomic across uvicorn workers. A duplicate that loses the claim waits for the
+outcome. It waits on a future when the first request runs in the same process,
+and otherwise polls the table every ``settings.idempotency_poll_seconds``. The
+finished response replaces the pending row. A claim that is never completed,
+because its worker died, can be taken over after
+``settings.idempotency_claim_seconds``.
+
+Keys are bound to the method, path, query string and body they were first used
+with; reusing one for a different request is rejected with 422. Server errors
+(5xx) and 429 admission rejections are not stored, so the client may retry
+them; their claim is released.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from .asgi import header, read_body, replay_body, send_json
+from .config import settings
+
+HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+# status_code of a row claimed by a request that is still running.
+PENDING = 0
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    content_type: str | None
+    body: bytes
+    created_at: datetime
+
+
+class ResponseCache:
+    """Bounded LRU in front of the persistent ``idempotency_keys`` table."""
+
+    def __init__(self, size: int | None = None, ttl_hours: float | None = None) -> None:
+        self.size = settings.idempotency_cache_size if size is None else size
+        self.ttl = timedelta(hours=settings.idempotency_ttl_hours if ttl_hours is None else ttl_hours)
+        self._entries: OrderedDict[str, StoredResponse] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> StoredResponse | None:
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                if datetime.utcnow() - response.created_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    return response
+                del self._entries[key]
+        response = self._load(key)
+        if response is not None:
+            self._remember(key, response)
+        return response
+
+    def put(self, key: str, response: StoredResponse) -> None:
+        self._remember(key, response)
+        self._save(key, response)
+
+    def claim(self, key: str, fingerprint: str) -> bool:
+        """Atomically mark ``key`` as running here; ``False`` if another request holds or completed it."""
+        from sqlalchemy import and_, delete, insert, or_
+        from sqlalchemy.exc import IntegrityError
+
+        from .database import get_engine
+        from .models import IdempotencyRecord
+
+        now = datetime.utcnow()
+        abandoned = and_(
+            IdempotencyRecord.status_code == PENDING,
+            IdempotencyRecord.created_at < now - timedelta(seconds=settings.idempotency_claim_seconds),
+        )
+        values = {"key": key, "fingerprint": fingerprint, "status_code": PENDING, "body": "", "created_at": now}
+        try:
+            with get_engine().begin() as conn:
+                stale = or_(IdempotencyRecord.created_at < now - self.ttl, abandoned)
+                conn.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key == key, stale))
+                conn.execute(insert(IdempotencyRecord).values(**values))
+        except IntegrityError:
+            return False
+        return True
+
+    def release(self, key: str) -> None:
+        """Drop this request's pending claim on ``key`` without storing a response."""
+        from sqlalchemy import delete
+
+        from .database import get_engine
+        from .models import IdempotencyRecord
+
+        with get_engine().begin() as conn:
+            conn.execute(
+                delete(IdempotencyRecord).where(IdempotencyRecord.key == key, IdempotencyRecord.status_code == PENDING)
+            )
+
+    def clear(self) -> None:
+        """Drop the in-memory entries; stored responses are still found in the table."""
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key: str, response: StoredResponse) -> None:
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> StoredResponse | None:
+        from sqlalchemy import select
+
+        from .database import get_engine
+        from .models import IdempotencyRecord
+
+        cutoff = datetime.utcnow() - self.ttl
+        stmt = select(IdempotencyRecord).where(
+            IdempotencyRecord.key == key,
+            IdempotencyRecord.created_at >= cutoff,
+            IdempotencyRecord.status_code != PENDING,
+        )
+        with get_engine().connect() as conn:
+            row = conn.execute(stmt).first()
+        if row is None:
+            return None
+        return StoredResponse(row.fingerprint, row.status_code, row.content_type, row.body.encode(), row.created_at)
+
+    def _save(self, key: str, response: StoredResponse) -> None:
+        from sqlalchemy import delete, insert
+
+        from .database import get_engine
+        from .models import IdempotencyRecord
+
+        values = {
+            "key": key,
+            "fingerprint": response.fingerprint,
+            "status_code": response.status_code,
+            "content_type": response.content_type,
+            "body": response.body.decode(),
+            "created_at": response.created_at,
+        }
+        with get_engine().begin() as conn:
+            # Replaces this request's pending claim, or an expired row not yet purged.
+            conn.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key == key))
+            conn.execute(insert(IdempotencyRecord).values(**values))
+
+
+def request_fingerprint(scope, body: bytes) -> str:
+    """What a key is bound to: the method, path, query string and body of its first request."""
+    parts = (scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body)
+    return hashlib.sha256(b"\0".join(parts)).hexdigest()
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware replaying stored responses for repeated ``Idempotency-Key`` writes."""
+
+    def __init__(self, app, paths: Iterable[str], cache: ResponseCache | None = None) -> None:
+        self.app = app
+        self.paths = tuple(paths)
+        self.cache = cache or ResponseCache()
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        key = header(scope, HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await send_json(send, 400, {"detail": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"})
+            return
+
+        body = await read_body(receive)
+        fingerprint = request_fingerprint(scope, body)
+
+        while True:
+            stored = await asyncio.to_thread(self.cache.get, key)
+            if stored is not None:
+                await self._replay(send, stored, fingerprint)
+                return
+            pending = self._in_flight.get(key)
+            if pending is not None:
+                # Another request with this key is running here; its outcome decides ours.
+                await asyncio.shield(pending)
+                continue
+            future = self._in_flight[key] = asyncio.get_running_loop().create_future()
+            try:
+                claimed = await asyncio.to_thread(self.cache.claim, key, fingerprint)
+            except BaseException:
+                del self._in_flight[key]
+                future.set_result(None)
+                raise
+            if claimed:
+                break
+            del self._in_flight[key]
+            future.set_result(None)
+            # Running in another worker: poll the table for its outcome.
+            await asyncio.sleep(settings.idempotency_poll_seconds)
+
+        stored_response = False
+        try:
+            response = await self._execute(scope, body, send, fingerprint)
+            if response.status_code < 500 and response.status_code != 429:
+                await asyncio.to_thread(self.cache.put, key, response)
+                stored_response = True
+        finally:
+            if not stored_response:
+                await asyncio.shield(asyncio.to_thread(self.cache.release, key))
+            del self._in_flight[key]
+            future.set_result(None)
+
+    async def _execute(self, scope, body: bytes, send, fingerprint: str) -> StoredResponse:
+        status_code = 500
+        content_type = None
+        chunks: list[bytes] = []
+
+        async def capture(message) -> None:
+            nonlocal status_code, content_type
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = header(message, "content-type")
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, replay_body(body), capture)
+        return StoredResponse(fingerprint, status_code, content_type, b"".join(chunks), datetime.utcnow())
+
+    @staticmethod
+    async def _replay(send, stored: StoredResponse, fingerprint: str) -> None:
+        if stored.fingerprint != fingerprint:
+            await send_json(send, 422, {"detail": "Idempotency-Key was already used for a different request"})
+            return
+        headers = [(b"idempotent-replayed", b"true"), (b"content-length", str(len(stored.body)).encode())]
+        if stored.content_type:
+            headers.append((b"content-type", stored.content_type.encode()))
+        await send({"type": "http.response.start", "status": stored.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": stored.body})
+
+
+def purge_expired_keys(ttl_hours: float | None = None) -> int:
+    """Delete stored responses older than the TTL; returns how many were removed."""
+    from sqlalchemy import delete
+
+    from .database import get_engine
+    from .models import IdempotencyRecord
+
+    ttl_hours = settings.idempotency_ttl_hours if ttl_hours is None else ttl_hours
+    cutoff = datetime.utcnow() - timedelta(hours=ttl_hours)
+    with get_engine().begin() as conn:
+        result = conn.execute(delete(IdempotencyRecord).where(IdempotencyRecord.created_at < cutoff))
+    return result.rowcount
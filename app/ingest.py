@@ -0,0 +1,87 @@
+"""Request parsing for bulk telemetry ingest.
+
+Sensor hubs upload readings in batches, either as a JSON array of
+:class:`~app.schemas.TelemetryIn` objects or as NDJSON with one object per line
+(``Content-Type: application/x-ndjson``). NDJSON lines are joined into a single
+array so the whole batch is validated in one pydantic call. Errors point at the
+offending sample's index, which for NDJSON is its line among non-blank lines.
+
+Oversized uploads are refused with 413 before any parsing. The body is capped at
+``settings.telemetry_ingest_max_bytes`` while it is read, and NDJSON lines are
+counted before they are validated.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+from fastapi import HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+
+from .config import settings
+from .services import telemetry_blocks
+
+NDJSON_MEDIA_TYPES = frozenset({"application/x-ndjson", "application/ndjson", "application/jsonl"})
+
+
+@lru_cache(maxsize=1)
+def _batch_adapter():
+    from pydantic import TypeAdapter
+
+    from .schemas import TelemetryIn
+
+    return TypeAdapter(list[TelemetryIn])
+
+
+async def telemetry_batch(request: Request) -> list:
+    """FastAPI dependency returning the validated ``TelemetryIn`` samples of a request."""
+    from pydantic import ValidationError
+
+    body = await _read_capped(request)
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type in NDJSON_MEDIA_TYPES:
+        lines = [line for line in body.splitlines() if line.strip()]
+        _check_size(len(lines))
+        body = b"[" + b",".join(lines) + b"]"
+    try:
+        samples = _batch_adapter().validate_json(body)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors(include_url=False)) from exc
+    _check_size(len(samples))
+    return samples
+
+
+def unique_by_timestamp(samples: list) -> list:
+    """Samples in time order, keeping the last of any with the same ``created_at``.
+
+    With block storage timestamps are first cut to the milliseconds it keeps.
+    """
+    if telemetry_blocks.enabled():
+        samples = [
+            sample.model_copy(update={"created_at": telemetry_blocks.truncate(sample.created_at)}) for sample in samples
+        ]
+    latest = {sample.created_at: sample for sample in samples}
+    return [latest[created_at] for created_at in sorted(latest)]
+
+
+async def _read_capped(request: Request) -> bytes:
+    limit = settings.telemetry_ingest_max_bytes
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        _too_large(f"At most {limit} bytes per request")
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            _too_large(f"At most {limit} bytes per request")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _check_size(count: int) -> None:
+    if count > settings.telemetry_ingest_max_samples:
+        _too_large(f"At most {settings.telemetry_ingest_max_samples} samples per request")
+
+
+def _too_large(detail: str) -> None:
+    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
@@ -1,24 +1,217 @@
-"""Application entry point exposing the vending machine API."""
+"""Application entry point exposing the vending machine API.
+
+Importing this module only builds the route table. The store, database
+engine and hardware backend are created in the lifespan handler (or on first
+use), so uvicorn can start answering requests as soon as possible after a
+power cut.
+
+``settings.storage_backend`` selects how routes are served: ``"memory"`` (the
+default) answers from :class:`app.store.VendingMachine`, which is checkpointed
+to SQLite every ``snapshot_interval_seconds`` and at shutdown; ``"sql"`` mounts
+the SQLAlchemy routers from :mod:`app.api`.
+"""
 from __future__ import annotations
 
-from fastapi import FastAPI, HTTPException, status
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import partial
+from typing import AsyncIterator, Callable
 
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+
+from .admission import AdmissionMiddleware, get_admission
+from .config import settings
+from .idempotency import IdempotencyMiddleware
+from .ingest import telemetry_batch
+from .query_params import sales_query
+from .services.retention import ExportDataset
+from .static_assets import ui_router
 from .store import VendingMachine, ensure_decimal
+from .timing import TimingMiddleware
 
 API_PREFIX = "/api/v1"
 
+logger = logging.getLogger(__name__)
+
+
+def get_store(request: Request) -> VendingMachine:
+    """Return the application's store, creating it if lifespan has not run."""
+    store = getattr(request.app.state, "store", None)
+    if store is None:
+        store = request.app.state.store = VendingMachine()
+    return store
+
+
+async def _warm_hardware() -> None:
+    # Configuring the backend can take a while on real GPIO; do it off the
+    # startup path so the first request is not held up by it.
+    from .services.hardware import HardwareError, get_hardware
+
+    hardware = await asyncio.to_thread(get_hardware)
+    if hasattr(hardware, "ping"):
+        try:
+            await asyncio.to_thread(hardware.ping)
+        except HardwareError as exc:
+            logger.warning("Hardware daemon health check failed: %s", exc)
+
+
+async def _build_ui() -> None:
+    from .static_assets import get_ui_bundle
+
+    try:
+        await asyncio.to_thread(get_ui_bundle)
+    except Exception:
+        logger.exception("Building the kiosk UI bundle failed")
+
+
+async def _rebuild_forecasts() -> None:
+    from .services.forecasting import rebuild_from_history
+
+    try:
+        await asyncio.to_thread(rebuild_from_history)
+    except Exception:
+        logger.exception("Rebuilding stock-out forecasts failed")
+
+
+async def _load_sales_columns() -> None:
+    from .services.sales_columns import load_from_history
+
+    try:
+        await asyncio.to_thread(load_from_history)
+    except Exception:
+        logger.exception("Loading the columnar sales copy failed")
+
+
+async def _snapshot_loop(store: VendingMachine, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(store.checkpoint)
+        except Exception:  # keep serving; the changes stay queued for the next attempt
+            logger.exception("Store checkpoint failed")
+
+
+async def _maintenance_loop(job: Callable[[], object], store: VendingMachine | None, interval: float) -> None:
+    while True:
+        try:
+            if store is not None:
+                # Rows still queued in memory would otherwise escape this pass.
+                await asyncio.to_thread(store.checkpoint)
+            await asyncio.to_thread(job)
+        except Exception:
+            logger.exception("Maintenance job %s failed", getattr(job, "__name__", job))
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    from .database import dispose_engines, init_db
+    from .idempotency import purge_expired_keys
+    from .services.door import persist_door_events
+
+    await asyncio.to_thread(init_db)
+    await asyncio.to_thread(purge_expired_keys)
+    warmup = asyncio.create_task(_warm_hardware())
+    ui_bundle = asyncio.create_task(_build_ui())
+    forecasts = asyncio.create_task(_rebuild_forecasts())
+    sales_columns = asyncio.create_task(_load_sales_columns())
+    snapshots = store = None
+    if settings.storage_backend == "memory":
+        store = app.state.store = VendingMachine()
+        await asyncio.to_thread(store.load)
+        snapshots = asyncio.create_task(_snapshot_loop(store, settings.snapshot_interval_seconds))
+    maintenance = []
+    # With a hardware daemon the door sensor, and persisting its changes, live in the daemon.
+    door_sensor_local = not settings.hardware_socket
+    if door_sensor_local:
+        loop = _maintenance_loop(persist_door_events, None, settings.door_event_flush_seconds)
+        maintenance.append(asyncio.create_task(loop))
+    if settings.retention_days > 0:
+        from .services.retention import run_retention
+
+        loop = _maintenance_loop(run_retention, store, settings.retention_interval_hours * 3600)
+        maintenance.append(asyncio.create_task(loop))
+    if settings.reconcile_interval_hours > 0:
+        from .services.reconciliation import reconcile
+
+        job = partial(reconcile, repair=settings.reconcile_repair)
+        loop = _maintenance_loop(job, store, settings.reconcile_interval_hours * 3600)
+        maintenance.append(asyncio.create_task(loop))
+    try:
+        yield
+    finally:
+        for task in maintenance:
+            task.cancel()
+        if door_sensor_local:
+            try:
+                await asyncio.to_thread(persist_door_events)
+            except Exception:
+                logger.exception("Persisting door events failed")
+        if snapshots is not None:
+            snapshots.cancel()
+            await asyncio.to_thread(app.state.store.checkpoint)
+        await warmup
+        await ui_bundle
+        await forecasts
+        await sales_columns
+        if settings.fleet_database_dir:
+            from .services.fleet import close_fleet
+
+            await asyncio.to_thread(close_fleet)
+        if settings.capture_dir:
+            from .capture import close_capture_log
+
+            await asyncio.to_thread(close_capture_log)
+        await dispose_engines()
+
 
 def create_app() -> FastAPI:
-    """Create the application instance with routes bound to a store."""
-    app = FastAPI(title="Brabus Right Vending")
-    store = VendingMachine()
+    """Create the application instance with routes for the configured backend."""
+    app = FastAPI(title="Brabus Right Vending", lifespan=lifespan)
+    # Added first so it runs inside the idempotency layer: replays skip the queue.
+    app.add_middleware(AdmissionMiddleware, paths=(f"{API_PREFIX}/vending/purchase",))
+    # Retried purchases and admin writes replay the first response instead of running again.
+    app.add_middleware(IdempotencyMiddleware, paths=(f"{API_PREFIX}/vending/purchase", f"{API_PREFIX}/admin/"))
+    # Outside admission, so queueing shows up as its own Server-Timing phase.
+    app.add_middleware(TimingMiddleware)
+    if settings.capture_dir:
+        from .capture import CaptureMiddleware
+
+        # Outermost, so the capture sees what the client saw, replays and rejections included.
+        app.add_middleware(CaptureMiddleware)
 
     @app.get("/")
     def root() -> dict[str, str]:  # pragma: no cover - trivial
         return {"message": "Brabus Right Vending online"}
 
+    app.include_router(ui_router)
+
+    @app.get(f"{API_PREFIX}/admin/admission")
+    async def admission_state() -> dict:
+        # Async so the controller's state is read on the event loop that mutates it.
+        return get_admission().state()
+
+    if settings.storage_backend == "sql":
+        from .api.router import api_router, async_api_router
+
+        app.include_router(async_api_router if settings.async_database else api_router, prefix=API_PREFIX)
+    elif settings.storage_backend == "memory":
+        _add_store_routes(app)
+    else:
+        raise ValueError(f"Unknown storage backend: {settings.storage_backend}")
+    if settings.fleet_database_dir:
+        from .api.endpoints import fleet
+
+        app.include_router(fleet.router, prefix=f"{API_PREFIX}/analytics/fleet", tags=["analytics"])
+    return app
+
+
+def _add_store_routes(app: FastAPI) -> None:
     @app.post(f"{API_PREFIX}/admin/products", status_code=status.HTTP_201_CREATED)
-    def create_product(payload: dict) -> dict:
+    def create_product(payload: dict, store: VendingMachine = Depends(get_store)) -> dict:
         try:
             product = store.create_product(payload)
         except ValueError as exc:  # invalid payload
@@ -26,11 +219,46 @@ def create_app() -> FastAPI:
         return product
 
     @app.get(f"{API_PREFIX}/admin/products")
-    def list_products() -> list[dict]:
+    def list_products(store: VendingMachine = Depends(get_store)) -> list[dict]:
         return store.list_products()
 
+    @app.patch(f"{API_PREFIX}/admin/products/{{product_id}}")
+    def update_product(product_id: int, payload: dict, store: VendingMachine = Depends(get_store)) -> dict:
+        try:
+            return store.update_product(product_id, payload)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+
+    @app.post(f"{API_PREFIX}/admin/inventory/adjust")
+    def adjust_inventory(payload: dict, store: VendingMachine = Depends(get_store)) -> dict:
+        try:
+            return store.adjust_inventory(payload)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+
+    @app.post(f"{API_PREFIX}/admin/inventory/reconcile")
+    def reconcile_inventory(repair: bool = False, store: VendingMachine = Depends(get_store)) -> dict:
+        from .services.reconciliation import reconcile
+
+        store.checkpoint()  # reconciliation reads SQLite, so flush queued events and counters first
+        return reconcile(repair=repair)
+
+    @app.get(f"{API_PREFIX}/admin/device-state")
+    def read_device_state(store: VendingMachine = Depends(get_store)) -> dict:
+        return store.get_device_state()
+
+    @app.post(f"{API_PREFIX}/admin/device-state")
+    def update_device_state(payload: dict, store: VendingMachine = Depends(get_store)) -> dict:
+        return store.set_door_lock(bool(payload.get("door_locked", True)))
+
+    @app.get(f"{API_PREFIX}/admin/door")
+    def read_door(limit: int = 20) -> dict:
+        from .services.hardware import get_hardware
+
+        return get_hardware().door.state(limit=limit)
+
     @app.post(f"{API_PREFIX}/vending/purchase", status_code=status.HTTP_201_CREATED)
-    def purchase(payload: dict) -> dict:
+    def purchase(payload: dict, store: VendingMachine = Depends(get_store)) -> dict:
         try:
             sale = store.vend(payload)
         except ValueError as exc:
@@ -38,28 +266,64 @@ def create_app() -> FastAPI:
         return sale
 
     @app.post(f"{API_PREFIX}/vending/telemetry/capture")
-    def capture_telemetry() -> dict:
+    def capture_telemetry(store: VendingMachine = Depends(get_store)) -> dict:
         return store.capture_telemetry()
 
+    @app.post(f"{API_PREFIX}/vending/telemetry/ingest")
+    def ingest_telemetry(samples: list = Depends(telemetry_batch), store: VendingMachine = Depends(get_store)) -> dict:
+        return store.ingest_telemetry(samples)
+
+    @app.get(f"{API_PREFIX}/vending/telemetry")
+    def latest_telemetry(limit: int = 50, store: VendingMachine = Depends(get_store)) -> list[dict]:
+        return store.latest_telemetry(limit=limit)
+
     @app.get(f"{API_PREFIX}/vending/products")
-    def vending_products() -> list[dict]:
-        return store.list_products(active_only=True)
+    def vending_products(active_only: bool = True, store: VendingMachine = Depends(get_store)) -> list[dict]:
+        return store.list_products(active_only=active_only)
 
     @app.get(f"{API_PREFIX}/analytics/sales/summary")
-    def sales_summary(days: int = 30) -> dict:
-        # "days" is accepted for compatibility even though the mock store keeps
-        # the data in-memory for the lifetime of the app instance.
+    def sales_summary(days: int = 30, store: VendingMachine = Depends(get_store)) -> dict:
         return store.sales_summary(days=days)
 
+    @app.get(f"{API_PREFIX}/analytics/sales/query")
+    def query_sales(query: dict = Depends(sales_query)) -> dict:
+        from .services.sales_columns import slice_sales
+
+        return slice_sales(**query)
+
     @app.get(f"{API_PREFIX}/analytics/inventory/turnover")
-    def inventory_turnover(days: int = 30) -> dict:
+    def inventory_turnover(days: int = 30, store: VendingMachine = Depends(get_store)) -> dict:
         return store.inventory_turnover(days=days)
 
+    @app.get(f"{API_PREFIX}/analytics/inventory/restock-plan")
+    def restock_plan(
+        horizon_hours: int = Query(default=168, ge=1, le=672), store: VendingMachine = Depends(get_store)
+    ) -> dict:
+        return store.restock_plan(horizon_hours=horizon_hours)
+
+    @app.get(f"{API_PREFIX}/analytics/telemetry/alerts")
+    def telemetry_alerts() -> dict:
+        from .services.monitoring import get_monitor
+
+        return get_monitor().state()
+
     @app.get(f"{API_PREFIX}/analytics/telemetry/trend")
-    def telemetry_trend(hours: int = 24) -> list[dict]:
+    def telemetry_trend(hours: int = 24, store: VendingMachine = Depends(get_store)) -> list[dict]:
         return store.telemetry_trend(hours=hours)
 
-    return app
+    @app.get(f"{API_PREFIX}/analytics/export/{{dataset}}")
+    def export_dataset(
+        dataset: ExportDataset,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        store: VendingMachine = Depends(get_store),
+    ) -> StreamingResponse:
+        from .services.retention import export_rows, iter_csv
+
+        store.checkpoint()  # exports read SQLite, so flush what is still only in memory
+        rows = export_rows(dataset.value, start, end)
+        headers = {"Content-Disposition": f'attachment; filename="{dataset.value}.csv"'}
+        return StreamingResponse(iter_csv(rows), media_type="text/csv", headers=headers)
 
 
 app = create_app()
@@ -2,9 +2,10 @@
 
 from __future__ import annotations
 
+import enum
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Enum, Float, ForeignKey, Integer, Numeric, String
+from sqlalchemy import Boolean, Column, DateTime, Enum, Float, ForeignKey, Integer, LargeBinary, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .database import Base
@@ -16,7 +17,7 @@ class Product(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
     slot_code: Mapped[str] = mapped_column(String(10), unique=True, nullable=False)
-    price: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
+    price_cents: Mapped[int] = mapped_column(Integer, nullable=False)
     quantity: Mapped[int] = mapped_column(Integer, default=0)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -26,6 +27,9 @@ class Product(Base):
     inventory_events: Mapped[list["InventoryEvent"]] = relationship(
         "InventoryEvent", back_populates="product", cascade="all,delete"
     )
+    inventory_checkpoint: Mapped["InventoryCheckpoint | None"] = relationship(
+        "InventoryCheckpoint", cascade="all,delete"
+    )
 
 
 class InventoryEvent(Base):
@@ -40,9 +44,22 @@ class InventoryEvent(Base):
     product: Mapped[Product] = relationship("Product", back_populates="inventory_events")
 
 
-class SaleStatusEnum(str, Enum):
+class InventoryCheckpoint(Base):
+    """Stock implied by the event log up to ``last_event_id``, as of the last reconciliation."""
+
+    __tablename__ = "inventory_checkpoints"
+
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), primary_key=True)
+    last_event_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    checked_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class SaleStatusEnum(str, enum.Enum):
     SUCCESS = "success"
     FAILED = "failed"
+    # The dispense was sent but its outcome never came back; the stock stays reserved.
+    PENDING = "pending"
 
 
 class Sale(Base):
@@ -51,7 +68,7 @@ class Sale(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), nullable=False)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False)
-    total_price: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
+    total_cents: Mapped[int] = mapped_column(Integer, nullable=False)
     payment_method: Mapped[str] = mapped_column(String(30), nullable=False)
     status: Mapped[SaleStatusEnum] = mapped_column(Enum(SaleStatusEnum), default=SaleStatusEnum.SUCCESS)
     error_message: Mapped[str | None] = mapped_column(String(255))
@@ -67,7 +84,30 @@ class Telemetry(Base):
     temperature_c: Mapped[float] = mapped_column(Float)
     humidity: Mapped[float] = mapped_column(Float)
     door_open: Mapped[bool] = mapped_column(Boolean, default=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
+class TelemetryBlock(Base):
+    """One UTC hour of telemetry packed into arrays; see :mod:`app.services.telemetry_blocks`."""
+
+    __tablename__ = "telemetry_blocks"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    start: Mapped[datetime] = mapped_column(DateTime, unique=True, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    interval_ms: Mapped[int | None] = mapped_column(Integer)
+    offsets: Mapped[bytes | None] = mapped_column(LargeBinary)
+    temperature: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    humidity: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    door_open: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+
+class DoorEvent(Base):
+    __tablename__ = "door_events"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    is_open: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
 
 
 class DeviceState(Base):
@@ -76,3 +116,14 @@ class DeviceState(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     door_locked: Mapped[bool] = mapped_column(Boolean, default=True)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_keys"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    status_code: Mapped[int] = mapped_column(Integer, nullable=False)
+    content_type: Mapped[str | None] = mapped_column(String(100))
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
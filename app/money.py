@@ -0,0 +1,52 @@
+"""Money as integer minor units (cents).
+
+Prices, sale totals and revenue are stored, compared and summed as ``int``
+cents everywhere behind the API. ``Decimal`` only appears at the edges:
+:func:`to_cents` when a request amount is parsed and :func:`from_cents` when a
+response or export is rendered. Conversions round half up, so ``"1.005"``
+becomes 101 cents.
+"""
+
+from __future__ import annotations
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any
+
+CENT = Decimal("0.01")
+
+
+def ensure_decimal(value: Any, field_name: str = "value") -> Decimal:
+    """Coerce ``value`` to a finite :class:`Decimal` or raise ``ValueError``."""
+    if isinstance(value, bool):
+        raise ValueError(f"{field_name} must be a number")
+    if isinstance(value, float):
+        # Go through ``str`` so 2.5 becomes Decimal("2.5"), not its binary expansion.
+        value = str(value)
+    try:
+        result = value if isinstance(value, Decimal) else Decimal(str(value).strip())
+    except (InvalidOperation, TypeError) as exc:
+        raise ValueError(f"{field_name} must be a number") from exc
+    if not result.is_finite():
+        raise ValueError(f"{field_name} must be a number")
+    return result
+
+
+def ensure_cents(value: Any, field_name: str = "value") -> int:
+    """Parse a request amount to cents, rejecting fractions of a cent instead of rounding them away."""
+    amount = ensure_decimal(value, field_name)
+    if amount * 100 % 1:
+        raise ValueError(f"{field_name} must have at most 2 decimal places")
+    return to_cents(amount)
+
+
+def to_cents(amount: Decimal) -> int:
+    return int((amount * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> Decimal:
+    return (Decimal(cents) / 100).quantize(CENT)
+
+
+def average_cents(total_cents: int, count: int) -> int:
+    """``total_cents / count`` rounded half up, in integer arithmetic."""
+    return (2 * total_cents + count) // (2 * count) if count else 0
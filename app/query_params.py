@@ -0,0 +1,34 @@
+"""Query-string parsing shared by the SQL routers and the in-memory store routes.
+
+Kept apart from :mod:`app.dependencies` so that :mod:`app.main` can use it
+without importing SQLAlchemy.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from fastapi import Query
+
+from .services.sales_columns import SalesDimension, SalesMetric
+
+
+def sales_query(
+    start: datetime | None = None,
+    end: datetime | None = None,
+    group_by: list[SalesDimension] = Query(default=[]),
+    metric: list[SalesMetric] = Query(default=[]),
+    product_id: list[int] = Query(default=[]),
+    payment_method: list[str] = Query(default=[]),
+    status: list[str] = Query(default=[]),
+) -> dict:
+    """Parameters of ``/analytics/sales/query`` as :meth:`SalesColumns.query` arguments."""
+    return {
+        "start": start,
+        "end": end,
+        "group_by": group_by,
+        "metrics": metric,
+        "product_ids": product_id,
+        "payment_methods": payment_method,
+        "statuses": status,
+    }
@@ -6,10 +6,87 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Sequence
 
-from sqlalchemy import desc, func, select
+from sqlalchemy import Select, Update, desc, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 
 from . import models
+from .money import average_cents, from_cents
+from .services import telemetry_blocks
+
+
+def _products_stmt(active_only: bool) -> Select:
+    stmt = select(models.Product)
+    if active_only:
+        stmt = stmt.where(models.Product.is_active.is_(True))
+    return stmt.order_by(models.Product.slot_code)
+
+
+def _adjust_stock_stmt(product_id: int, change: int) -> Update:
+    # One conditional UPDATE, so two workers can never both take the last item.
+    stmt = update(models.Product).where(models.Product.id == product_id)
+    if change < 0:
+        stmt = stmt.where(models.Product.quantity >= -change)
+    stmt = stmt.values(quantity=models.Product.quantity + change)
+    return stmt.returning(models.Product.quantity, models.Product.updated_at).execution_options(
+        synchronize_session=False
+    )
+
+
+def _stock_adjusted(product: models.Product, row) -> bool:
+    if row is None:
+        return False
+    set_committed_value(product, "quantity", row.quantity)
+    set_committed_value(product, "updated_at", row.updated_at)
+    return True
+
+
+def _sales_totals_stmt(cutoff: datetime) -> Select:
+    return select(
+        func.count(models.Sale.id),
+        func.coalesce(func.sum(models.Sale.total_cents), 0),
+    ).where(models.Sale.created_at >= cutoff, models.Sale.status == models.SaleStatusEnum.SUCCESS)
+
+
+def _top_products_stmt(cutoff: datetime, top: int | None = 5) -> Select:
+    stmt = (
+        select(models.Product.name, func.count(models.Sale.id).label("count"))
+        .join(models.Sale.product)
+        .where(models.Sale.created_at >= cutoff, models.Sale.status == models.SaleStatusEnum.SUCCESS)
+        .group_by(models.Product.id)
+        .order_by(desc("count"))
+    )
+    return stmt.limit(top) if top is not None else stmt
+
+
+def summarise_sales(count: int, revenue_cents: int, top_rows) -> dict:
+    top_products = [{"name": name, "sales": int(sales)} for name, sales in top_rows]
+    count, revenue_cents = int(count), int(revenue_cents)
+
+    return {
+        "total_sales": count,
+        "total_revenue": from_cents(revenue_cents),
+        "average_ticket": from_cents(average_cents(revenue_cents, count)) if count else Decimal("0"),
+        "top_products": top_products,
+    }
+
+
+def _latest_telemetry_stmt(limit: int) -> Select:
+    return select(models.Telemetry).order_by(models.Telemetry.created_at.desc()).limit(limit)
+
+
+def _telemetry_timestamps_stmt(start: datetime, end: datetime) -> Select:
+    return select(models.Telemetry.created_at).where(models.Telemetry.created_at.between(start, end))
+
+
+def _telemetry_row(telemetry: models.Telemetry) -> dict:
+    return {
+        "temperature_c": telemetry.temperature_c,
+        "humidity": telemetry.humidity,
+        "door_open": bool(telemetry.door_open),
+        "created_at": telemetry.created_at,
+    }
 
 
 class ProductRepository:
@@ -17,11 +94,7 @@ class ProductRepository:
         self.session = session
 
     def list_products(self, active_only: bool = False) -> Sequence[models.Product]:
-        stmt = select(models.Product)
-        if active_only:
-            stmt = stmt.where(models.Product.is_active.is_(True))
-        stmt = stmt.order_by(models.Product.slot_code)
-        return self.session.scalars(stmt).all()
+        return self.session.scalars(_products_stmt(active_only)).all()
 
     def get(self, product_id: int) -> models.Product | None:
         return self.session.get(models.Product, product_id)
@@ -38,6 +111,10 @@ class ProductRepository:
     def delete(self, product: models.Product) -> None:
         self.session.delete(product)
 
+    def adjust_stock(self, product: models.Product, change: int) -> bool:
+        """Add ``change`` to the stored quantity in place; a decrease below zero changes nothing and returns False."""
+        return _stock_adjusted(product, self.session.execute(_adjust_stock_stmt(product.id, change)).first())
+
 
 class InventoryRepository:
     def __init__(self, session: Session):
@@ -59,35 +136,11 @@ class SaleRepository:
         self.session.refresh(sale)
         return sale
 
-    def aggregate_sales(self, days: int = 30) -> dict:
+    def aggregate_sales(self, days: int = 30, top: int | None = 5) -> dict:
         cutoff = datetime.utcnow() - timedelta(days=days)
-        stmt = select(
-            func.count(models.Sale.id),
-            func.coalesce(func.sum(models.Sale.total_price), 0),
-        ).where(models.Sale.created_at >= cutoff, models.Sale.status == models.SaleStatusEnum.SUCCESS)
-        count, revenue = self.session.execute(stmt).one()
-
-        top_stmt = (
-            select(models.Product.name, func.count(models.Sale.id).label("count"))
-            .join(models.Sale.product)
-            .where(models.Sale.created_at >= cutoff, models.Sale.status == models.SaleStatusEnum.SUCCESS)
-            .group_by(models.Product.id)
-            .order_by(desc("count"))
-            .limit(5)
-        )
-        top_products = [
-            {"name": name, "sales": int(sales)}
-            for name, sales in self.session.execute(top_stmt).all()
-        ]
-
-        average_ticket = Decimal(revenue) / count if count else Decimal("0")
-
-        return {
-            "total_sales": int(count),
-            "total_revenue": Decimal(revenue),
-            "average_ticket": average_ticket.quantize(Decimal("0.01")) if count else Decimal("0"),
-            "top_products": top_products,
-        }
+        count, revenue = self.session.execute(_sales_totals_stmt(cutoff)).one()
+        top_rows = self.session.execute(_top_products_stmt(cutoff, top)).all()
+        return summarise_sales(count, revenue, top_rows)
 
 
 class TelemetryRepository:
@@ -101,8 +154,43 @@ class TelemetryRepository:
         return telemetry
 
     def latest(self, limit: int = 50) -> Sequence[models.Telemetry]:
-        stmt = select(models.Telemetry).order_by(models.Telemetry.created_at.desc()).limit(limit)
-        return list(reversed(self.session.scalars(stmt).all()))
+        return list(reversed(self.session.scalars(_latest_telemetry_stmt(limit)).all()))
+
+    def timestamps_between(self, start: datetime, end: datetime) -> set[datetime]:
+        return set(self.session.scalars(_telemetry_timestamps_stmt(start, end)))
+
+    def log_many(self, rows: list[dict]) -> None:
+        # One executemany; no per-row refresh since the caller does not need the ids.
+        self.session.execute(insert(models.Telemetry.__table__), rows)
+
+
+class BlockTelemetryRepository:
+    """:class:`TelemetryRepository` for ``telemetry_storage = "blocks"``."""
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.blocks = telemetry_blocks.TelemetryBlocks(session)
+
+    def log(self, telemetry: models.Telemetry) -> models.Telemetry:
+        telemetry.created_at = telemetry_blocks.truncate(telemetry.created_at or datetime.utcnow())
+        self.blocks.append([_telemetry_row(telemetry)])
+        telemetry.id = telemetry_blocks.sample_id(telemetry.created_at)
+        return telemetry
+
+    def latest(self, limit: int = 50) -> list[dict]:
+        return self.blocks.latest(limit)
+
+    def timestamps_between(self, start: datetime, end: datetime) -> set[datetime]:
+        return self.blocks.timestamps_between(start, end)
+
+    def log_many(self, rows: list[dict]) -> None:
+        self.blocks.append(rows)
+
+
+def telemetry_repository(session: Session) -> TelemetryRepository | BlockTelemetryRepository:
+    if telemetry_blocks.enabled():
+        return BlockTelemetryRepository(session)
+    return TelemetryRepository(session)
 
 
 class DeviceStateRepository:
@@ -123,3 +211,124 @@ class DeviceStateRepository:
         self.session.flush()
         self.session.refresh(state)
         return state
+
+
+class AsyncProductRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def list_products(self, active_only: bool = False) -> Sequence[models.Product]:
+        return (await self.session.scalars(_products_stmt(active_only))).all()
+
+    async def get(self, product_id: int) -> models.Product | None:
+        return await self.session.get(models.Product, product_id)
+
+    async def get_by_slot(self, slot_code: str) -> models.Product | None:
+        stmt = select(models.Product).where(models.Product.slot_code == slot_code)
+        return (await self.session.scalars(stmt)).first()
+
+    async def create(self, product: models.Product) -> models.Product:
+        self.session.add(product)
+        await self.session.flush()
+        return product
+
+    async def delete(self, product: models.Product) -> None:
+        await self.session.delete(product)
+
+    async def adjust_stock(self, product: models.Product, change: int) -> bool:
+        result = await self.session.execute(_adjust_stock_stmt(product.id, change))
+        return _stock_adjusted(product, result.first())
+
+
+class AsyncInventoryRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def log_event(self, event: models.InventoryEvent) -> models.InventoryEvent:
+        self.session.add(event)
+        await self.session.flush()
+        return event
+
+
+class AsyncSaleRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def record(self, sale: models.Sale) -> models.Sale:
+        self.session.add(sale)
+        await self.session.flush()
+        await self.session.refresh(sale)
+        return sale
+
+    async def aggregate_sales(self, days: int = 30, top: int | None = 5) -> dict:
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        count, revenue = (await self.session.execute(_sales_totals_stmt(cutoff))).one()
+        top_rows = (await self.session.execute(_top_products_stmt(cutoff, top))).all()
+        return summarise_sales(count, revenue, top_rows)
+
+
+class AsyncTelemetryRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def log(self, telemetry: models.Telemetry) -> models.Telemetry:
+        self.session.add(telemetry)
+        await self.session.flush()
+        await self.session.refresh(telemetry)
+        return telemetry
+
+    async def latest(self, limit: int = 50) -> Sequence[models.Telemetry]:
+        return list(reversed((await self.session.scalars(_latest_telemetry_stmt(limit))).all()))
+
+    async def timestamps_between(self, start: datetime, end: datetime) -> set[datetime]:
+        return set(await self.session.scalars(_telemetry_timestamps_stmt(start, end)))
+
+    async def log_many(self, rows: list[dict]) -> None:
+        await self.session.execute(insert(models.Telemetry.__table__), rows)
+
+
+class AsyncBlockTelemetryRepository:
+    """Async :class:`BlockTelemetryRepository`; block codecs run on the sync session."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def log(self, telemetry: models.Telemetry) -> models.Telemetry:
+        return await self.session.run_sync(lambda session: BlockTelemetryRepository(session).log(telemetry))
+
+    async def latest(self, limit: int = 50) -> list[dict]:
+        return await self.session.run_sync(lambda session: BlockTelemetryRepository(session).latest(limit))
+
+    async def timestamps_between(self, start: datetime, end: datetime) -> set[datetime]:
+        return await self.session.run_sync(
+            lambda session: BlockTelemetryRepository(session).timestamps_between(start, end)
+        )
+
+    async def log_many(self, rows: list[dict]) -> None:
+        await self.session.run_sync(lambda session: BlockTelemetryRepository(session).log_many(rows))
+
+
+def async_telemetry_repository(session: AsyncSession) -> AsyncTelemetryRepository | AsyncBlockTelemetryRepository:
+    if telemetry_blocks.enabled():
+        return AsyncBlockTelemetryRepository(session)
+    return AsyncTelemetryRepository(session)
+
+
+class AsyncDeviceStateRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_or_create(self) -> models.DeviceState:
+        state = await self.session.scalar(select(models.DeviceState))
+        if state is None:
+            state = models.DeviceState(door_locked=True)
+            self.session.add(state)
+            await self.session.flush()
+        return state
+
+    async def update(self, door_locked: bool) -> models.DeviceState:
+        state = await self.get_or_create()
+        state.door_locked = door_locked
+        await self.session.flush()
+        await self.session.refresh(state)
+        return state
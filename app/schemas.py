@@ -1,14 +1,21 @@
-"""Pydantic schemas for API responses and requests."""
+"""Pydantic schemas for API responses and requests.
+
+Money crosses the API as decimal amounts ("1.25") and is held as integer cents
+everywhere behind it; the conversions happen here, in both directions. Amounts
+with more than two decimal places are rejected rather than rounded, so "0.004"
+can never become a zero price or payment.
+"""
 
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Optional
+from typing import Any, Optional
 
-from pydantic import BaseModel, ConfigDict, Field, PositiveInt, field_validator
+from pydantic import BaseModel, ConfigDict, Field, PositiveInt, computed_field, field_validator
 
 from .models import SaleStatusEnum
+from .money import from_cents, to_cents
 
 
 class ORMModel(BaseModel):
@@ -18,27 +25,41 @@ class ORMModel(BaseModel):
 class ProductBase(BaseModel):
     name: str = Field(min_length=1, max_length=120)
     slot_code: str = Field(min_length=1, max_length=10)
-    price: Decimal = Field(gt=0)
     is_active: bool = True
 
 
 class ProductCreate(ProductBase):
+    price: Decimal = Field(gt=0, decimal_places=2)
     quantity: int = Field(default=0, ge=0)
 
+    @property
+    def price_cents(self) -> int:
+        return to_cents(self.price)
+
 
 class ProductUpdate(BaseModel):
     name: Optional[str] = Field(default=None, max_length=120)
-    price: Optional[Decimal] = Field(default=None, gt=0)
+    price: Optional[Decimal] = Field(default=None, gt=0, decimal_places=2)
     is_active: Optional[bool] = None
     quantity: Optional[int] = Field(default=None, ge=0)
 
+    @property
+    def price_cents(self) -> Optional[int]:
+        return None if self.price is None else to_cents(self.price)
+
 
 class ProductRead(ProductBase, ORMModel):
     id: int
+    price_cents: int = Field(exclude=True)
     quantity: int
     created_at: datetime
     updated_at: datetime
 
+    @computed_field
+    @property
+    def price(self) -> Decimal:
+        return from_cents(self.price_cents)
+
 
 class InventoryAdjustment(BaseModel):
     product_id: int
@@ -50,7 +71,7 @@ class SaleBase(BaseModel):
     product_id: int
     quantity: PositiveInt
     payment_method: str = Field(min_length=2, max_length=30)
-    amount_paid: Decimal = Field(gt=0)
+    amount_paid: Decimal = Field(gt=0, decimal_places=2)
 
     @field_validator("quantity")
     @classmethod
@@ -59,17 +80,26 @@ class SaleBase(BaseModel):
             raise ValueError("Quantity must be positive")
         return value
 
+    @property
+    def amount_paid_cents(self) -> int:
+        return to_cents(self.amount_paid)
+
 
 class SaleRead(ORMModel):
     id: int
     product_id: int
     quantity: int
-    total_price: Decimal
+    total_cents: int = Field(exclude=True)
     payment_method: str
     status: SaleStatusEnum
     error_message: Optional[str]
     created_at: datetime
 
+    @computed_field
+    @property
+    def total_price(self) -> Decimal:
+        return from_cents(self.total_cents)
+
 
 class SaleSummaryProduct(BaseModel):
     name: str
@@ -83,6 +113,37 @@ class SaleSummary(BaseModel):
     top_products: list[SaleSummaryProduct]
 
 
+class FleetFailure(BaseModel):
+    machine: str
+    error: str
+
+
+class FleetSaleSummary(SaleSummary):
+    machines: int
+    failed: list[FleetFailure]
+
+
+class FleetTurnoverItem(BaseModel):
+    name: str
+    machines: int
+    quantity_on_hand: int
+    sold_last_period: int
+    last_updated: datetime
+
+
+class FleetTurnoverResponse(BaseModel):
+    as_of: datetime
+    machines: int
+    products: list[FleetTurnoverItem]
+    failed: list[FleetFailure]
+
+
+class SalesQueryResponse(BaseModel):
+    loaded: bool
+    group_by: list[str]
+    rows: list[dict[str, Any]]
+
+
 class TelemetryRead(ORMModel):
     id: int
     temperature_c: float
@@ -95,6 +156,49 @@ class TelemetryIn(BaseModel):
     temperature_c: float
     humidity: float
     door_open: bool = False
+    created_at: datetime
+
+    @field_validator("created_at")
+    @classmethod
+    def as_naive_utc(cls, value: datetime) -> datetime:
+        # Stored timestamps are naive UTC, like ``datetime.utcnow()`` elsewhere.
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
+class TelemetryIngestResult(BaseModel):
+    received: int
+    inserted: int
+    duplicates: int
+
+
+class TelemetryAlertRead(BaseModel):
+    kind: str
+    message: str
+    raised_at: datetime
+    peak_value: float
+    cleared_at: Optional[datetime]
+
+
+class TelemetryStats(BaseModel):
+    samples: int
+    temperature_mean: float
+    temperature_std: float
+    humidity_mean: float
+    humidity_std: float
+    seconds_above_threshold: float
+    door_open: bool
+    door_open_seconds: float
+    door_open_total_seconds: float
+    door_openings: int
+
+
+class TelemetryAlertState(BaseModel):
+    as_of: datetime
+    stats: TelemetryStats
+    active: list[TelemetryAlertRead]
+    recent: list[TelemetryAlertRead]
 
 
 class DeviceStateRead(ORMModel):
@@ -106,6 +210,17 @@ class DeviceStateUpdate(BaseModel):
     door_locked: bool
 
 
+class DoorChangeRead(BaseModel):
+    is_open: bool
+    at: datetime
+
+
+class DoorStateRead(BaseModel):
+    is_open: bool
+    since: Optional[datetime]
+    events: list[DoorChangeRead]
+
+
 class InventoryTurnoverItem(BaseModel):
     name: str
     slot_code: str
@@ -117,3 +232,35 @@ class InventoryTurnoverItem(BaseModel):
 class InventoryTurnoverResponse(BaseModel):
     as_of: datetime
     products: list[InventoryTurnoverItem]
+
+
+class RestockPlanItem(BaseModel):
+    product_id: int
+    name: str
+    slot_code: str
+    quantity_on_hand: int
+    daily_rate: float
+    hours_until_stockout: Optional[float]
+    predicted_stockout_at: Optional[datetime]
+
+
+class RestockPlanResponse(BaseModel):
+    as_of: datetime
+    horizon_hours: int
+    items: list[RestockPlanItem]
+
+
+class InventoryDiscrepancy(BaseModel):
+    product_id: int
+    slot_code: str
+    expected_quantity: int
+    actual_quantity: int
+    difference: int
+
+
+class ReconciliationReport(BaseModel):
+    checked_at: datetime
+    products_checked: int
+    events_checked: int
+    repaired: bool
+    discrepancies: list[InventoryDiscrepancy]
@@ -2,58 +2,161 @@
 
 from __future__ import annotations
 
+from collections import Counter
 from datetime import datetime, timedelta
 
-from sqlalchemy import func, select
+from anyio import to_thread
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from .. import models
-from ..repositories import SaleRepository, TelemetryRepository
+from ..money import to_cents
+from ..repositories import (
+    AsyncSaleRepository,
+    SaleRepository,
+    async_telemetry_repository,
+    summarise_sales,
+    telemetry_repository,
+)
+from ..timing import phase
+from .forecasting import get_forecaster
+from .retention import archived_sales
+
+
+def _trend_limit(hours: int) -> int:
+    return max(1, hours * 2)
+
+
+def _cutoff(days: int) -> datetime:
+    return datetime.utcnow() - timedelta(days=days)
+
+
+def _sold_per_slot_stmt(cutoff: datetime) -> Select:
+    return (
+        select(models.Product.slot_code, func.coalesce(func.sum(models.Sale.quantity), 0))
+        .join(models.Sale.product)
+        .where(
+            models.Sale.created_at >= cutoff,
+            models.Sale.status == models.SaleStatusEnum.SUCCESS,
+        )
+        .group_by(models.Product.id)
+    )
+
+
+def _active_products_stmt() -> Select:
+    return select(models.Product).where(models.Product.is_active.is_(True)).order_by(models.Product.slot_code)
+
+
+def _merge_archived_summary(summary: dict, archived: dict | None) -> dict:
+    if archived is None:
+        return summary
+    # Live rows are grouped by product id, so two products sharing a name both count towards it.
+    per_name: Counter = Counter()
+    for product in summary["top_products"]:
+        per_name[product["name"]] += product["sales"]
+    for product in archived["products"].values():
+        per_name[product["name"]] += product["sales"]
+    return summarise_sales(
+        summary["total_sales"] + archived["sales"],
+        to_cents(summary["total_revenue"]) + archived["revenue_cents"],
+        per_name.most_common(5),
+    )
+
+
+def _turnover(sold_rows, products, archived: dict | None = None) -> dict:
+    sold_map = {slot: int(quantity) for slot, quantity in sold_rows}
+    for slot_code, product in (archived or {}).get("products", {}).items():
+        sold_map[slot_code] = sold_map.get(slot_code, 0) + product["units"]
+    return {
+        "as_of": datetime.utcnow(),
+        "products": [
+            {
+                "name": product.name,
+                "slot_code": product.slot_code,
+                "quantity_on_hand": product.quantity,
+                "sold_last_period": sold_map.get(product.slot_code, 0),
+                "last_updated": product.updated_at,
+            }
+            for product in products
+        ],
+    }
+
+
+def _restock_plan(products, horizon_hours: int) -> dict:
+    rows = [(product.id, product.name, product.slot_code, product.quantity) for product in products]
+    return {
+        "as_of": datetime.utcnow(),
+        "horizon_hours": horizon_hours,
+        "items": get_forecaster().restock_plan(rows, horizon_hours=horizon_hours),
+    }
 
 
 class AnalyticsService:
     def __init__(self, session: Session):
         self.session = session
         self.sales_repo = SaleRepository(session)
-        self.telemetry_repo = TelemetryRepository(session)
+        self.telemetry_repo = telemetry_repository(session)
 
     def sales_summary(self, days: int = 30) -> dict:
-        return self.sales_repo.aggregate_sales(days=days)
+        with phase("archive"):
+            archived = archived_sales(days)
+        with phase("sales"):
+            if archived is None:
+                return self.sales_repo.aggregate_sales(days=days)
+            summary = self.sales_repo.aggregate_sales(days=days, top=None)
+        return _merge_archived_summary(summary, archived)
 
     def telemetry_trend(self, hours: int = 24) -> list[models.Telemetry]:
-        limit = max(1, hours * 2)
-        return list(self.telemetry_repo.latest(limit=limit))
+        with phase("telemetry"):
+            return list(self.telemetry_repo.latest(limit=_trend_limit(hours)))
 
     def inventory_turnover(self, days: int = 30) -> dict:
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        sales_stmt = (
-            select(models.Product.slot_code, func.coalesce(func.sum(models.Sale.quantity), 0))
-            .join(models.Sale.product)
-            .where(
-                models.Sale.created_at >= cutoff,
-                models.Sale.status == models.SaleStatusEnum.SUCCESS,
-            )
-            .group_by(models.Product.id)
-        )
-        sold_map = {slot: int(quantity) for slot, quantity in self.session.execute(sales_stmt).all()}
+        with phase("sales"):
+            sold_rows = self.session.execute(_sold_per_slot_stmt(_cutoff(days))).all()
+        with phase("products"):
+            products = self.session.scalars(_active_products_stmt()).all()
+        with phase("archive"):
+            archived = archived_sales(days)
+        return _turnover(sold_rows, products, archived)
 
-        product_stmt = (
-            select(models.Product)
-            .where(models.Product.is_active.is_(True))
-            .order_by(models.Product.slot_code)
-        )
-        products = self.session.scalars(product_stmt).all()
-
-        return {
-            "as_of": datetime.utcnow(),
-            "products": [
-                {
-                    "name": product.name,
-                    "slot_code": product.slot_code,
-                    "quantity_on_hand": product.quantity,
-                    "sold_last_period": sold_map.get(product.slot_code, 0),
-                    "last_updated": product.updated_at,
-                }
-                for product in products
-            ],
-        }
+    def restock_plan(self, horizon_hours: int = 168) -> dict:
+        with phase("products"):
+            products = self.session.scalars(_active_products_stmt()).all()
+        with phase("forecast"):
+            return _restock_plan(products, horizon_hours)
+
+
+class AsyncAnalyticsService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.sales_repo = AsyncSaleRepository(session)
+        self.telemetry_repo = async_telemetry_repository(session)
+
+    async def sales_summary(self, days: int = 30) -> dict:
+        with phase("archive"):
+            archived = await to_thread.run_sync(archived_sales, days)
+        with phase("sales"):
+            if archived is None:
+                return await self.sales_repo.aggregate_sales(days=days)
+            summary = await self.sales_repo.aggregate_sales(days=days, top=None)
+        return _merge_archived_summary(summary, archived)
+
+    async def telemetry_trend(self, hours: int = 24) -> list[models.Telemetry]:
+        with phase("telemetry"):
+            return list(await self.telemetry_repo.latest(limit=_trend_limit(hours)))
+
+    async def inventory_turnover(self, days: int = 30) -> dict:
+        with phase("sales"):
+            sold_rows = (await self.session.execute(_sold_per_slot_stmt(_cutoff(days)))).all()
+        with phase("products"):
+            products = (await self.session.scalars(_active_products_stmt())).all()
+        with phase("archive"):
+            archived = await to_thread.run_sync(archived_sales, days)
+        return _turnover(sold_rows, products, archived)
+
+    async def restock_plan(self, horizon_hours: int = 168) -> dict:
+        with phase("products"):
+            products = (await self.session.scalars(_active_products_stmt())).all()
+        with phase("forecast"):
+            return _restock_plan(products, horizon_hours)
@@ -0,0 +1,127 @@
+"""Maintenance door state kept up to date by sensor edges instead of polling.
+
+The hardware backend reports every edge of the door switch to
+:meth:`DoorSensor.edge` from its interrupt callback. A change is only accepted
+once the new level has held for ``settings.door_debounce_ms``: an edge back to
+the accepted level inside that window cancels it as contact bounce. The change
+is then stamped with the time of its first edge. Acceptance is lazy: a pending
+change is settled by the next edge or the next read, so no timer threads are
+involved.
+
+Reading :attr:`DoorSensor.is_open` returns a cached flag, and only looks at the
+clock while a change is pending. Accepted changes also go to a bounded in-memory
+history and to an unsaved queue. :func:`persist_door_events` writes that queue to
+the ``door_events`` table in one batch; the application calls it every
+``settings.door_event_flush_seconds`` and at shutdown.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from ..config import settings
+
+
+@dataclass(frozen=True)
+class DoorChange:
+    is_open: bool
+    at: datetime
+
+
+class DoorSensor:
+    """Debounced door state and change log fed by edge callbacks."""
+
+    def __init__(self, is_open: bool = False, debounce_ms: float | None = None, history: int = 200) -> None:
+        debounce_ms = settings.door_debounce_ms if debounce_ms is None else debounce_ms
+        self.debounce = timedelta(milliseconds=debounce_ms)
+        self._open = is_open
+        self._since: datetime | None = None
+        self._pending: DoorChange | None = None
+        self._recent: deque[DoorChange] = deque(maxlen=history)
+        self._unsaved: list[DoorChange] = []
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        if self._pending is not None:
+            self.settle()
+        return self._open
+
+    def edge(self, is_open: bool, at: datetime | None = None) -> None:
+        """Record the switch level seen by an edge interrupt."""
+        at = at or datetime.utcnow()
+        with self._lock:
+            pending = self._pending
+            if pending is not None:
+                if at - pending.at >= self.debounce:
+                    self._accept(pending)
+                elif is_open != pending.is_open:
+                    self._pending = None  # bounced back inside the window
+                    return
+                else:
+                    return
+            if is_open != self._open:
+                self._pending = DoorChange(is_open, at)
+
+    def settle(self, now: datetime | None = None) -> None:
+        """Accept a pending change whose level has held for the debounce window."""
+        now = now or datetime.utcnow()
+        with self._lock:
+            pending = self._pending
+            if pending is not None and now - pending.at >= self.debounce:
+                self._accept(pending)
+
+    def state(self, limit: int = 20, now: datetime | None = None) -> dict:
+        self.settle(now)
+        with self._lock:
+            recent = list(self._recent)[-limit:] if limit > 0 else []
+            return {
+                "is_open": self._open,
+                "since": self._since,
+                "events": [{"is_open": change.is_open, "at": change.at} for change in reversed(recent)],
+            }
+
+    def drain(self, now: datetime | None = None) -> list[DoorChange]:
+        """Take the accepted changes not yet persisted."""
+        self.settle(now)
+        with self._lock:
+            changes, self._unsaved = self._unsaved, []
+        return changes
+
+    def requeue(self, changes: list[DoorChange]) -> None:
+        """Put back changes whose write failed, ahead of newer ones."""
+        with self._lock:
+            self._unsaved[:0] = changes
+
+    def _accept(self, change: DoorChange) -> None:
+        """Apply ``change``; the caller must hold ``self._lock``."""
+        self._pending = None
+        self._open = change.is_open
+        self._since = change.at
+        self._recent.append(change)
+        self._unsaved.append(change)
+
+
+def persist_door_events(sensor: DoorSensor | None = None) -> int:
+    """Write accepted door changes to ``door_events`` in one batch; returns rows written."""
+    from sqlalchemy import insert
+
+    from .. import models
+    from ..database import get_engine
+    from .hardware import get_hardware
+
+    sensor = get_hardware().door if sensor is None else sensor
+    changes = sensor.drain()
+    if not changes:
+        return 0
+    rows = [{"is_open": change.is_open, "created_at": change.at} for change in changes]
+    try:
+        with get_engine().begin() as conn:
+            conn.execute(insert(models.DoorEvent.__table__), rows)
+    except Exception:
+        sensor.requeue(changes)
+        raise
+    return len(rows)
@@ -0,0 +1,250 @@
+"""Sales and turnover analytics across many machines' SQLite databases.
+
+Machines upload copies of their ``vending.db``. :class:`FleetAnalytics` keeps a
+registry of those files. Files are registered one at a time, or found by
+scanning ``settings.fleet_database_dir`` on every query, so newly copied files
+are included. Each file runs the same statements as
+:class:`~app.services.analytics.AnalyticsService` through its own read-only
+connection. Files are spread over a bounded pool of
+``settings.fleet_workers`` threads or, with ``settings.fleet_executor =
+"process"``, processes.
+
+Each file returns a partial aggregate that can be merged exactly:
+
+- sale counts and revenue in integer cents are summed;
+- top products come from the full per-product counts of every file, not from
+  each file's own top N, which would miss products that are second everywhere.
+
+Products are matched across machines by name, since slot codes and ids are
+per machine. Only the live rows in each file are counted; a machine's monthly
+archives stay on the machine.
+
+Partials are cached per file and invalidated when the file's (or its WAL's)
+modification time or size changes. The reporting window starts on a
+``settings.fleet_window_seconds`` boundary (the hour by default) rather than at
+the current second, so queries within that period can reuse the cache. The
+cache holds at most ``settings.fleet_cache_entries`` partials, evicting the
+least recently used. A machine's partials are dropped once its file is removed
+or cannot be read. A file that cannot be opened or read is listed under
+``failed`` and the rest of the fleet is still reported.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Executor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from ..config import settings
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _cutoff(days: int, now: datetime | None = None) -> datetime:
+    now = now or datetime.utcnow()
+    period = timedelta(seconds=max(1, settings.fleet_window_seconds))
+    return _EPOCH + (now - _EPOCH) // period * period - timedelta(days=days)
+
+
+def _stamp(path: Path) -> tuple:
+    stat = path.stat()
+    wal = path.with_name(path.name + "-wal")
+    wal_stat = wal.stat() if wal.exists() else None
+    return (stat.st_mtime_ns, stat.st_size, wal_stat and (wal_stat.st_mtime_ns, wal_stat.st_size))
+
+
+def file_partial(path: str, query: str, cutoff: datetime) -> dict:
+    """Partial aggregate of ``query`` for one database file; runs in a pool worker."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from sqlalchemy.pool import NullPool
+
+    from ..repositories import _sales_totals_stmt, _top_products_stmt
+    from .analytics import _active_products_stmt, _sold_per_slot_stmt
+
+    engine = create_engine(f"sqlite:///file:{path}?mode=ro&uri=true", poolclass=NullPool)
+    try:
+        with Session(engine) as session:
+            if query == "summary":
+                count, revenue = session.execute(_sales_totals_stmt(cutoff)).one()
+                products: Counter = Counter()
+                for name, sales in session.execute(_top_products_stmt(cutoff, None)):
+                    products[name] += int(sales)
+                return {"sales": int(count), "revenue_cents": int(revenue), "products": products}
+            sold = {slot: int(quantity) for slot, quantity in session.execute(_sold_per_slot_stmt(cutoff))}
+            turnover: dict[str, dict] = {}
+            for product in session.scalars(_active_products_stmt()):
+                row = turnover.setdefault(product.name, {"on_hand": 0, "sold": 0, "last_updated": product.updated_at})
+                row["on_hand"] += product.quantity
+                row["sold"] += sold.get(product.slot_code, 0)
+                row["last_updated"] = max(row["last_updated"], product.updated_at)
+            return {"products": turnover}
+    finally:
+        engine.dispose()
+
+
+class FleetAnalytics:
+    """Registry of per-machine database files with fan-out, merge and per-file caching."""
+
+    def __init__(
+        self,
+        directory: str | Path | None = None,
+        workers: int | None = None,
+        executor: str | None = None,
+        pattern: str = "*.db",
+        cache_entries: int | None = None,
+    ) -> None:
+        self.directory = Path(directory) if directory is not None else None
+        self.pattern = pattern
+        self.workers = settings.fleet_workers if workers is None else workers
+        self.executor_kind = settings.fleet_executor if executor is None else executor
+        if self.executor_kind not in ("thread", "process"):
+            raise ValueError(f"Unknown fleet executor: {self.executor_kind}")
+        self._registered: dict[str, Path] = {}
+        self.cache_entries = settings.fleet_cache_entries if cache_entries is None else cache_entries
+        # (machine, query, days) -> (stamp, cutoff, partial), least recently used first.
+        self._cache: OrderedDict[tuple[str, str, int], tuple[tuple, datetime, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Executor | None = None
+
+    def register(self, path: str | Path, machine: str | None = None) -> str:
+        path = Path(path)
+        machine = machine or path.stem
+        with self._lock:
+            self._registered[machine] = path
+        return machine
+
+    def unregister(self, machine: str) -> None:
+        with self._lock:
+            self._registered.pop(machine, None)
+            self._forget(lambda name: name == machine)
+
+    def machines(self) -> dict[str, Path]:
+        """Registered files plus those found under ``directory``, keyed by machine id."""
+        found = {}
+        if self.directory is not None:
+            for path in sorted(self.directory.rglob(self.pattern)):
+                found[path.relative_to(self.directory).with_suffix("").as_posix()] = path
+        with self._lock:
+            found.update(self._registered)
+        return found
+
+    def sales_summary(self, days: int = 30, top: int = 5) -> dict:
+        from ..repositories import summarise_sales
+
+        partials, failed = self._fan_out("summary", days)
+        sales = revenue_cents = 0
+        products: Counter = Counter()
+        for partial in partials.values():
+            sales += partial["sales"]
+            revenue_cents += partial["revenue_cents"]
+            products.update(partial["products"])
+        summary = summarise_sales(sales, revenue_cents, products.most_common(top))
+        return {**summary, "machines": len(partials), "failed": failed}
+
+    def inventory_turnover(self, days: int = 30) -> dict:
+        merged: dict[str, dict] = {}
+        partials, failed = self._fan_out("turnover", days)
+        for partial in partials.values():
+            for name, row in partial["products"].items():
+                item = merged.get(name)
+                if item is None:
+                    item = merged[name] = {
+                        "name": name,
+                        "machines": 0,
+                        "quantity_on_hand": 0,
+                        "sold_last_period": 0,
+                        "last_updated": row["last_updated"],
+                    }
+                item["machines"] += 1
+                item["quantity_on_hand"] += row["on_hand"]
+                item["sold_last_period"] += row["sold"]
+                item["last_updated"] = max(item["last_updated"], row["last_updated"])
+        products = sorted(merged.values(), key=lambda item: (-item["sold_last_period"], item["name"]))
+        return {"as_of": datetime.utcnow(), "machines": len(partials), "products": products, "failed": failed}
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    def _pool(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.executor_kind == "process":
+                    import multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor
+
+                    # Spawned, not forked: the API process has threads of its own.
+                    context = multiprocessing.get_context("spawn")
+                    self._executor = ProcessPoolExecutor(self.workers, mp_context=context)
+                else:
+                    from concurrent.futures import ThreadPoolExecutor
+
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="fleet")
+            return self._executor
+
+    def _forget(self, gone) -> None:
+        # Caller holds self._lock.
+        for key in [key for key in self._cache if gone(key[0])]:
+            del self._cache[key]
+
+    def _fan_out(self, query: str, days: int) -> tuple[dict[str, dict], list[dict]]:
+        cutoff = _cutoff(days)
+        partials: dict[str, dict] = {}
+        failed: list[dict] = []
+        pending = {}
+        machines = self.machines()
+        with self._lock:
+            self._forget(lambda machine: machine not in machines)
+        for machine, path in machines.items():
+            key = (machine, query, days)
+            try:
+                stamp = _stamp(path)
+            except OSError as exc:
+                failed.append({"machine": machine, "error": str(exc)})
+                with self._lock:
+                    self._forget(lambda name: name == machine)
+                continue
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] == stamp and cached[1] == cutoff:
+                    self._cache.move_to_end(key)
+                    partials[machine] = cached[2]
+                    continue
+                # Stale: the file changed or the window moved on.
+                self._cache.pop(key, None)
+            pending[machine] = (stamp, self._pool().submit(file_partial, os.fspath(path), query, cutoff))
+        for machine, (stamp, future) in pending.items():
+            try:
+                partials[machine] = partial = future.result()
+            except Exception as exc:  # a corrupt or half-copied file must not hide the rest of the fleet
+                failed.append({"machine": machine, "error": f"{type(exc).__name__}: {exc}"})
+                continue
+            with self._lock:
+                self._cache[(machine, query, days)] = (stamp, cutoff, partial)
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+        return partials, failed
+
+
+_fleet: FleetAnalytics | None = None
+_fleet_lock = threading.Lock()
+
+
+def get_fleet() -> FleetAnalytics:
+    global _fleet
+    if _fleet is None:
+        with _fleet_lock:
+            if _fleet is None:
+                _fleet = FleetAnalytics(settings.fleet_database_dir)
+    return _fleet
+
+
+def close_fleet() -> None:
+    if _fleet is not None:
+        _fleet.close()
@@ -0,0 +1,262 @@
+"""Stock-out forecasting from sale inventory events.
+
+Depletion is modelled per product as an exponentially weighted moving average
+of the units sold in each hour of the week (168 buckets, bucket 0 being Monday
+00:00 UTC). Each closed hour folds its sales into its bucket, so a sale costs
+O(1) to observe. A long gap between sales decays at most 168 buckets. Nothing
+ever rescans ``inventory_events`` after startup.
+
+:meth:`DepletionForecaster.rebuild` computes the same estimates from history in
+a single vectorised pass for cold starts. NumPy is only imported there, so the
+incremental path adds nothing to application start-up. A rebuild runs in the
+background while sales keep arriving. Sales observed while it runs are kept in
+a journal, and those the history query did not include are replayed on top of
+the rebuilt estimates, so no sale is lost.
+"""
+
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, Sequence
+
+from ..config import settings
+
+HOURS_PER_WEEK = 168
+_EPOCH = datetime(1970, 1, 1)
+# 1970-01-01 was a Thursday; shift hour indices so bucket 0 is Monday 00:00.
+_WEEK_OFFSET = 72
+
+
+def _hour_index(at: datetime) -> int:
+    return int((at - _EPOCH).total_seconds() // 3600)
+
+
+def _bucket(hour: int) -> int:
+    return (hour + _WEEK_OFFSET) % HOURS_PER_WEEK
+
+
+def _fold(rates: list[float], open_hour: int, units: float, until_hour: int, alpha: float) -> None:
+    """Close ``open_hour`` with ``units`` sold and every later hour before ``until_hour`` with none."""
+    decay = 1.0 - alpha
+    bucket = _bucket(open_hour)
+    rates[bucket] = alpha * units + decay * rates[bucket]
+    idle = until_hour - open_hour - 1
+    if idle >= HOURS_PER_WEEK:
+        weeks, idle = divmod(idle, HOURS_PER_WEEK)
+        factor = decay**weeks
+        rates[:] = [rate * factor for rate in rates]
+    for step in range(1, idle + 1):
+        rates[_bucket(open_hour + step)] *= decay
+
+
+class _ProductState:
+    __slots__ = ("rates", "hour", "units")
+
+    def __init__(self, hour: int, rates: list[float] | None = None, units: float = 0.0) -> None:
+        self.rates = rates if rates is not None else [0.0] * HOURS_PER_WEEK
+        self.hour = hour  # the hour still accumulating sales
+        self.units = units
+
+
+class DepletionForecaster:
+    """Per-product hour-of-week depletion rates maintained from sale events."""
+
+    def __init__(self, alpha: float | None = None, history_weeks: int | None = None) -> None:
+        self.alpha = settings.forecast_alpha if alpha is None else alpha
+        self.history_weeks = settings.forecast_history_weeks if history_weeks is None else history_weeks
+        self._states: dict[int, _ProductState] = {}
+        # Observations made since begin_rebuild(), as (product_id, units, at, event_id).
+        self._journal: list[tuple[int, int, datetime, int | None]] | None = None
+        self._lock = threading.Lock()
+
+    def observe(self, product_id: int, units: int, at: datetime | None = None, event_id: int | None = None) -> None:
+        """Record ``units`` sold from ``product_id`` at ``at`` (defaults to now).
+
+        ``event_id`` is the sale's ``inventory_events`` id, when it has one; a
+        rebuild uses it to tell whether its history query already counted the sale.
+        """
+        at = at or datetime.utcnow()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((product_id, units, at, event_id))
+            self._observe(self._states, product_id, units, _hour_index(at))
+
+    def _observe(self, states: dict[int, _ProductState], product_id: int, units: float, hour: int) -> None:
+        state = states.get(product_id)
+        if state is None:
+            state = states[product_id] = _ProductState(hour)
+        elif hour > state.hour:
+            _fold(state.rates, state.hour, state.units, hour, self.alpha)
+            state.hour = hour
+            state.units = 0.0
+        # Late events for an hour that is already closed count towards the open one.
+        state.units += units
+
+    def rates(self, product_id: int, now: datetime | None = None) -> list[float]:
+        """Expected units sold per hour-of-week bucket as of ``now``."""
+        return self._rates_at(product_id, _hour_index(now or datetime.utcnow()))
+
+    def hours_until_stockout(
+        self, product_id: int, quantity: int, now: datetime | None = None, horizon_hours: int = 4 * HOURS_PER_WEEK
+    ) -> float | None:
+        """Hours until ``quantity`` units are expected to sell, or ``None`` beyond the horizon."""
+        if quantity <= 0:
+            return 0.0
+        now = now or datetime.utcnow()
+        hour = _hour_index(now)
+        rates = self._rates_at(product_id, hour)
+        remaining = float(quantity)
+        elapsed = 0.0
+        first_span = 1.0 - (now.minute * 60 + now.second) / 3600
+        for step in range(horizon_hours):
+            span = first_span if step == 0 else 1.0
+            expected = rates[_bucket(hour + step)] * span
+            if expected >= remaining:
+                return elapsed + span * remaining / expected
+            remaining -= expected
+            elapsed += span
+        return None
+
+    def restock_plan(
+        self,
+        products: Iterable[tuple[int, str, str, int]],
+        now: datetime | None = None,
+        horizon_hours: int = HOURS_PER_WEEK,
+    ) -> list[dict]:
+        """Rank ``(id, name, slot_code, quantity)`` rows by predicted stock-out time."""
+        now = now or datetime.utcnow()
+        hour = _hour_index(now)
+        plan = []
+        for product_id, name, slot_code, quantity in products:
+            hours = self.hours_until_stockout(product_id, quantity, now, horizon_hours)
+            plan.append(
+                {
+                    "product_id": product_id,
+                    "name": name,
+                    "slot_code": slot_code,
+                    "quantity_on_hand": quantity,
+                    "daily_rate": round(sum(self._rates_at(product_id, hour)) / 7, 3),
+                    "hours_until_stockout": round(hours, 2) if hours is not None else None,
+                    "predicted_stockout_at": now + timedelta(hours=hours) if hours is not None else None,
+                }
+            )
+        plan.sort(key=lambda item: (item["hours_until_stockout"] is None, item["hours_until_stockout"] or 0.0))
+        return plan
+
+    def begin_rebuild(self) -> None:
+        """Start journaling observations; call before querying the history for :meth:`rebuild`."""
+        with self._lock:
+            self._journal = []
+
+    def rebuild(
+        self,
+        product_ids: Sequence[int],
+        units: Sequence[float],
+        timestamps: Sequence[datetime],
+        now: datetime | None = None,
+        last_event_id: int | None = None,
+    ) -> None:
+        """Replace all estimates with ones computed from historical sale events.
+
+        Produces the same rates as replaying the events through :meth:`observe`
+        (up to the truncation to ``history_weeks``), but as one weighted sum per
+        bucket instead of a Python loop per event.
+
+        After :meth:`begin_rebuild`, the journaled observations that the history
+        did not include are replayed on top. Those are observations whose
+        ``event_id`` is above ``last_event_id``, the newest id in the history,
+        and observations without an id made after ``now``, the time the history
+        was read.
+        """
+        import numpy as np
+
+        now_shifted = _hour_index(now or datetime.utcnow()) + _WEEK_OFFSET
+        weeks = self.history_weeks
+        last_row, open_bucket = divmod(now_shifted, HOURS_PER_WEEK)
+        first_row = last_row - weeks + 1
+
+        shifted = np.asarray(timestamps, dtype="datetime64[h]").astype(np.int64) + _WEEK_OFFSET
+        pids = np.asarray(product_ids, dtype=np.int64)
+        sold = np.asarray(units, dtype=np.float64)
+        keep = (shifted <= now_shifted) & (shifted // HOURS_PER_WEEK >= first_row)
+        products, index = np.unique(pids[keep], return_inverse=True)
+        rows = shifted[keep] // HOURS_PER_WEEK - first_row
+        buckets = shifted[keep] % HOURS_PER_WEEK
+
+        flat = (index * weeks + rows) * HOURS_PER_WEEK + buckets
+        counts = np.bincount(flat, weights=sold[keep], minlength=len(products) * weeks * HOURS_PER_WEEK)
+        counts = counts.reshape(len(products), weeks, HOURS_PER_WEEK)
+
+        # A bucket's latest closed occurrence is this week's if it precedes the open hour.
+        last_closed = np.where(np.arange(HOURS_PER_WEEK) < open_bucket, weeks - 1, weeks - 2)
+        age = last_closed[None, :] - np.arange(weeks)[:, None]
+        weights = np.where(age >= 0, self.alpha * (1.0 - self.alpha) ** np.clip(age, 0, None), 0.0)
+        rates = np.einsum("pwb,wb->pb", counts, weights)
+        open_units = counts[:, weeks - 1, open_bucket]
+
+        open_hour = now_shifted - _WEEK_OFFSET
+        states = {
+            int(product_id): _ProductState(open_hour, rates[i].tolist(), float(open_units[i]))
+            for i, product_id in enumerate(products)
+        }
+        read_at = now or datetime.utcnow()
+        with self._lock:
+            for product_id, sold_units, at, event_id in self._journal or ():
+                missed = at > read_at if event_id is None else last_event_id is None or event_id > last_event_id
+                if missed:
+                    self._observe(states, product_id, sold_units, _hour_index(at))
+            self._states = states
+            self._journal = None
+
+    def _rates_at(self, product_id: int, hour: int) -> list[float]:
+        with self._lock:
+            state = self._states.get(product_id)
+            if state is None:
+                return [0.0] * HOURS_PER_WEEK
+            rates = list(state.rates)
+            if hour > state.hour:
+                _fold(rates, state.hour, state.units, hour, self.alpha)
+        return rates
+
+
+_forecaster: DepletionForecaster | None = None
+_forecaster_lock = threading.Lock()
+
+
+def get_forecaster() -> DepletionForecaster:
+    """Return the process-wide forecaster, creating it on first use."""
+
+    global _forecaster
+    if _forecaster is None:
+        with _forecaster_lock:
+            if _forecaster is None:
+                _forecaster = DepletionForecaster()
+    return _forecaster
+
+
+def rebuild_from_history(forecaster: DepletionForecaster | None = None) -> int:
+    """Seed ``forecaster`` from the ``sale`` events in the database; returns events used."""
+    from sqlalchemy import select
+
+    from .. import models
+    from ..database import get_engine
+
+    forecaster = forecaster or get_forecaster()
+    forecaster.begin_rebuild()
+    now = datetime.utcnow()
+    cutoff = now - timedelta(weeks=forecaster.history_weeks)
+    events = models.InventoryEvent
+    stmt = select(events.id, events.product_id, events.change, events.created_at).where(
+        events.reason == "sale", events.created_at >= cutoff
+    )
+    with get_engine().connect() as conn:
+        rows = conn.execute(stmt).all()
+    forecaster.rebuild(
+        [row.product_id for row in rows],
+        [-row.change for row in rows],
+        [row.created_at for row in rows],
+        now=now,
+        last_event_id=max((row.id for row in rows), default=None),
+    )
+    return len(rows)
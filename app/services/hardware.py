@@ -4,11 +4,14 @@ from __future__ import annotations
 
 import logging
 import random
+import threading
 from dataclasses import dataclass
+from datetime import datetime, timedelta
 from time import sleep
 from typing import Protocol
 
 from ..config import settings
+from .door import DoorSensor
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +20,13 @@ class HardwareError(RuntimeError):
     """Raised when hardware operations fail."""
 
 
+class DispenseOutcomeUnknown(HardwareError):
+    """A dispense was sent to the hardware daemon but no reply came back; the item may have dropped."""
+
+
 class HardwareInterface(Protocol):
+    door: DoorSensor
+
     def dispense(self, slot_code: str, quantity: int) -> None:
         """Trigger the actuator to vend a product."""
 
@@ -28,13 +37,14 @@ class HardwareInterface(Protocol):
         """Return the relative humidity percentage."""
 
     def is_door_open(self) -> bool:
-        """Check the status of the maintenance door sensor."""
+        """Debounced maintenance door state, as last reported by the sensor."""
 
     def set_door_lock(self, locked: bool) -> None:
         """Lock or unlock the maintenance door."""
 
 
 _hardware_instance: HardwareInterface | None = None
+_hardware_lock = threading.Lock()
 
 
 @dataclass
@@ -47,15 +57,20 @@ class MockHardware:
     """Fallback hardware layer used for development and automated tests."""
 
     capabilities = HardwareCapabilities()
+    # Simulated actuator pulse; benchmarks shorten it to isolate software overhead.
+    dispense_delay = 0.1
 
     def __init__(self) -> None:
         self.door_locked = True
+        self.door = DoorSensor()
+        # Scripted stand-in for the door switch interrupts.
+        self.simulated_door = SimulatedDoor(self.door)
 
     def dispense(self, slot_code: str, quantity: int) -> None:
         logger.info("Dispensing %s item(s) from slot %s", quantity, slot_code)
         if quantity <= 0:
             raise HardwareError("Quantity must be positive")
-        sleep(0.1)
+        sleep(self.dispense_delay)
 
     def read_temperature(self) -> float:
         return round(random.uniform(3.5, 6.5), 2)
@@ -64,13 +79,42 @@ class MockHardware:
         return round(random.uniform(25, 60), 2)
 
     def is_door_open(self) -> bool:
-        return not self.door_locked and random.random() < 0.1
+        return self.door.is_open
 
     def set_door_lock(self, locked: bool) -> None:
         logger.info("Setting mock door lock to %s", locked)
         self.door_locked = locked
 
 
+class SimulatedDoor:
+    """Feeds door switch edges to a :class:`DoorSensor` the way the GPIO callback does."""
+
+    # Spacing of simulated contact bounce edges, well inside any sensible debounce window.
+    bounce_interval = timedelta(milliseconds=1)
+
+    def __init__(self, sensor: DoorSensor) -> None:
+        self.sensor = sensor
+
+    def open(self, at: datetime | None = None, bounces: int = 0) -> None:
+        self._switch(True, at, bounces)
+
+    def close(self, at: datetime | None = None, bounces: int = 0) -> None:
+        self._switch(False, at, bounces)
+
+    def pulse(self, seconds: float, at: datetime | None = None, bounces: int = 0) -> None:
+        """Open the door for ``seconds``, e.g. a short opening between telemetry captures."""
+        at = at or datetime.utcnow()
+        self.open(at, bounces)
+        self.close(at + timedelta(seconds=seconds), bounces)
+
+    def _switch(self, is_open: bool, at: datetime | None, bounces: int) -> None:
+        at = at or datetime.utcnow()
+        # Each bounce is a flick to the new level and back before it settles there.
+        for index in range(2 * bounces):
+            self.sensor.edge(is_open if index % 2 == 0 else not is_open, at + index * self.bounce_interval)
+        self.sensor.edge(is_open, at + 2 * bounces * self.bounce_interval)
+
+
 class GPIOHardware:
     """Concrete hardware implementation for Raspberry Pi deployments."""
 
@@ -93,18 +137,30 @@ class GPIOHardware:
         }
         self.door_sensor_channel = 27
         self.lock_relay_channel = 22
-        GPIO.setup(list(self.slot_channels.values()), GPIO.OUT)
-        GPIO.setup(self.door_sensor_channel, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        # The lock relay is driven immediately so the door is secured right after
+        # boot; slot channels are configured on first use instead.
         GPIO.setup(self.lock_relay_channel, GPIO.OUT)
         GPIO.output(self.lock_relay_channel, GPIO.HIGH)
+        # The door switch pulls the pin low when open. Edges arrive on RPi.GPIO's
+        # callback thread; debouncing is left to DoorSensor so no edge is dropped.
+        GPIO.setup(self.door_sensor_channel, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        self.door = DoorSensor(is_open=GPIO.input(self.door_sensor_channel) == GPIO.LOW)
+        GPIO.add_event_detect(self.door_sensor_channel, GPIO.BOTH, callback=self._door_edge)
+        self._configured_channels: set[int] = {self.lock_relay_channel, self.door_sensor_channel}
 
         # Optional: environment sensors (e.g., DHT22) would be initialised here.
         self.sensor = None
 
+    def _ensure_channel(self, channel: int, direction: int, **kwargs) -> None:
+        if channel not in self._configured_channels:
+            self.GPIO.setup(channel, direction, **kwargs)
+            self._configured_channels.add(channel)
+
     def dispense(self, slot_code: str, quantity: int) -> None:
         channel = self.slot_channels.get(slot_code)
         if channel is None:
             raise HardwareError(f"Unknown slot {slot_code}")
+        self._ensure_channel(channel, self.GPIO.OUT)
         for _ in range(quantity):
             self.GPIO.output(channel, self.GPIO.HIGH)
             sleep(0.5)
@@ -123,24 +179,41 @@ class GPIOHardware:
         _temperature, humidity = self.sensor.read()
         return float(humidity)
 
+    def _door_edge(self, channel: int) -> None:
+        self.door.edge(self.GPIO.input(channel) == self.GPIO.LOW)
+
     def is_door_open(self) -> bool:
-        return bool(self.GPIO.input(self.door_sensor_channel) == self.GPIO.LOW)
+        return self.door.is_open
 
     def set_door_lock(self, locked: bool) -> None:
         self.GPIO.output(self.lock_relay_channel, self.GPIO.HIGH if locked else self.GPIO.LOW)
 
 
 def get_hardware() -> HardwareInterface:
-    """Return the configured hardware backend."""
+    """Return the configured hardware backend, creating it on first use."""
 
     global _hardware_instance
     if _hardware_instance is None:
-        if settings.gpio_mode.lower() == "real":
-            try:
-                _hardware_instance = GPIOHardware()
-            except HardwareError as exc:
-                logger.warning("Falling back to mock hardware: %s", exc)
-                _hardware_instance = MockHardware()
-        else:
-            _hardware_instance = MockHardware()
+        with _hardware_lock:
+            if _hardware_instance is None:
+                _hardware_instance = _create_hardware()
     return _hardware_instance
+
+
+def _create_hardware() -> HardwareInterface:
+    if settings.hardware_socket:
+        # Another process owns the pins; see app.services.hardware_daemon.
+        from .hardware_daemon import HardwareClient
+
+        return HardwareClient(settings.hardware_socket)
+    return create_local_hardware()
+
+
+def create_local_hardware() -> HardwareInterface:
+    """Build the backend that drives the pins from this process."""
+    if settings.gpio_mode.lower() == "real":
+        try:
+            return GPIOHardware()
+        except HardwareError as exc:
+            logger.warning("Falling back to mock hardware: %s", exc)
+    return MockHardware()
@@ -0,0 +1,287 @@
+"""Single owner of the GPIO pins, serving API workers over a Unix domain socket.
+
+Only one process may configure and drive the pins. Run the daemon once::
+
+    python -m app.services.hardware_daemon
+
+Then start the API with ``PIVEND_HARDWARE_SOCKET`` pointing at the same path and
+as many uvicorn workers as there are cores. :func:`app.services.hardware.get_hardware`
+then returns a :class:`HardwareClient`, which implements ``HardwareInterface`` by
+forwarding each call.
+
+The protocol is one compact JSON array per line in each direction. A request is
+``[command, *args]``, for example ``["dispense","A1",2]``. The reply is
+``[true, result]`` or ``[false, "error message"]``; errors are raised again on
+the client as :class:`~app.services.hardware.HardwareError`. Commands that
+move or read hardware run one at a time under a lock, so two workers can never
+pulse actuators together. Door reads come from the debounced in-memory state
+and bypass the lock, as does ``ping``. ``ping`` is the health check and reports
+the backend, uptime and the number of commands served.
+
+The daemon also persists door changes, since the door sensor lives in its process.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from ..config import settings
+from .hardware import (
+    DispenseOutcomeUnknown,
+    HardwareCapabilities,
+    HardwareError,
+    HardwareInterface,
+    create_local_hardware,
+)
+
+logger = logging.getLogger(__name__)
+
+_COMMANDS = {
+    "dispense": lambda hardware, slot_code, quantity: hardware.dispense(slot_code, quantity),
+    "temperature": lambda hardware: hardware.read_temperature(),
+    "humidity": lambda hardware: hardware.read_humidity(),
+    "door_lock": lambda hardware, locked: hardware.set_door_lock(bool(locked)),
+}
+# Answered from DoorSensor's cached state, so they never wait behind a dispense.
+_UNSERIALISED = {
+    "door_open": lambda hardware: hardware.is_door_open(),
+    "door_state": lambda hardware, limit=20: hardware.door.state(limit=limit),
+}
+
+
+def _encode(message) -> bytes:
+    return json.dumps(message, separators=(",", ":"), default=str).encode() + b"\n"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        daemon: HardwareDaemon = self.server.owner  # type: ignore[attr-defined]
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, list) or not request:
+                    raise ValueError("expected a non-empty JSON array")
+                reply = daemon.execute(request[0], *request[1:])
+            except (ValueError, TypeError) as exc:
+                reply = [False, f"Malformed request: {exc}"]
+            self.wfile.write(_encode(reply))
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class HardwareDaemon:
+    """Serves one local hardware backend to any number of :class:`HardwareClient` processes."""
+
+    def __init__(self, hardware: HardwareInterface, path: str | None = None) -> None:
+        self.hardware = hardware
+        self.path = path or settings.hardware_socket or "data/hardware.sock"
+        self.started = time.monotonic()
+        self.served = 0
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # left behind by a previous run
+        self._server = _Server(self.path, _Handler)
+        self._server.owner = self  # type: ignore[attr-defined]
+        os.chmod(self.path, 0o660)
+
+    def execute(self, command: str, *args) -> list:
+        if command == "ping":
+            return [True, self.health()]
+        try:
+            if command in _UNSERIALISED:
+                result = _UNSERIALISED[command](self.hardware, *args)
+            elif command in _COMMANDS:
+                with self._lock:
+                    result = _COMMANDS[command](self.hardware, *args)
+            else:
+                return [False, f"Unknown command {command!r}"]
+        except HardwareError as exc:
+            return [False, str(exc)]
+        except Exception as exc:  # report, keep serving other workers
+            logger.exception("Hardware command %s failed", command)
+            return [False, f"{type(exc).__name__}: {exc}"]
+        self.served += 1
+        return [True, result]
+
+    def health(self) -> dict:
+        return {
+            "backend": type(self.hardware).__name__,
+            "uptime_seconds": round(time.monotonic() - self.started, 1),
+            "commands": self.served,
+            "busy": self._lock.locked(),
+        }
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever(poll_interval=0.2)
+
+    def shutdown(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class RemoteDoor:
+    """Client-side view of the daemon's ``DoorSensor``."""
+
+    def __init__(self, client: "HardwareClient") -> None:
+        self._client = client
+
+    @property
+    def is_open(self) -> bool:
+        return self._client.is_door_open()
+
+    def state(self, limit: int = 20) -> dict:
+        return self._client.call("door_state", limit)
+
+
+class HardwareClient:
+    """``HardwareInterface`` proxy for the hardware daemon; safe to share between threads.
+
+    Each thread keeps its own connection. A request on a kept connection whose
+    daemon has gone away is re-sent once on a fresh connection, but only when
+    the write itself failed, so a dispense is never repeated.
+
+    A dispense waits ``settings.hardware_dispense_timeout_seconds`` (by default
+    indefinitely) rather than ``hardware_timeout_seconds``, since it may queue
+    behind other workers' dispenses. Once a dispense has been sent, a lost reply
+    raises :class:`~app.services.hardware.DispenseOutcomeUnknown`, not a plain
+    failure: the daemon may still drop the item.
+    """
+
+    capabilities = HardwareCapabilities()
+
+    def __init__(self, path: str, timeout: float | None = None, dispense_timeout: float | None = None) -> None:
+        self.path = path
+        self.timeout = settings.hardware_timeout_seconds if timeout is None else timeout
+        self.dispense_timeout = (
+            settings.hardware_dispense_timeout_seconds if dispense_timeout is None else dispense_timeout
+        )
+        self.door = RemoteDoor(self)
+        self._local = threading.local()
+
+    def call(self, command: str, *args):
+        payload = _encode([command, *args])
+        reused = getattr(self._local, "conn", None) is not None
+        conn, reader = self._connection()
+        try:
+            try:
+                conn.sendall(payload)
+            except OSError:
+                if not reused:
+                    raise
+                # The daemon restarted since this connection was opened; nothing was sent.
+                self.close()
+                conn, reader = self._connection()
+                conn.sendall(payload)
+        except OSError as exc:
+            self.close()
+            raise HardwareError(f"Hardware daemon unavailable: {exc}") from exc
+        # The request is out; from here on a dispense may have happened.
+        lost = DispenseOutcomeUnknown if command == "dispense" else HardwareError
+        try:
+            conn.settimeout(self.dispense_timeout if command == "dispense" else self.timeout)
+            line = reader.readline()
+        except OSError as exc:
+            self.close()
+            raise lost(f"No reply from hardware daemon: {exc}") from exc
+        if not line:
+            self.close()
+            raise lost("Hardware daemon closed the connection")
+        ok, result = json.loads(line)
+        if not ok:
+            raise HardwareError(result)
+        return result
+
+    def ping(self) -> dict:
+        return self.call("ping")
+
+    def dispense(self, slot_code: str, quantity: int) -> None:
+        self.call("dispense", slot_code, quantity)
+
+    def read_temperature(self) -> float:
+        return self.call("temperature")
+
+    def read_humidity(self) -> float:
+        return self.call("humidity")
+
+    def is_door_open(self) -> bool:
+        return self.call("door_open")
+
+    def set_door_lock(self, locked: bool) -> None:
+        self.call("door_lock", locked)
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = self._local.reader = None
+            conn.close()
+
+    def _connection(self):
+        if getattr(self._local, "conn", None) is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            try:
+                conn.connect(self.path)
+            except OSError as exc:
+                conn.close()
+                raise HardwareError(f"Hardware daemon unavailable at {self.path}: {exc}") from exc
+            self._local.conn, self._local.reader = conn, conn.makefile("rb")
+        return self._local.conn, self._local.reader
+
+
+def _persist_door_loop(daemon: HardwareDaemon, stop: threading.Event) -> None:
+    from .door import persist_door_events
+
+    while not stop.wait(settings.door_event_flush_seconds):
+        try:
+            persist_door_events(daemon.hardware.door)
+        except Exception:
+            logger.exception("Persisting door events failed")
+
+
+def main(argv: list[str] | None = None) -> None:  # pragma: no cover - process entry point
+    import argparse
+    import signal
+
+    parser = argparse.ArgumentParser(description="Serve the vending hardware to API workers.")
+    parser.add_argument("--socket", default=settings.hardware_socket or "data/hardware.sock")
+    parser.add_argument("--check", action="store_true", help="ping a running daemon and exit non-zero if it is down")
+    args = parser.parse_args(argv)
+    if args.check:
+        try:
+            print(json.dumps(HardwareClient(args.socket, timeout=5).ping()))
+        except HardwareError as exc:
+            raise SystemExit(str(exc)) from exc
+        return
+
+    from ..database import init_db
+    from .door import persist_door_events
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    daemon = HardwareDaemon(create_local_hardware(), args.socket)
+    stop = threading.Event()
+    flusher = threading.Thread(target=_persist_door_loop, args=(daemon, stop), daemon=True)
+    flusher.start()
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=daemon.shutdown).start())
+    logger.info("Hardware daemon (%s) listening on %s", type(daemon.hardware).__name__, daemon.path)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        daemon.shutdown()
+    finally:
+        stop.set()
+        persist_door_events(daemon.hardware.door)
+
+
+if __name__ == "__main__":  # pragma: no cover - process entry point
+    main()
@@ -2,13 +2,45 @@
 
 from __future__ import annotations
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from .. import models
-from ..repositories import InventoryRepository, ProductRepository
+from ..repositories import (
+    AsyncInventoryRepository,
+    AsyncProductRepository,
+    InventoryRepository,
+    ProductRepository,
+)
 from ..schemas import InventoryAdjustment, ProductCreate, ProductUpdate
 
 
+def _new_product(payload: ProductCreate) -> models.Product:
+    return models.Product(
+        name=payload.name,
+        slot_code=payload.slot_code.upper(),
+        price_cents=payload.price_cents,
+        quantity=payload.quantity,
+        is_active=payload.is_active,
+    )
+
+
+def _apply_update(product: models.Product, payload: ProductUpdate) -> int:
+    """Apply ``payload`` to ``product`` and return the resulting stock difference."""
+
+    if payload.name is not None:
+        product.name = payload.name
+    if payload.price is not None:
+        product.price_cents = payload.price_cents
+    if payload.is_active is not None:
+        product.is_active = payload.is_active
+    difference = 0
+    if payload.quantity is not None:
+        difference = payload.quantity - product.quantity
+        product.quantity = payload.quantity
+    return difference
+
+
 class InventoryService:
     def __init__(self, session: Session):
         self.session = session
@@ -19,13 +51,7 @@ class InventoryService:
         return list(self.products.list_products(active_only=active_only))
 
     def create_product(self, payload: ProductCreate) -> models.Product:
-        product = models.Product(
-            name=payload.name,
-            slot_code=payload.slot_code.upper(),
-            price=float(payload.price),
-            quantity=payload.quantity,
-            is_active=payload.is_active,
-        )
+        product = _new_product(payload)
         self.products.create(product)
         if payload.quantity:
             self.inventory.log_event(
@@ -35,19 +61,11 @@ class InventoryService:
 
     def update_product(self, product_id: int, payload: ProductUpdate) -> models.Product:
         product = self._get_product_or_error(product_id)
-        if payload.name is not None:
-            product.name = payload.name
-        if payload.price is not None:
-            product.price = float(payload.price)
-        if payload.is_active is not None:
-            product.is_active = payload.is_active
-        if payload.quantity is not None:
-            difference = payload.quantity - product.quantity
-            product.quantity = payload.quantity
-            if difference:
-                self.inventory.log_event(
-                    models.InventoryEvent(product_id=product.id, change=difference, reason="manual_adjustment")
-                )
+        difference = _apply_update(product, payload)
+        if difference:
+            self.inventory.log_event(
+                models.InventoryEvent(product_id=product.id, change=difference, reason="manual_adjustment")
+            )
         self.session.flush()
         self.session.refresh(product)
         return product
@@ -67,3 +85,49 @@ class InventoryService:
         if product is None:
             raise ValueError(f"Product {product_id} not found")
         return product
+
+
+class AsyncInventoryService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.products = AsyncProductRepository(session)
+        self.inventory = AsyncInventoryRepository(session)
+
+    async def list_products(self, active_only: bool = False) -> list[models.Product]:
+        return list(await self.products.list_products(active_only=active_only))
+
+    async def create_product(self, payload: ProductCreate) -> models.Product:
+        product = _new_product(payload)
+        await self.products.create(product)
+        if payload.quantity:
+            await self.inventory.log_event(
+                models.InventoryEvent(product_id=product.id, change=payload.quantity, reason="initial_stock")
+            )
+        return product
+
+    async def update_product(self, product_id: int, payload: ProductUpdate) -> models.Product:
+        product = await self._get_product_or_error(product_id)
+        difference = _apply_update(product, payload)
+        if difference:
+            await self.inventory.log_event(
+                models.InventoryEvent(product_id=product.id, change=difference, reason="manual_adjustment")
+            )
+        await self.session.flush()
+        await self.session.refresh(product)
+        return product
+
+    async def adjust_inventory(self, adjustment: InventoryAdjustment) -> models.Product:
+        product = await self._get_product_or_error(adjustment.product_id)
+        product.quantity += adjustment.change
+        await self.inventory.log_event(
+            models.InventoryEvent(product_id=product.id, change=adjustment.change, reason=adjustment.reason)
+        )
+        await self.session.flush()
+        await self.session.refresh(product)
+        return product
+
+    async def _get_product_or_error(self, product_id: int) -> models.Product:
+        product = await self.products.get(product_id)
+        if product is None:
+            raise ValueError(f"Product {product_id} not found")
+        return product
@@ -0,0 +1,242 @@
+"""Online anomaly detection over the telemetry stream.
+
+:class:`TelemetryMonitor` is fed every captured sample and keeps constant-size
+state: Welford running mean and variance for temperature and humidity, time
+spent above the temperature limit, and maintenance-door open durations. Alerts
+are raised only after ``debounce_samples`` consecutive breaching samples and
+cleared with hysteresis, so a reading hovering around a limit does not flap.
+The current state is served from memory without a database query.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RunningStats:
+    """Welford's single-pass mean and variance."""
+
+    __slots__ = ("count", "mean", "_m2")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+@dataclass
+class TelemetryAlert:
+    kind: str
+    message: str
+    raised_at: datetime
+    peak_value: float
+    cleared_at: datetime | None = None
+
+
+class _Latch:
+    """Debounced alert condition with separate raise and clear tests."""
+
+    __slots__ = ("breaches", "alert")
+
+    def __init__(self) -> None:
+        self.breaches = 0
+        self.alert: TelemetryAlert | None = None
+
+
+class TelemetryMonitor:
+    """Constant-memory detector for temperature excursions and open doors."""
+
+    def __init__(
+        self,
+        temperature_high_c: float | None = None,
+        temperature_low_c: float | None = None,
+        hysteresis_c: float | None = None,
+        debounce_samples: int | None = None,
+        door_open_alert_seconds: float | None = None,
+        zscore_threshold: float | None = None,
+        warmup_samples: int | None = None,
+        history: int = 100,
+    ) -> None:
+        self.temperature_high_c = _default(temperature_high_c, settings.monitor_temperature_high_c)
+        self.temperature_low_c = _default(temperature_low_c, settings.monitor_temperature_low_c)
+        self.hysteresis_c = _default(hysteresis_c, settings.monitor_hysteresis_c)
+        self.debounce_samples = _default(debounce_samples, settings.monitor_debounce_samples)
+        self.door_open_alert_seconds = _default(door_open_alert_seconds, settings.monitor_door_open_alert_seconds)
+        self.zscore_threshold = _default(zscore_threshold, settings.monitor_zscore_threshold)
+        self.warmup_samples = _default(warmup_samples, settings.monitor_warmup_samples)
+
+        self.temperature = RunningStats()
+        self.humidity = RunningStats()
+        self.seconds_above_threshold = 0.0
+        self.door_open_total_seconds = 0.0
+        self.door_openings = 0
+        self._last_at: datetime | None = None
+        self._last_temperature: float | None = None
+        self._door_open_since: datetime | None = None
+        self._latches = {kind: _Latch() for kind in ("temperature_high", "temperature_low", "temperature_anomaly")}
+        self._door_latch = _Latch()
+        self._recent: deque[TelemetryAlert] = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    @property
+    def last_at(self) -> datetime | None:
+        """Timestamp of the newest sample observed so far."""
+        return self._last_at
+
+    def observe(self, temperature_c: float, humidity: float, door_open: bool, at: datetime | None = None) -> None:
+        """Fold one sample into the running state and update alerts.
+
+        Samples not newer than the last one observed (late uploads, duplicates)
+        are ignored: the durations and alerts are built from time-ordered samples.
+        """
+        at = at or datetime.utcnow()
+        with self._lock:
+            if self._last_at is not None and at <= self._last_at:
+                return
+            if self._last_at is not None:
+                elapsed = (at - self._last_at).total_seconds()
+                if self._last_temperature is not None and self._last_temperature > self.temperature_high_c:
+                    self.seconds_above_threshold += elapsed
+                if self._door_open_since is not None:
+                    self.door_open_total_seconds += elapsed
+            self._last_at = at
+            self._last_temperature = temperature_c
+
+            # Score against the statistics *before* this sample joins them.
+            zscore = 0.0
+            if self.temperature.count >= self.warmup_samples and self.temperature.std > 0:
+                zscore = abs(temperature_c - self.temperature.mean) / self.temperature.std
+
+            self._update(
+                "temperature_high",
+                temperature_c,
+                at,
+                breach=temperature_c > self.temperature_high_c,
+                clear=temperature_c < self.temperature_high_c - self.hysteresis_c,
+                message=f"Temperature above {self.temperature_high_c:.1f}°C",
+            )
+            self._update(
+                "temperature_low",
+                temperature_c,
+                at,
+                breach=temperature_c < self.temperature_low_c,
+                clear=temperature_c > self.temperature_low_c + self.hysteresis_c,
+                message=f"Temperature below {self.temperature_low_c:.1f}°C",
+            )
+            self._update(
+                "temperature_anomaly",
+                temperature_c,
+                at,
+                breach=zscore > self.zscore_threshold,
+                clear=zscore < self.zscore_threshold / 2,
+                message=f"Temperature deviates more than {self.zscore_threshold:g} standard deviations",
+            )
+            self.temperature.update(temperature_c)
+            self.humidity.update(humidity)
+            self._update_door(door_open, at)
+
+    def state(self, now: datetime | None = None) -> dict:
+        """Snapshot of the running statistics and alerts."""
+        now = now or datetime.utcnow()
+        with self._lock:
+            open_seconds = (now - self._door_open_since).total_seconds() if self._door_open_since else 0.0
+            active = [latch.alert for latch in (*self._latches.values(), self._door_latch) if latch.alert]
+            return {
+                "as_of": now,
+                "stats": {
+                    "samples": self.temperature.count,
+                    "temperature_mean": round(self.temperature.mean, 3),
+                    "temperature_std": round(self.temperature.std, 3),
+                    "humidity_mean": round(self.humidity.mean, 3),
+                    "humidity_std": round(self.humidity.std, 3),
+                    "seconds_above_threshold": round(self.seconds_above_threshold, 1),
+                    "door_open": self._door_open_since is not None,
+                    "door_open_seconds": round(max(open_seconds, 0.0), 1),
+                    "door_open_total_seconds": round(self.door_open_total_seconds, 1),
+                    "door_openings": self.door_openings,
+                },
+                "active": [asdict(alert) for alert in active],
+                "recent": [asdict(alert) for alert in reversed(self._recent)],
+            }
+
+    def _update(self, kind: str, value: float, at: datetime, breach: bool, clear: bool, message: str) -> None:
+        latch = self._latches[kind]
+        if latch.alert is None:
+            latch.breaches = latch.breaches + 1 if breach else 0
+            if latch.breaches >= self.debounce_samples:
+                self._raise(latch, TelemetryAlert(kind, message, at, value))
+        else:
+            worst = min if kind == "temperature_low" else max
+            latch.alert.peak_value = worst(latch.alert.peak_value, value)
+            if clear:
+                self._clear(latch, at)
+
+    def _update_door(self, door_open: bool, at: datetime) -> None:
+        latch = self._door_latch
+        if not door_open:
+            self._door_open_since = None
+            if latch.alert is not None:
+                self._clear(latch, at)
+            return
+        if self._door_open_since is None:
+            self._door_open_since = at
+            self.door_openings += 1
+        open_seconds = (at - self._door_open_since).total_seconds()
+        if latch.alert is None and open_seconds >= self.door_open_alert_seconds:
+            message = f"Maintenance door open for more than {self.door_open_alert_seconds:g}s"
+            self._raise(latch, TelemetryAlert("door_open", message, self._door_open_since, open_seconds))
+        elif latch.alert is not None:
+            latch.alert.peak_value = open_seconds
+
+    def _raise(self, latch: _Latch, alert: TelemetryAlert) -> None:
+        latch.alert = alert
+        self._recent.append(alert)
+        logger.warning("Telemetry alert raised: %s (%s)", alert.kind, alert.message)
+
+    def _clear(self, latch: _Latch, at: datetime) -> None:
+        latch.alert.cleared_at = at
+        logger.info("Telemetry alert cleared: %s", latch.alert.kind)
+        latch.alert = None
+        latch.breaches = 0
+
+
+def _default(value, fallback):
+    return fallback if value is None else value
+
+
+_monitor: TelemetryMonitor | None = None
+_monitor_lock = threading.Lock()
+
+
+def get_monitor() -> TelemetryMonitor:
+    """Return the process-wide telemetry monitor, creating it on first use."""
+
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = TelemetryMonitor()
+    return _monitor
@@ -2,20 +2,18 @@
 
 In production this module would integrate with a payment gateway.
 For the prototype we provide a simple validator that ensures the
-paid amount covers the requested purchase."""
+paid amount covers the requested purchase. Amounts are integer cents."""
 
 from __future__ import annotations
 
-from decimal import Decimal
-
 
 class PaymentError(RuntimeError):
     pass
 
 
 class PaymentService:
-    def authorise(self, total_cost: Decimal, amount_paid: Decimal, method: str) -> None:
-        if amount_paid < total_cost:
+    def authorise(self, total_cents: int, paid_cents: int, method: str) -> None:
+        if paid_cents < total_cents:
             raise PaymentError("Insufficient funds")
         if method.lower() not in {"cash", "card", "mobile"}:
             raise PaymentError(f"Unsupported payment method: {method}")
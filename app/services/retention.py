@@ -0,0 +1,414 @@
+"""Retention and archival of old sales, inventory events and telemetry.
+
+Rows older than ``settings.retention_days`` (cut at UTC midnight) are moved out
+of SQLite into gzip-compressed JSON-lines files, one per table and month, under
+``settings.archive_dir``. A ``manifest.json`` next to them keeps a summary of
+every archived month, so summaries over old periods read a few numbers instead
+of decompressing rows. Only months that straddle a requested range boundary are
+scanned.
+
+Each batch is appended to its archive file before the rows are deleted from the
+database. A crash between the two steps can therefore only duplicate rows in
+the archive, never lose them. Readers and the month summaries de-duplicate by
+row id.
+"""
+
+from __future__ import annotations
+
+import enum
+import gzip
+import json
+import logging
+import os
+import threading
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from ..config import settings
+from ..money import from_cents
+from . import telemetry_blocks
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_TABLES = ("sales", "inventory_events", "telemetry")
+
+
+class ExportDataset(str, enum.Enum):
+    sales = "sales"
+    inventory_events = "inventory_events"
+    telemetry = "telemetry"
+
+
+def _month(created_at: str) -> str:
+    return created_at[:7]
+
+
+def _cents(amount) -> int:
+    return int((Decimal(str(amount)) * 100).to_integral_value())
+
+
+def _summarise(table: str, rows: list[dict]) -> dict:
+    summary: dict = {"rows": len(rows)}
+    if table == "sales":
+        products: dict[str, dict] = {}
+        sales = revenue = failed = 0
+        for row in rows:
+            if row["status"] != "success":
+                failed += 1
+                continue
+            cents = _cents(row["total_price"])
+            sales += 1
+            revenue += cents
+            product = products.setdefault(
+                row["slot_code"], {"name": row["name"], "sales": 0, "units": 0, "revenue_cents": 0}
+            )
+            product["sales"] += 1
+            product["units"] += row["quantity"]
+            product["revenue_cents"] += cents
+        summary.update(sales=sales, failed=failed, revenue_cents=revenue, products=products)
+    elif table == "telemetry":
+        temperatures = [row["temperature_c"] for row in rows]
+        summary.update(
+            temperature_min=min(temperatures, default=None),
+            temperature_max=max(temperatures, default=None),
+            temperature_mean=sum(temperatures) / len(temperatures) if temperatures else None,
+            door_open_samples=sum(1 for row in rows if row["door_open"]),
+        )
+    else:
+        net_change: dict[str, int] = {}
+        for row in rows:
+            key = str(row["product_id"])
+            net_change[key] = net_change.get(key, 0) + row["change"]
+        summary.update(net_change=net_change)
+    return summary
+
+
+class ArchiveStore:
+    """Monthly compressed archive files plus a manifest of per-month summaries."""
+
+    def __init__(self, directory: str | Path | None = None) -> None:
+        self.directory = Path(directory or settings.archive_dir)
+        self._lock = threading.Lock()
+        self._manifest: dict | None = None
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.directory / "manifest.json"
+
+    def path(self, table: str, month: str) -> Path:
+        return self.directory / f"{table}-{month}.jsonl.gz"
+
+    def manifest(self) -> dict:
+        with self._lock:
+            if self._manifest is None:
+                try:
+                    self._manifest = json.loads(self.manifest_path.read_text())
+                except FileNotFoundError:
+                    self._manifest = {"archived_before": None, "tables": {}}
+            return self._manifest
+
+    @property
+    def archived_before(self) -> datetime | None:
+        value = self.manifest()["archived_before"]
+        return datetime.fromisoformat(value) if value else None
+
+    def months(self, table: str) -> list[str]:
+        return sorted(self.manifest()["tables"].get(table, {}))
+
+    def append(self, table: str, rows: list[dict]) -> set[str]:
+        """Durably append ``rows`` to their month files; returns the months touched."""
+        by_month: dict[str, list[dict]] = {}
+        for row in rows:
+            by_month.setdefault(_month(row["created_at"]), []).append(row)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for month, month_rows in by_month.items():
+            payload = "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in month_rows)
+            # Each append is a new gzip member; gzip readers treat the file as one stream.
+            with open(self.path(table, month), "ab") as handle:
+                handle.write(gzip.compress(payload.encode()))
+                handle.flush()
+                os.fsync(handle.fileno())
+        return set(by_month)
+
+    def read_month(self, table: str, month: str) -> list[dict]:
+        try:
+            with gzip.open(self.path(table, month), "rt") as handle:
+                rows = {row["id"]: row for row in map(json.loads, handle)}
+        except FileNotFoundError:
+            return []
+        return sorted(rows.values(), key=lambda row: (row["created_at"], row["id"]))
+
+    def refresh(self, table: str, months: set[str], archived_before: datetime | None = None) -> None:
+        """Recompute summaries for ``months`` and atomically rewrite the manifest."""
+        manifest = self.manifest()
+        summaries = {month: _summarise(table, self.read_month(table, month)) for month in months}
+        with self._lock:
+            manifest["tables"].setdefault(table, {}).update(summaries)
+            if archived_before is not None:
+                manifest["archived_before"] = archived_before.isoformat()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            scratch = self.manifest_path.with_suffix(".tmp")
+            scratch.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+            os.replace(scratch, self.manifest_path)
+
+    def iter_rows(self, table: str, start: datetime | None = None, end: datetime | None = None) -> Iterator[dict]:
+        """Yield archived rows with ``start <= created_at < end`` in time order."""
+        low = start.isoformat() if start else ""
+        high = end.isoformat() if end else "~"
+        for month in self.months(table):
+            if month < low[:7] or month > high[:7]:
+                continue
+            for row in self.read_month(table, month):
+                if low <= row["created_at"] < high:
+                    yield row
+
+    def summary(self, table: str, start: datetime | None = None, end: datetime | None = None) -> list[dict]:
+        """Per-month summaries covering ``[start, end)``, scanning only partial months."""
+        low = start.isoformat() if start else ""
+        high = end.isoformat() if end else "~"
+        summaries = []
+        stored = self.manifest()["tables"].get(table, {})
+        for month in sorted(stored):
+            if month < low[:7] or month > high[:7]:
+                continue
+            if month == low[:7] or month == high[:7]:
+                rows = [row for row in self.read_month(table, month) if low <= row["created_at"] < high]
+                summaries.append(_summarise(table, rows))
+            else:
+                summaries.append(stored[month])
+        return summaries
+
+    def net_inventory_change(self) -> dict[int, int]:
+        """Net archived stock change per product id, from the month summaries."""
+        totals: dict[int, int] = {}
+        for month in self.manifest()["tables"].get("inventory_events", {}).values():
+            for product_id, change in month["net_change"].items():
+                totals[int(product_id)] = totals.get(int(product_id), 0) + change
+        return totals
+
+    def sales_totals(self, start: datetime | None = None, end: datetime | None = None) -> dict:
+        """Successful archived sales in ``[start, end)`` merged across months."""
+        totals: dict = {"sales": 0, "revenue_cents": 0, "products": {}}
+        for month in self.summary("sales", start, end):
+            totals["sales"] += month["sales"]
+            totals["revenue_cents"] += month["revenue_cents"]
+            for slot_code, product in month["products"].items():
+                merged = totals["products"].setdefault(
+                    slot_code, {"name": product["name"], "sales": 0, "units": 0, "revenue_cents": 0}
+                )
+                for key in ("sales", "units", "revenue_cents"):
+                    merged[key] += product[key]
+        return totals
+
+
+def archived_sales(days: int) -> dict | None:
+    """Archived sales inside the last ``days``, or ``None`` if the window is all live data."""
+    archive = get_archive()
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    archived_before = archive.archived_before
+    if archived_before is None or cutoff >= archived_before:
+        return None
+    return archive.sales_totals(start=cutoff)
+
+
+def _serialise(table: str, row) -> dict:
+    data = dict(row._mapping)
+    data["created_at"] = data["created_at"].isoformat()
+    if table == "sales":
+        # Archives and CSV exports keep the API's decimal ``total_price`` column, in place.
+        row = {}
+        for key, value in data.items():
+            if key == "total_cents":
+                key, value = "total_price", str(from_cents(value))
+            row[key] = value
+        data = row
+        data["status"] = data["status"].value
+    return data
+
+
+def _select(table: str):
+    from sqlalchemy import select
+
+    from .. import models
+
+    if table == "sales":
+        sale = models.Sale.__table__
+        product = models.Product.__table__
+        return select(sale, product.c.name, product.c.slot_code).join(product, sale.c.product_id == product.c.id)
+    model = models.InventoryEvent if table == "inventory_events" else models.Telemetry
+    return select(model.__table__)
+
+
+def run_retention(
+    now: datetime | None = None,
+    retention_days: int | None = None,
+    archive: ArchiveStore | None = None,
+    batch_size: int = 5_000,
+) -> dict[str, int]:
+    """Archive and delete rows older than the retention horizon; returns rows moved per table."""
+    from sqlalchemy import delete
+
+    from .. import models
+    from ..database import get_engine
+
+    retention_days = settings.retention_days if retention_days is None else retention_days
+    archive = archive or get_archive()
+    now = now or datetime.utcnow()
+    cutoff = datetime.combine((now - timedelta(days=retention_days)).date(), datetime.min.time())
+    tables = {
+        "sales": models.Sale.__table__,
+        "inventory_events": models.InventoryEvent.__table__,
+        "telemetry": models.Telemetry.__table__,
+    }
+
+    moved: dict[str, int] = {}
+    for name, table in tables.items():
+        if name == "telemetry" and telemetry_blocks.enabled():
+            moved[name] = _archive_telemetry_blocks(archive, cutoff)
+            continue
+        stmt = _select(name).where(table.c.created_at < cutoff).order_by(table.c.id).limit(batch_size)
+        touched: set[str] = set()
+        moved[name] = 0
+        while True:
+            with get_engine().begin() as conn:
+                rows = [_serialise(name, row) for row in conn.execute(stmt)]
+                if not rows:
+                    break
+                touched |= archive.append(name, rows)
+                conn.execute(delete(table).where(table.c.id.in_([row["id"] for row in rows])))
+            moved[name] += len(rows)
+        if touched:
+            archive.refresh(name, touched, archived_before=cutoff)
+    if moved["sales"]:
+        from .sales_columns import get_sales_columns
+
+        get_sales_columns().drop_before(cutoff)
+    if any(moved.values()):
+        logger.info("Archived rows older than %s: %s", cutoff.date(), moved)
+    return moved
+
+
+def _archive_telemetry_blocks(archive: ArchiveStore, cutoff: datetime, batch_blocks: int = 24) -> int:
+    """Block-storage counterpart of the row loop in :func:`run_retention`.
+
+    ``cutoff`` is a UTC midnight, so an hour block is always entirely on one side of it.
+    """
+    from sqlalchemy import select
+
+    from ..database import get_engine
+    from ..models import TelemetryBlock
+
+    table = TelemetryBlock.__table__
+    stmt = select(table).where(table.c.start < cutoff).order_by(table.c.start).limit(batch_blocks)
+    touched: set[str] = set()
+    moved = 0
+    while True:
+        with get_engine().begin() as conn:
+            blocks = conn.execute(stmt).all()
+            if not blocks:
+                break
+            rows = telemetry_blocks.to_rows(telemetry_blocks.decode_all(blocks))
+            for row in rows:
+                row["created_at"] = row["created_at"].isoformat()
+            touched |= archive.append("telemetry", rows)
+            telemetry_blocks.TelemetryBlocks(conn).delete(block.id for block in blocks)
+        moved += len(rows)
+    if touched:
+        archive.refresh("telemetry", touched, archived_before=cutoff)
+    return moved
+
+
+def export_rows(table: str, start: datetime | None = None, end: datetime | None = None) -> Iterator[dict]:
+    """Yield rows of ``table`` in ``[start, end)`` from the archive and then the live table."""
+    from .. import models
+    from ..database import get_read_engine
+
+    if table not in ARCHIVED_TABLES:
+        raise ValueError(f"Unknown dataset: {table}")
+    yield from get_archive().iter_rows(table, start, end)
+    if table == "telemetry" and telemetry_blocks.enabled():
+        yield from _export_telemetry_blocks(start, end)
+        return
+
+    column = {
+        "sales": models.Sale.created_at,
+        "inventory_events": models.InventoryEvent.created_at,
+        "telemetry": models.Telemetry.created_at,
+    }[table]
+    stmt = _select(table).order_by(column)
+    if start is not None:
+        stmt = stmt.where(column >= start)
+    if end is not None:
+        stmt = stmt.where(column < end)
+    with get_read_engine().connect() as conn:
+        for row in conn.execute(stmt.execution_options(yield_per=1_000)):
+            yield _serialise(table, row)
+
+
+def _export_telemetry_blocks(start: datetime | None, end: datetime | None) -> Iterator[dict]:
+    from sqlalchemy import func, select
+
+    from ..database import get_read_engine
+    from ..models import TelemetryBlock
+
+    table = TelemetryBlock.__table__
+    with get_read_engine().connect() as conn:
+        first = conn.scalar(select(func.min(table.c.start)))
+        if first is None:
+            return
+        day = max(start, first) if start is not None else first
+        last = conn.scalar(select(func.max(table.c.start)))
+        blocks = telemetry_blocks.TelemetryBlocks(conn)
+        # A day of blocks at a time keeps memory flat for long exports.
+        while day <= last and (end is None or day < end):
+            until = day + timedelta(days=1)
+            for row in blocks.rows(day, until - timedelta(microseconds=1)):
+                if end is not None and row["created_at"] >= end:
+                    return
+                row["created_at"] = row["created_at"].isoformat()
+                yield row
+            day = until
+
+
+def iter_csv(rows: Iterator[dict]) -> Iterator[str]:
+    """Render exported rows as CSV text chunks, header first."""
+    import csv
+    import io
+
+    buffer = io.StringIO()
+    writer = None
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row))
+            writer.writeheader()
+        writer.writerow(row)
+        if buffer.tell() > 64_000:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+_archive: ArchiveStore | None = None
+_archive_lock = threading.Lock()
+
+
+def get_archive() -> ArchiveStore:
+    """Return the process-wide archive store, creating it on first use."""
+
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = ArchiveStore()
+    return _archive
+
+
+if __name__ == "__main__":  # pragma: no cover - manual maintenance entry point
+    logging.basicConfig(level=logging.INFO)
+    from ..database import init_db
+
+    init_db()
+    print(run_retention())
@@ -0,0 +1,354 @@
+"""Columnar in-memory copy of the sales table for ad-hoc slicing.
+
+:class:`SalesColumns` keeps one NumPy array per field (id, timestamp, product,
+quantity, cents, payment method and status). It is filled from the database
+at startup by :func:`load_from_history` and appended to on every vend. Payment
+methods and statuses are dictionary-encoded as small integers.
+
+:meth:`SalesColumns.query` filters, groups and aggregates with vectorised
+operations. Groups are found by offsetting each key to start at zero and
+combining the keys into one integer, so the aggregates are ``bincount`` calls
+rather than a sort, as long as the combined key space stays small.
+
+Arrays grow by doubling and rows are only ever appended past the current
+length. A query therefore takes views of the first ``n`` rows under the lock
+and computes without holding it. The copy covers the live ``sales`` table;
+rows moved out by retention are dropped from it as well.
+"""
+
+from __future__ import annotations
+
+import enum
+import threading
+from datetime import date, datetime, timedelta
+from typing import Iterable, Sequence
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROS_PER_HOUR = 3_600_000_000
+_MICROS_PER_DAY = 24 * _MICROS_PER_HOUR
+SUCCESS = "success"
+# Above this many possible key combinations groups are found by sorting instead.
+_DENSE_GROUP_LIMIT = 1 << 22
+
+
+class SalesDimension(str, enum.Enum):
+    product_id = "product_id"
+    payment_method = "payment_method"
+    status = "status"
+    hour = "hour"
+    weekday = "weekday"
+    day = "day"
+
+
+class SalesMetric(str, enum.Enum):
+    sales = "sales"
+    units = "units"
+    revenue_cents = "revenue_cents"
+    avg_ticket_cents = "avg_ticket_cents"
+    failed = "failed"
+    failure_rate = "failure_rate"
+
+
+_FIELDS = {
+    "id": "int64",
+    "at": "int64",  # microseconds since the epoch, UTC
+    "product_id": "int64",
+    "quantity": "int32",
+    "cents": "int64",
+    "method": "int16",
+    "status": "int8",
+}
+
+
+def _micros(at: datetime) -> int:
+    return (at - _EPOCH) // timedelta(microseconds=1)
+
+
+class SalesColumns:
+    """Sales as parallel NumPy arrays with filter/group-by/aggregate queries."""
+
+    def __init__(self, capacity: int = 1_024) -> None:
+        import numpy as np
+
+        self._lock = threading.Lock()
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in _FIELDS.items()}
+        self._size = 0
+        self._codes: dict[str, dict[str, int]] = {"method": {}, "status": {}}
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(
+        self,
+        sale_id: int,
+        created_at: datetime,
+        product_id: int,
+        quantity: int,
+        cents: int,
+        payment_method: str,
+        status: str,
+    ) -> None:
+        with self._lock:
+            if self._size == len(self._columns["id"]):
+                self._reserve(2 * self._size)
+            row = self._size
+            columns = self._columns
+            columns["id"][row] = sale_id
+            columns["at"][row] = _micros(created_at)
+            columns["product_id"][row] = product_id
+            columns["quantity"][row] = quantity
+            columns["cents"][row] = cents
+            columns["method"][row] = self._code("method", payment_method)
+            columns["status"][row] = self._code("status", status)
+            self._size = row + 1
+
+    def replace(
+        self,
+        ids: Sequence[int],
+        created_at: Sequence[datetime],
+        product_ids: Sequence[int],
+        quantities: Sequence[int],
+        cents: Sequence[int],
+        payment_methods: Sequence[str],
+        statuses: Sequence[str],
+    ) -> None:
+        """Swap in a full history, keeping rows appended since with a higher id."""
+        import numpy as np
+
+        with self._lock:
+            loaded = {
+                "id": np.asarray(ids, dtype=np.int64),
+                "at": np.asarray(created_at, dtype="datetime64[us]").astype(np.int64),
+                "product_id": np.asarray(product_ids, dtype=np.int64),
+                "quantity": np.asarray(quantities, dtype=np.int32),
+                "cents": np.asarray(cents, dtype=np.int64),
+                "method": self._encode("method", payment_methods).astype(np.int16),
+                "status": self._encode("status", statuses).astype(np.int8),
+            }
+            newest = int(loaded["id"].max()) if len(loaded["id"]) else 0
+            current = {name: values[: self._size] for name, values in self._columns.items()}
+            later = current["id"] > newest
+            merged = {name: np.concatenate([loaded[name], current[name][later]]) for name in _FIELDS}
+            self._install(merged)
+            self.loaded = True
+
+    def drop_product(self, product_id: int) -> None:
+        self._drop(lambda columns: columns["product_id"] == product_id)
+
+    def drop_before(self, cutoff: datetime) -> None:
+        self._drop(lambda columns: columns["at"] < _micros(cutoff))
+
+    def query(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        *,
+        product_ids: Iterable[int] = (),
+        payment_methods: Iterable[str] = (),
+        statuses: Iterable[str] = (),
+        group_by: Sequence[SalesDimension | str] = (),
+        metrics: Sequence[SalesMetric | str] = (),
+    ) -> list[dict]:
+        """Aggregate sales with ``start <= created_at < end`` matching the filters.
+
+        Returns one row per group holding the ``group_by`` keys and the
+        requested ``metrics`` (all of them by default), ordered by key, with
+        payment methods and statuses in the order they were first seen. ``sales``,
+        ``units`` and revenue count successful sales only, as the summaries do;
+        ``failed`` and ``failure_rate`` count the others. ``weekday`` is 0 for
+        Monday and ``hour`` is the UTC hour of day.
+        """
+        import numpy as np
+
+        group_by = [SalesDimension(key) for key in group_by]
+        metrics = [SalesMetric(metric) for metric in metrics] or list(SalesMetric)
+        with self._lock:
+            columns = {name: values[: self._size] for name, values in self._columns.items()}
+            codes = {field: dict(values) for field, values in self._codes.items()}
+
+        mask = np.ones(len(columns["id"]), dtype=bool)
+        if start is not None:
+            mask &= columns["at"] >= _micros(start)
+        if end is not None:
+            mask &= columns["at"] < _micros(end)
+        for name, wanted in (("product_id", product_ids), ("method", payment_methods), ("status", statuses)):
+            wanted = list(wanted)
+            if not wanted:
+                continue
+            if name != "product_id":
+                wanted = [codes[name][value] for value in wanted if value in codes[name]]
+            mask &= np.isin(columns[name], wanted)
+        rows = np.flatnonzero(mask)
+
+        keys = [self._key(dimension, columns, rows) for dimension in group_by]
+        groups, inverse, key_values = _group(keys, len(rows))
+        success = columns["status"][rows] == codes["status"].get(SUCCESS, -1)
+        totals = {
+            "sales": np.bincount(inverse, weights=success, minlength=groups),
+            "failed": np.bincount(inverse, weights=~success, minlength=groups),
+            "units": np.bincount(inverse, weights=columns["quantity"][rows] * success, minlength=groups),
+            "revenue_cents": np.bincount(inverse, weights=columns["cents"][rows] * success, minlength=groups),
+        }
+
+        names = {field: {code: value for value, code in mapping.items()} for field, mapping in codes.items()}
+        result = []
+        for group in range(groups):
+            row: dict = {}
+            for dimension, values in zip(group_by, key_values):
+                row[dimension.value] = _label(dimension, int(values[group]), names)
+            sales, failed = int(totals["sales"][group]), int(totals["failed"][group])
+            for metric in metrics:
+                if metric is SalesMetric.avg_ticket_cents:
+                    row[metric.value] = round(totals["revenue_cents"][group] / sales) if sales else None
+                elif metric is SalesMetric.failure_rate:
+                    row[metric.value] = round(failed / (sales + failed), 4) if sales + failed else None
+                else:
+                    row[metric.value] = int(totals[metric.value][group])
+            result.append(row)
+        return result
+
+    @staticmethod
+    def _key(dimension: SalesDimension, columns: dict, rows):
+        at = columns["at"][rows]
+        if dimension is SalesDimension.hour:
+            return at // _MICROS_PER_HOUR % 24
+        if dimension is SalesDimension.weekday:
+            return (at // _MICROS_PER_DAY + 3) % 7  # 1970-01-01 was a Thursday
+        if dimension is SalesDimension.day:
+            return at // _MICROS_PER_DAY
+        field = {"payment_method": "method", "status": "status"}.get(dimension.value, dimension.value)
+        return columns[field][rows].astype("int64")
+
+    def _code(self, field: str, value: str) -> int:
+        """Dictionary code for ``value``; the caller must hold ``self._lock``."""
+        mapping = self._codes[field]
+        code = mapping.get(value)
+        if code is None:
+            code = mapping[value] = len(mapping)
+        return code
+
+    def _encode(self, field: str, values: Sequence[str]):
+        """Codes for many values at once; the caller must hold ``self._lock``."""
+        import numpy as np
+
+        if not len(values):
+            return np.empty(0, dtype=np.int64)
+        distinct, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        return np.array([self._code(field, value) for value in distinct.tolist()])[inverse]
+
+    def _reserve(self, capacity: int) -> None:
+        import numpy as np
+
+        for name, values in self._columns.items():
+            grown = np.empty(max(capacity, 1_024), dtype=values.dtype)
+            grown[: self._size] = values[: self._size]
+            self._columns[name] = grown
+
+    def _install(self, columns: dict) -> None:
+        """Replace the arrays with fresh copies; the caller must hold ``self._lock``.
+
+        Views handed out to running queries keep the old arrays alive and unchanged.
+        """
+        self._size = len(columns["id"])
+        self._columns = columns
+        self._reserve(2 * self._size)
+
+    def _drop(self, condition) -> None:
+        with self._lock:
+            current = {name: values[: self._size] for name, values in self._columns.items()}
+            keep = ~condition(current)
+            if not keep.all():
+                self._install({name: values[keep] for name, values in current.items()})
+
+
+def _group(keys: list, count: int):
+    """Group count, each row's group index and the key values per group."""
+    import numpy as np
+
+    if not keys:
+        return 1, np.zeros(count, dtype=np.int64), []
+    if count == 0:
+        return 0, np.zeros(0, dtype=np.int64), [key[:0] for key in keys]
+    lows = [int(key.min()) for key in keys]
+    spans = [int(key.max()) - low + 1 for key, low in zip(keys, lows)]
+    shifted = [key - low for key, low in zip(keys, lows)]
+    space = 1
+    for span in spans:
+        space *= span
+    if space > max(_DENSE_GROUP_LIMIT, count):
+        unique, inverse = np.unique(np.stack(shifted), axis=1, return_inverse=True)
+        return unique.shape[1], inverse.reshape(-1), [values + low for values, low in zip(unique, lows)]
+    combined = np.ravel_multi_index(shifted, spans)
+    present = np.flatnonzero(np.bincount(combined, minlength=space))
+    lookup = np.empty(space, dtype=np.int64)
+    lookup[present] = np.arange(len(present))
+    unique = np.unravel_index(present, spans)
+    return len(present), lookup[combined], [values + low for values, low in zip(unique, lows)]
+
+
+def _label(dimension: SalesDimension, value: int, names: dict):
+    if dimension is SalesDimension.payment_method:
+        return names["method"][value]
+    if dimension is SalesDimension.status:
+        return names["status"][value]
+    if dimension is SalesDimension.day:
+        return date(1970, 1, 1) + timedelta(days=value)
+    return value
+
+
+_columns: SalesColumns | None = None
+_columns_lock = threading.Lock()
+
+
+def get_sales_columns() -> SalesColumns:
+    """Return the process-wide columnar sales copy, creating it on first use."""
+
+    global _columns
+    if _columns is None:
+        with _columns_lock:
+            if _columns is None:
+                _columns = SalesColumns()
+    return _columns
+
+
+def slice_sales(**query) -> dict:
+    """Run :meth:`SalesColumns.query` on the process-wide copy, shaped for the API."""
+    columns = get_sales_columns()
+    group_by = [SalesDimension(key).value for key in query.get("group_by", ())]
+    return {"loaded": columns.loaded, "group_by": group_by, "rows": columns.query(**query)}
+
+
+def load_from_history(columns: SalesColumns | None = None, batch_size: int = 50_000) -> int:
+    """Fill ``columns`` from the ``sales`` table; returns the number of rows loaded.
+
+    Columns are selected untyped, which skips SQLAlchemy's per-row conversions:
+    NumPy parses the stored timestamp strings in bulk instead.
+    """
+    import numpy as np
+    from sqlalchemy import column, select
+
+    from .. import models
+    from ..database import get_engine
+
+    columns = get_sales_columns() if columns is None else columns
+    names = ("id", "created_at", "product_id", "quantity", "total_cents", "payment_method", "status")
+    stmt = select(*(column(name) for name in names)).select_from(models.Sale.__table__).order_by(column("id"))
+    statuses = {status.name: status.value for status in models.SaleStatusEnum}
+    fields: list[list] = [[] for _ in names]
+    # The write engine, not the read pool: a full load may outlast the read statement timeout.
+    with get_engine().connect() as conn:
+        for batch in conn.execute(stmt.execution_options(yield_per=batch_size)).partitions():
+            for field, values in zip(fields, zip(*batch)):
+                field.extend(values)
+    ids, created_at, product_ids, quantities, cents, methods, status_names = fields
+    columns.replace(
+        ids,
+        np.asarray(created_at, dtype="datetime64[us]"),
+        product_ids,
+        quantities,
+        cents,
+        methods,
+        [statuses.get(name, name) for name in status_names],
+    )
+    return len(ids)
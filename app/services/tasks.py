@@ -2,11 +2,57 @@
 
 from __future__ import annotations
 
+from datetime import datetime
+
+from anyio import to_thread
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from .. import models
-from ..repositories import DeviceStateRepository, TelemetryRepository
-from .hardware import HardwareError, get_hardware
+from ..ingest import unique_by_timestamp
+from ..repositories import (
+    AsyncDeviceStateRepository,
+    DeviceStateRepository,
+    async_telemetry_repository,
+    telemetry_repository,
+)
+from ..schemas import TelemetryIn
+from ..timing import phase
+from .hardware import HardwareError, HardwareInterface, get_hardware
+from .monitoring import get_monitor
+
+
+def _read_telemetry(hardware: HardwareInterface) -> models.Telemetry:
+    with phase("sensors"):
+        try:
+            temperature = hardware.read_temperature()
+            humidity = hardware.read_humidity()
+        except HardwareError:
+            # Gracefully handle missing sensors by using placeholder values.
+            temperature = 0.0
+            humidity = 0.0
+        door_open = hardware.is_door_open()
+    return models.Telemetry(temperature_c=temperature, humidity=humidity, door_open=door_open)
+
+
+def _monitor(telemetry: models.Telemetry) -> None:
+    with phase("monitor"):
+        get_monitor().observe(telemetry.temperature_c, telemetry.humidity, telemetry.door_open, telemetry.created_at)
+
+
+def _new_rows(samples: list[TelemetryIn], existing: set[datetime]) -> list[dict]:
+    return [sample.model_dump() for sample in samples if sample.created_at not in existing]
+
+
+def _ingested(received: int, rows: list[dict]) -> dict:
+    monitor = get_monitor()
+    last_at = monitor.last_at
+    # Late samples are stored but not replayed into the live monitor.
+    for row in rows:
+        if last_at is not None and row["created_at"] <= last_at:
+            continue
+        monitor.observe(row["temperature_c"], row["humidity"], row["door_open"], row["created_at"])
+    return {"received": received, "inserted": len(rows), "duplicates": received - len(rows)}
 
 
 class DeviceService:
@@ -26,17 +72,62 @@ class DeviceService:
 class TelemetryService:
     def __init__(self, session: Session):
         self.session = session
-        self.repo = TelemetryRepository(session)
+        self.repo = telemetry_repository(session)
         self.hardware = get_hardware()
 
     def capture(self) -> models.Telemetry:
-        try:
-            temperature = self.hardware.read_temperature()
-            humidity = self.hardware.read_humidity()
-        except HardwareError:
-            # Gracefully handle missing sensors by using placeholder values.
-            temperature = 0.0
-            humidity = 0.0
-        door_open = self.hardware.is_door_open()
-        telemetry = models.Telemetry(temperature_c=temperature, humidity=humidity, door_open=door_open)
-        return self.repo.log(telemetry)
+        reading = _read_telemetry(self.hardware)
+        with phase("record"):
+            telemetry = self.repo.log(reading)
+        _monitor(telemetry)
+        return telemetry
+
+    def ingest(self, samples: list[TelemetryIn]) -> dict:
+        """Store externally recorded samples, skipping timestamps that are already stored."""
+        unique = unique_by_timestamp(samples)
+        if not unique:
+            return _ingested(len(samples), [])
+        existing = self.repo.timestamps_between(unique[0].created_at, unique[-1].created_at)
+        rows = _new_rows(unique, existing)
+        if rows:
+            self.repo.log_many(rows)
+        return _ingested(len(samples), rows)
+
+
+class AsyncDeviceService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.repo = AsyncDeviceStateRepository(session)
+        self.hardware = get_hardware()
+
+    async def set_lock(self, locked: bool) -> models.DeviceState:
+        # Hardware calls block, and behind a daemon they may queue after dispenses; keep them off the event loop.
+        await to_thread.run_sync(self.hardware.set_door_lock, locked)
+        return await self.repo.update(locked)
+
+    async def get_state(self) -> models.DeviceState:
+        return await self.repo.get_or_create()
+
+
+class AsyncTelemetryService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.repo = async_telemetry_repository(session)
+        self.hardware = get_hardware()
+
+    async def capture(self) -> models.Telemetry:
+        reading = await to_thread.run_sync(_read_telemetry, self.hardware)
+        with phase("record"):
+            telemetry = await self.repo.log(reading)
+        _monitor(telemetry)
+        return telemetry
+
+    async def ingest(self, samples: list[TelemetryIn]) -> dict:
+        unique = unique_by_timestamp(samples)
+        if not unique:
+            return _ingested(len(samples), [])
+        existing = await self.repo.timestamps_between(unique[0].created_at, unique[-1].created_at)
+        rows = _new_rows(unique, existing)
+        if rows:
+            await self.repo.log_many(rows)
+        return _ingested(len(samples), rows)
@@ -0,0 +1,227 @@
+"""Block storage for telemetry, selected with ``settings.telemetry_storage = "blocks"``.
+
+Samples are grouped by UTC hour into one ``telemetry_blocks`` row. Temperature
+and humidity are stored as little-endian float32 arrays, the door state as a
+bit-packed array, and each timestamp as a uint32 millisecond offset from the
+block start. A block whose samples sit exactly ``interval_ms`` apart stores only
+that interval and no offsets. At a 10 s cadence an hour is about 4 KB in one row,
+instead of 360 rows each carrying its own id, index entries and page overhead.
+
+Decoding wraps the stored bytes with :func:`numpy.frombuffer`, so a trend query
+gets arrays without copying values. The exceptions are door bits, which are
+unpacked, and timestamps, which are rebuilt from offsets. Values are float32, so
+readings keep about seven significant digits, well beyond sensor precision.
+
+Samples are identified by their timestamp, kept to the millisecond.
+:func:`sample_id` turns one into the integer id reported by the API, and
+appending a sample with a timestamp already stored is a no-op.
+
+Appending rewrites the whole hour's row, so :meth:`TelemetryBlocks.append`
+takes the database write lock before it reads the block. A concurrent append to
+the same hour then waits for this one to commit and merges into its result,
+rather than overwriting it with a block that lacks this one's samples.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from ..config import settings
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def enabled() -> bool:
+    return settings.telemetry_storage == "blocks"
+
+
+def sample_id(created_at: datetime) -> int:
+    """Stable integer id of the sample taken at ``created_at`` (milliseconds since the epoch)."""
+    return (created_at - _EPOCH) // timedelta(milliseconds=1)
+
+
+def truncate(at: datetime) -> datetime:
+    """``at`` at the millisecond resolution blocks store."""
+    return at.replace(microsecond=at.microsecond // 1000 * 1000)
+
+
+def _hour(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def encode(start: datetime, millis, temperature, humidity, door_open) -> dict:
+    """Column values for a block of samples sorted by ``millis`` (ms since the epoch)."""
+    import numpy as np
+
+    offsets = np.asarray(millis, dtype=np.int64) - sample_id(start)
+    steps = np.diff(offsets)
+    regular = len(offsets) > 1 and offsets[0] == 0 and bool((steps == steps[0]).all())
+    return {
+        "start": start,
+        "count": len(offsets),
+        "interval_ms": int(steps[0]) if regular else None,
+        "offsets": None if regular else offsets.astype("<u4").tobytes(),
+        "temperature": np.asarray(temperature, dtype="<f4").tobytes(),
+        "humidity": np.asarray(humidity, dtype="<f4").tobytes(),
+        "door_open": np.packbits(np.asarray(door_open, dtype=bool)).tobytes(),
+    }
+
+
+def decode(block) -> dict:
+    """Arrays for one stored block: ``millis`` (int64), float32 readings and bool door states."""
+    import numpy as np
+
+    count = block.count
+    if block.offsets is None:
+        offsets = np.arange(count, dtype=np.int64) * block.interval_ms
+    else:
+        offsets = np.frombuffer(block.offsets, dtype="<u4").astype(np.int64)
+    return {
+        "millis": offsets + sample_id(block.start),
+        "temperature_c": np.frombuffer(block.temperature, dtype="<f4"),
+        "humidity": np.frombuffer(block.humidity, dtype="<f4"),
+        "door_open": np.unpackbits(np.frombuffer(block.door_open, dtype=np.uint8), count=count).astype(bool),
+    }
+
+
+def _concat(decoded: list[dict]) -> dict:
+    import numpy as np
+
+    if len(decoded) == 1:
+        return decoded[0]
+    keys = ("millis", "temperature_c", "humidity", "door_open")
+    if not decoded:
+        empty = (np.int64, np.float32, np.float32, bool)
+        return {key: np.empty(0, dtype=dtype) for key, dtype in zip(keys, empty)}
+    return {key: np.concatenate([part[key] for part in decoded]) for key in keys}
+
+
+def decode_all(blocks) -> dict:
+    """Arrays for consecutive blocks, concatenated in the order given."""
+    return _concat([decode(block) for block in blocks])
+
+
+def _window(arrays: dict, start: datetime | None, end: datetime | None) -> dict:
+    import numpy as np
+
+    low = 0 if start is None else np.searchsorted(arrays["millis"], sample_id(start), side="left")
+    high = len(arrays["millis"]) if end is None else np.searchsorted(arrays["millis"], sample_id(end), side="right")
+    return {key: values[low:high] for key, values in arrays.items()}
+
+
+def to_rows(arrays: dict) -> list[dict]:
+    """Row dicts shaped like ``telemetry`` rows; readings rounded to undo float32 noise."""
+    millis = arrays["millis"].tolist()
+    temperature = arrays["temperature_c"].astype(float).round(3).tolist()
+    humidity = arrays["humidity"].astype(float).round(3).tolist()
+    door_open = arrays["door_open"].tolist()
+    return [
+        {
+            "id": ms,
+            "temperature_c": temperature[i],
+            "humidity": humidity[i],
+            "door_open": door_open[i],
+            "created_at": _EPOCH + timedelta(milliseconds=ms),
+        }
+        for i, ms in enumerate(millis)
+    ]
+
+
+class TelemetryBlocks:
+    """Reads and writes telemetry blocks through a SQLAlchemy ``Session`` or ``Connection``."""
+
+    def __init__(self, bind) -> None:
+        self.bind = bind
+
+    def append(self, samples: Iterable[dict]) -> int:
+        """Merge ``samples`` (telemetry row dicts) into their hour blocks; returns how many were new."""
+        import numpy as np
+        from sqlalchemy import insert, select, update
+
+        from ..models import TelemetryBlock
+
+        by_hour: dict[datetime, dict[int, dict]] = {}
+        for sample in samples:
+            by_hour.setdefault(_hour(sample["created_at"]), {})[sample_id(sample["created_at"])] = sample
+
+        added = 0
+        table = TelemetryBlock.__table__
+        if not by_hour:
+            return added
+        # A no-op write first: it takes the write lock (and, elsewhere than SQLite, the row locks)
+        # before the blocks are read, so no other append can rewrite them in between.
+        self.bind.execute(update(table).where(table.c.start.in_(list(by_hour))).values(count=table.c.count))
+        for start, fresh in by_hour.items():
+            stored = self.bind.execute(select(table).where(table.c.start == start)).first()
+            columns: dict[str, list] = {"millis": [], "temperature_c": [], "humidity": [], "door_open": []}
+            if stored is not None:
+                for key, values in decode(stored).items():
+                    columns[key] = values.tolist()
+                for ms in columns["millis"]:
+                    fresh.pop(ms, None)
+            if not fresh:
+                continue
+            added += len(fresh)
+            for ms, sample in fresh.items():
+                columns["millis"].append(ms)
+                for key in ("temperature_c", "humidity", "door_open"):
+                    columns[key].append(sample[key])
+            order = np.argsort(np.asarray(columns["millis"], dtype=np.int64), kind="stable")
+            values = encode(start, *(np.asarray(columns[key])[order] for key in columns))
+            if stored is None:
+                self.bind.execute(insert(table).values(**values))
+            else:
+                self.bind.execute(update(table).where(table.c.id == stored.id).values(**values))
+        return added
+
+    def arrays(self, start: datetime | None = None, end: datetime | None = None) -> dict:
+        """Samples with ``start <= created_at <= end`` as NumPy arrays in time order."""
+        from sqlalchemy import select
+
+        from ..models import TelemetryBlock
+
+        table = TelemetryBlock.__table__
+        stmt = select(table).order_by(table.c.start)
+        if start is not None:
+            stmt = stmt.where(table.c.start >= _hour(start))
+        if end is not None:
+            stmt = stmt.where(table.c.start <= end)
+        return _window(decode_all(self.bind.execute(stmt)), start, end)
+
+    def rows(self, start: datetime | None = None, end: datetime | None = None) -> list[dict]:
+        return to_rows(self.arrays(start, end))
+
+    def latest(self, limit: int = 50) -> list[dict]:
+        """The newest ``limit`` samples, oldest first."""
+        from sqlalchemy import select
+
+        from ..models import TelemetryBlock
+
+        if limit <= 0:
+            return []
+        table = TelemetryBlock.__table__
+        decoded, total = [], 0
+        # Walk back a few blocks at a time; an hour block holds a few hundred samples.
+        result = self.bind.execute(select(table).order_by(table.c.start.desc()).execution_options(yield_per=4))
+        try:
+            for block in result:
+                decoded.append(decode(block))
+                total += block.count
+                if total >= limit:
+                    break
+        finally:
+            result.close()
+        arrays = _concat(decoded[::-1])
+        return to_rows({key: values[-limit:] for key, values in arrays.items()})
+
+    def timestamps_between(self, start: datetime, end: datetime) -> set[datetime]:
+        return {row["created_at"] for row in self.rows(start, end)}
+
+    def delete(self, blocks: Iterable[int]) -> None:
+        from sqlalchemy import delete
+
+        from ..models import TelemetryBlock
+
+        table = TelemetryBlock.__table__
+        self.bind.execute(delete(table).where(table.c.id.in_(list(blocks))))
@@ -2,21 +2,90 @@
 
 from __future__ import annotations
 
-from decimal import Decimal
+import logging
+from functools import partial
 
+from anyio import to_thread
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from .. import models
-from ..repositories import InventoryRepository, ProductRepository, SaleRepository
+from ..database import after_commit
+from ..repositories import (
+    AsyncInventoryRepository,
+    AsyncProductRepository,
+    AsyncSaleRepository,
+    InventoryRepository,
+    ProductRepository,
+    SaleRepository,
+)
 from ..schemas import SaleBase
-from .hardware import HardwareError, get_hardware
+from ..timing import phase
+from .forecasting import get_forecaster
+from .hardware import DispenseOutcomeUnknown, HardwareError, get_hardware
 from .payments import PaymentError, PaymentService
+from .sales_columns import get_sales_columns
+
+logger = logging.getLogger(__name__)
 
 
 class VendingError(RuntimeError):
     pass
 
 
+def _check_availability(product: models.Product | None, payload: SaleBase) -> models.Product:
+    if product is None or not product.is_active:
+        raise VendingError("Product unavailable")
+    if product.quantity < payload.quantity:
+        raise VendingError("Insufficient stock")
+    return product
+
+
+def _sale(
+    product: models.Product,
+    payload: SaleBase,
+    total_cents: int,
+    status: models.SaleStatusEnum,
+    error_message: str | None = None,
+) -> models.Sale:
+    return models.Sale(
+        product_id=product.id,
+        quantity=payload.quantity,
+        total_cents=total_cents,
+        payment_method=payload.payment_method,
+        status=status,
+        error_message=error_message,
+    )
+
+
+def _unknown_outcome(
+    product: models.Product, payload: SaleBase, total_cents: int, exc: Exception
+) -> tuple[models.Sale, models.InventoryEvent]:
+    # The item may have dropped: the stock stays reserved and the sale pending until someone checks the slot.
+    logger.warning("Dispense of %s from slot %s has no known outcome: %s", payload.quantity, product.slot_code, exc)
+    sale = _sale(product, payload, total_cents, models.SaleStatusEnum.PENDING, str(exc))
+    event = models.InventoryEvent(product_id=product.id, change=-payload.quantity, reason="sale_pending")
+    return sale, event
+
+
+def _tracked(session: Session | AsyncSession, sale: models.Sale) -> models.Sale:
+    # Added to the columnar copy only once the sale is committed, never for a rolled-back one.
+    after_commit(
+        session,
+        partial(
+            get_sales_columns().append,
+            sale.id,
+            sale.created_at,
+            sale.product_id,
+            sale.quantity,
+            sale.total_cents,
+            sale.payment_method,
+            sale.status.value,
+        ),
+    )
+    return sale
+
+
 class VendingService:
     def __init__(self, session: Session):
         self.session = session
@@ -27,52 +96,103 @@ class VendingService:
         self.payments = PaymentService()
 
     def vend(self, payload: SaleBase) -> models.Sale:
-        product = self.products.get(payload.product_id)
-        if product is None or not product.is_active:
-            raise VendingError("Product unavailable")
-        if product.quantity < payload.quantity:
-            raise VendingError("Insufficient stock")
+        with phase("lookup"):
+            product = _check_availability(self.products.get(payload.product_id), payload)
 
-        total_cost = Decimal(product.price) * payload.quantity
+        total_cents = product.price_cents * payload.quantity
         try:
-            self.payments.authorise(total_cost, payload.amount_paid, payload.payment_method)
+            with phase("authorise"):
+                self.payments.authorise(total_cents, payload.amount_paid_cents, payload.payment_method)
         except PaymentError as exc:
-            sale = models.Sale(
-                product_id=product.id,
-                quantity=payload.quantity,
-                total_price=total_cost,
-                payment_method=payload.payment_method,
-                status=models.SaleStatusEnum.FAILED,
-                error_message=str(exc),
+            sale = _sale(product, payload, total_cents, models.SaleStatusEnum.FAILED, str(exc))
+            with phase("record"):
+                return _tracked(self.session, self.sales.record(sale))
+
+        with phase("reserve"):
+            if not self.products.adjust_stock(product, -payload.quantity):
+                raise VendingError("Insufficient stock")
+
+        try:
+            with phase("dispense"):
+                self.hardware.dispense(product.slot_code, payload.quantity)
+        except DispenseOutcomeUnknown as exc:
+            sale, event = _unknown_outcome(product, payload, total_cents, exc)
+            with phase("record"):
+                _tracked(self.session, self.sales.record(sale))
+                self.inventory.log_event(event)
+            return sale
+        except HardwareError as exc:
+            self.products.adjust_stock(product, payload.quantity)
+            sale = _sale(product, payload, total_cents, models.SaleStatusEnum.FAILED, str(exc))
+            with phase("record"):
+                return _tracked(self.session, self.sales.record(sale))
+
+        sale = _sale(product, payload, total_cents, models.SaleStatusEnum.SUCCESS)
+        with phase("record"):
+            _tracked(self.session, self.sales.record(sale))
+            event = self.inventory.log_event(
+                models.InventoryEvent(product_id=product.id, change=-payload.quantity, reason="sale")
             )
-            return self.sales.record(sale)
+            self.session.flush()
+        observe = partial(get_forecaster().observe, product.id, payload.quantity, event.created_at, event.id)
+        after_commit(self.session, observe)
+        return sale
+
+
+class AsyncVendingService:
+    """Async variant of :class:`VendingService` for natively async endpoints.
+
+    Actuator pulses block for hundreds of milliseconds, so dispensing is handed
+    to a worker thread while the event loop keeps serving other requests.
+    """
 
-        product.quantity -= payload.quantity
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.products = AsyncProductRepository(session)
+        self.sales = AsyncSaleRepository(session)
+        self.inventory = AsyncInventoryRepository(session)
+        self.hardware = get_hardware()
+        self.payments = PaymentService()
+
+    async def vend(self, payload: SaleBase) -> models.Sale:
+        with phase("lookup"):
+            product = _check_availability(await self.products.get(payload.product_id), payload)
+
+        total_cents = product.price_cents * payload.quantity
+        try:
+            with phase("authorise"):
+                self.payments.authorise(total_cents, payload.amount_paid_cents, payload.payment_method)
+        except PaymentError as exc:
+            sale = _sale(product, payload, total_cents, models.SaleStatusEnum.FAILED, str(exc))
+            with phase("record"):
+                return _tracked(self.session, await self.sales.record(sale))
+
+        with phase("reserve"):
+            if not await self.products.adjust_stock(product, -payload.quantity):
+                raise VendingError("Insufficient stock")
 
         try:
-            self.hardware.dispense(product.slot_code, payload.quantity)
+            with phase("dispense"):
+                await to_thread.run_sync(self.hardware.dispense, product.slot_code, payload.quantity)
+        except DispenseOutcomeUnknown as exc:
+            sale, event = _unknown_outcome(product, payload, total_cents, exc)
+            with phase("record"):
+                _tracked(self.session, await self.sales.record(sale))
+                await self.inventory.log_event(event)
+            return sale
         except HardwareError as exc:
-            product.quantity += payload.quantity
-            sale = models.Sale(
-                product_id=product.id,
-                quantity=payload.quantity,
-                total_price=total_cost,
-                payment_method=payload.payment_method,
-                status=models.SaleStatusEnum.FAILED,
-                error_message=str(exc),
+            await self.products.adjust_stock(product, payload.quantity)
+            sale = _sale(product, payload, total_cents, models.SaleStatusEnum.FAILED, str(exc))
+            with phase("record"):
+                return _tracked(self.session, await self.sales.record(sale))
+
+        sale = _sale(product, payload, total_cents, models.SaleStatusEnum.SUCCESS)
+        with phase("record"):
+            _tracked(self.session, await self.sales.record(sale))
+            event = await self.inventory.log_event(
+                models.InventoryEvent(product_id=product.id, change=-payload.quantity, reason="sale")
             )
-            return self.sales.record(sale)
-
-        sale = models.Sale(
-            product_id=product.id,
-            quantity=payload.quantity,
-            total_price=total_cost,
-            payment_method=payload.payment_method,
-            status=models.SaleStatusEnum.SUCCESS,
-        )
-        self.sales.record(sale)
-        self.inventory.log_event(
-            models.InventoryEvent(product_id=product.id, change=-payload.quantity, reason="sale")
-        )
-        self.session.flush()
+            await self.session.flush()
+        observe = partial(get_forecaster().observe, product.id, payload.quantity, event.created_at, event.id)
+        after_commit(self.session, observe)
         return sale
@@ -0,0 +1,203 @@
+"""Kiosk UI served by the application from fingerprinted, precompressed assets.
+
+:func:`build` reads ``settings.ui_dir``. Every file other than ``index.html``
+is renamed after its content hash (``app.js`` becomes ``app.3f2a9c01d4.js``)
+and ``index.html`` is rewritten to point at the new names under
+``/ui/assets/``. Every file is compressed once, with gzip and, when the
+optional ``brotli`` package is installed, with brotli. An encoding is kept only
+if it is smaller than the original.
+
+Hashed assets are sent with ``Cache-Control: public, max-age=31536000,
+immutable``: a changed file gets a new name, so browsers never need to ask
+again. ``index.html`` is sent with ``no-cache``, so each load revalidates it
+with ``If-None-Match`` and normally gets an empty 304. Every response carries an
+``ETag`` and ``Vary: Accept-Encoding``.
+
+The bundle is built once per process, in the background at startup or on the
+first UI request. Restart the API to pick up edited sources. ``python -m
+app.static_assets --out DIR`` writes the same files, including ``.gz`` and
+``.br`` siblings, for a front-end web server.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, Request, Response, status
+
+from .config import settings
+
+UI_PREFIX = "/ui"
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+INDEX_CACHE_CONTROL = "no-cache"
+# Preferred first; "identity" is always available.
+ENCODINGS = ("br", "gzip")
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+@dataclass(frozen=True)
+class Asset:
+    name: str
+    media_type: str
+    digest: str
+    bodies: dict[str, bytes]
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.digest}"' if encoding == "identity" else f'"{self.digest}-{encoding}"'
+
+
+@dataclass(frozen=True)
+class UIBundle:
+    index: Asset
+    assets: dict[str, Asset]
+    renamed: dict[str, str]
+
+
+def _digest(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:10]
+
+
+def _compress(body: bytes) -> dict[str, bytes]:
+    bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    try:
+        import brotli  # type: ignore
+    except ImportError:  # optional; gzip covers every browser
+        pass
+    else:
+        bodies["br"] = brotli.compress(body, quality=11)
+    return {encoding: data for encoding, data in bodies.items() if encoding == "identity" or len(data) < len(body)}
+
+
+def _asset(name: str, body: bytes) -> Asset:
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type == "application/javascript":
+        media_type += "; charset=utf-8"
+    return Asset(name, media_type, _digest(body), _compress(body))
+
+
+def build(source: Path | str | None = None) -> UIBundle:
+    """Fingerprint and compress the UI under ``source`` (default ``settings.ui_dir``)."""
+    source = Path(settings.ui_dir if source is None else source)
+    assets, renamed = {}, {}
+    for path in sorted(source.iterdir()):
+        if not path.is_file() or path.name == "index.html" or path.name.startswith("."):
+            continue
+        body = path.read_bytes()
+        hashed = f"{path.stem}.{_digest(body)}{path.suffix}"
+        assets[hashed] = _asset(hashed, body)
+        renamed[path.name] = hashed
+
+    def _link(match: re.Match) -> str:
+        hashed = renamed.get(match.group(2))
+        return match.group(0) if hashed is None else f'{match.group(1)}="{UI_PREFIX}/assets/{hashed}"'
+
+    html = (source / "index.html").read_text(encoding="utf-8")
+    html = re.sub(r'\b(src|href)="([^"/:?#]+)"', _link, html)
+    return UIBundle(_asset("index.html", html.encode()), assets, renamed)
+
+
+def write(bundle: UIBundle, out: Path | str) -> None:
+    """Write ``bundle`` to ``out`` with ``.gz``/``.br`` siblings, for ``gzip_static``-style servers."""
+    out = Path(out)
+    (out / "assets").mkdir(parents=True, exist_ok=True)
+    for directory, asset in [(out, bundle.index), *((out / "assets", asset) for asset in bundle.assets.values())]:
+        for encoding, body in asset.bodies.items():
+            (directory / (asset.name + SUFFIXES.get(encoding, ""))).write_bytes(body)
+
+
+_bundle: UIBundle | None = None
+_bundle_lock = threading.Lock()
+
+
+def get_ui_bundle() -> UIBundle | None:
+    """The process-wide bundle, built on first use; ``None`` when ``settings.ui_dir`` has no UI."""
+    global _bundle
+    if _bundle is None:
+        with _bundle_lock:
+            if _bundle is None:
+                try:
+                    _bundle = build()
+                except FileNotFoundError:
+                    return None
+    return _bundle
+
+
+def _negotiate(accept_encoding: str, available) -> str:
+    weights: dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        weight = 1.0
+        if params.strip().startswith("q="):
+            try:
+                weight = float(params.strip()[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip()] = weight
+    for encoding in ENCODINGS:
+        if encoding in available and weights.get(encoding, weights.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+def _not_modified(if_none_match: str, asset: Asset) -> bool:
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    # Weak comparison: any representation of the same content counts.
+    return "*" in tags or any(asset.etag(encoding) in tags for encoding in asset.bodies)
+
+
+def asset_response(request: Request, asset: Asset, cache_control: str) -> Response:
+    encoding = _negotiate(request.headers.get("accept-encoding", ""), asset.bodies)
+    headers = {"ETag": asset.etag(encoding), "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if _not_modified(request.headers.get("if-none-match", ""), asset):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(asset.bodies[encoding], media_type=asset.media_type, headers=headers)
+
+
+def _bundle_or_404() -> UIBundle:
+    bundle = get_ui_bundle()
+    if bundle is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Kiosk UI is not installed")
+    return bundle
+
+
+ui_router = APIRouter(prefix=UI_PREFIX, include_in_schema=False)
+
+
+@ui_router.get("")
+@ui_router.get("/")
+def ui_index(request: Request) -> Response:
+    return asset_response(request, _bundle_or_404().index, INDEX_CACHE_CONTROL)
+
+
+@ui_router.get("/assets/{name}")
+def ui_asset(name: str, request: Request) -> Response:
+    asset = _bundle_or_404().assets.get(name)
+    if asset is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Asset not found")
+    return asset_response(request, asset, ASSET_CACHE_CONTROL)
+
+
+def main(argv: list[str] | None = None) -> None:  # pragma: no cover - build entry point
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress the kiosk UI.")
+    parser.add_argument("--source", default=settings.ui_dir)
+    parser.add_argument("--out", required=True, help="directory to write index.html and assets/ into")
+    args = parser.parse_args(argv)
+    bundle = build(args.source)
+    write(bundle, args.out)
+    for asset in [bundle.index, *bundle.assets.values()]:
+        sizes = ", ".join(f"{encoding} {len(body):,} B" for encoding, body in asset.bodies.items())
+        print(f"{asset.name}: {sizes}")
+
+
+if __name__ == "__main__":  # pragma: no cover - build entry point
+    main()
@@ -0,0 +1,749 @@
+"""In-memory storage engine serving the vending API.
+
+The :class:`VendingMachine` keeps the catalogue, stock levels, recent sales and
+telemetry in compact in-process structures so purchases and catalogue reads
+never wait on the SD card. Money is held as integer cents and sales are rolled
+up per calendar day as they happen, which keeps summaries independent of the
+number of sales recorded.
+
+Changes are queued and written to the SQLAlchemy schema in :mod:`app.models` by
+:meth:`VendingMachine.checkpoint`, which the application calls on an interval
+and at shutdown; :meth:`VendingMachine.load` restores state on startup.
+SQLAlchemy is only imported inside the methods that touch the database (those
+two and the lookup of stored telemetry timestamps during ingest), so importing
+the store stays cheap.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, NamedTuple
+
+from .config import settings
+from .ingest import unique_by_timestamp
+from .money import average_cents, ensure_cents, ensure_decimal, from_cents, to_cents
+from .services import telemetry_blocks
+from .services.forecasting import get_forecaster
+from .services.hardware import DispenseOutcomeUnknown, HardwareError, get_hardware
+from .services.monitoring import get_monitor
+from .services.payments import PaymentError, PaymentService
+from .services.retention import archived_sales, get_archive
+from .services.sales_columns import get_sales_columns
+from .timing import phase
+
+logger = logging.getLogger(__name__)
+
+# Daily rollups older than this are dropped; older periods come from the archive.
+ROLLUP_RETENTION_DAYS = 400
+# Stands in for the archive when a window lies entirely after the retention horizon.
+_NOTHING_ARCHIVED = {"sales": 0, "revenue_cents": 0, "products": {}}
+
+
+def _money(cents: int) -> str:
+    return str(from_cents(cents))
+
+
+class _Product:
+    __slots__ = ("id", "name", "slot_code", "price_cents", "quantity", "is_active", "created_at", "updated_at")
+
+    def __init__(self, id, name, slot_code, price_cents, quantity, is_active, created_at, updated_at):
+        self.id = id
+        self.name = name
+        self.slot_code = slot_code
+        self.price_cents = price_cents
+        self.quantity = quantity
+        self.is_active = is_active
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "slot_code": self.slot_code,
+            "price": _money(self.price_cents),
+            "quantity": self.quantity,
+            "is_active": self.is_active,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class _Sale(NamedTuple):
+    id: int
+    product_id: int
+    quantity: int
+    total_cents: int
+    payment_method: str
+    status: str
+    error_message: str | None
+    created_at: datetime
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "product_id": self.product_id,
+            "quantity": self.quantity,
+            "total_price": _money(self.total_cents),
+            "payment_method": self.payment_method,
+            "status": self.status,
+            "error_message": self.error_message,
+            "created_at": self.created_at,
+        }
+
+
+class _InventoryEvent(NamedTuple):
+    product_id: int
+    change: int
+    reason: str
+    created_at: datetime
+
+
+class _Telemetry(NamedTuple):
+    id: int
+    temperature_c: float
+    humidity: float
+    door_open: bool
+    created_at: datetime
+
+    def as_dict(self) -> dict:
+        return self._asdict()
+
+
+class _DayRollup:
+    """Successful sales for one calendar day: totals plus ``product_id -> [sales, units]``."""
+
+    __slots__ = ("sales", "revenue_cents", "products")
+
+    def __init__(self) -> None:
+        self.sales = 0
+        self.revenue_cents = 0
+        self.products: dict[int, list[int]] = {}
+
+    def add(self, product_id: int, sales: int, quantity: int, revenue_cents: int) -> None:
+        self.sales += sales
+        self.revenue_cents += revenue_cents
+        counters = self.products.setdefault(product_id, [0, 0])
+        counters[0] += sales
+        counters[1] += quantity
+
+
+@dataclass
+class _Pending:
+    """Changes recorded since the last checkpoint."""
+
+    products: set[int] = field(default_factory=set)
+    deleted_products: set[int] = field(default_factory=set)
+    sales: list[_Sale] = field(default_factory=list)
+    events: list[_InventoryEvent] = field(default_factory=list)
+    telemetry: list[_Telemetry] = field(default_factory=list)
+    device_state: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.products or self.deleted_products or self.sales or self.events or self.telemetry or self.device_state
+        )
+
+    def merge(self, earlier: "_Pending") -> None:
+        """Fold a failed checkpoint's changes back in ahead of newer ones."""
+        self.products |= earlier.products - self.deleted_products
+        self.deleted_products |= earlier.deleted_products
+        self.sales[:0] = earlier.sales
+        self.events[:0] = earlier.events
+        self.telemetry[:0] = earlier.telemetry
+        self.device_state = self.device_state or earlier.device_state
+
+
+class VendingMachine:
+    """Thread-safe in-memory store mirroring the SQLAlchemy repositories."""
+
+    def __init__(self, recent_sales: int | None = None, telemetry_samples: int | None = None) -> None:
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._products: dict[int, _Product] = {}
+        self._slots: dict[str, int] = {}
+        self._catalogue: list[_Product] | None = None
+        self._sales: deque[_Sale] = deque(maxlen=recent_sales or settings.store_recent_sales)
+        self._telemetry: deque[_Telemetry] = deque(maxlen=telemetry_samples or settings.store_telemetry_samples)
+        self._daily: dict[date, _DayRollup] = {}
+        self._next_product_id = 1
+        self._next_sale_id = 1
+        self._next_telemetry_id = 1
+        self._door_locked = True
+        self._device_updated_at = datetime.utcnow()
+        self._pending = _Pending()
+        self.payments = PaymentService()
+
+    # Catalogue -----------------------------------------------------------
+
+    def list_products(self, active_only: bool = False) -> list[dict]:
+        with self._lock:
+            return [product.as_dict() for product in self._ordered() if product.is_active or not active_only]
+
+    def get_product(self, product_id: int) -> dict:
+        with self._lock:
+            return self._get_or_error(product_id).as_dict()
+
+    def get_by_slot(self, slot_code: str) -> dict | None:
+        with self._lock:
+            product_id = self._slots.get(slot_code.upper())
+            return self._products[product_id].as_dict() if product_id is not None else None
+
+    def create_product(self, payload: dict) -> dict:
+        name = self._validate_name(payload.get("name"))
+        slot_code = payload.get("slot_code")
+        if not isinstance(slot_code, str) or not 1 <= len(slot_code) <= 10:
+            raise ValueError("slot_code must be 1-10 characters")
+        slot_code = slot_code.upper()
+        price_cents = self._validate_price(payload.get("price"))
+        quantity = self._validate_quantity(payload.get("quantity", 0))
+        is_active = bool(payload.get("is_active", True))
+
+        now = datetime.utcnow()
+        with self._lock:
+            if slot_code in self._slots:
+                raise ValueError(f"Slot {slot_code} is already assigned")
+            product = _Product(self._next_product_id, name, slot_code, price_cents, quantity, is_active, now, now)
+            self._next_product_id += 1
+            self._products[product.id] = product
+            self._slots[slot_code] = product.id
+            self._catalogue = None
+            self._pending.products.add(product.id)
+            if quantity:
+                self._pending.events.append(_InventoryEvent(product.id, quantity, "initial_stock", now))
+            return product.as_dict()
+
+    def update_product(self, product_id: int, payload: dict) -> dict:
+        name = self._validate_name(payload["name"]) if payload.get("name") is not None else None
+        price_cents = self._validate_price(payload["price"]) if payload.get("price") is not None else None
+        quantity = self._validate_quantity(payload["quantity"]) if payload.get("quantity") is not None else None
+
+        now = datetime.utcnow()
+        with self._lock:
+            product = self._get_or_error(product_id)
+            if name is not None:
+                product.name = name
+            if price_cents is not None:
+                product.price_cents = price_cents
+            if payload.get("is_active") is not None:
+                product.is_active = bool(payload["is_active"])
+            if quantity is not None:
+                difference = quantity - product.quantity
+                product.quantity = quantity
+                if difference:
+                    self._pending.events.append(_InventoryEvent(product.id, difference, "manual_adjustment", now))
+            product.updated_at = now
+            self._pending.products.add(product.id)
+            return product.as_dict()
+
+    def adjust_inventory(self, payload: dict) -> dict:
+        change = payload.get("change")
+        reason = payload.get("reason")
+        if isinstance(change, bool) or not isinstance(change, int):
+            raise ValueError("change must be an integer")
+        if not isinstance(reason, str) or not 3 <= len(reason) <= 50:
+            raise ValueError("reason must be 3-50 characters")
+
+        now = datetime.utcnow()
+        with self._lock:
+            product = self._get_or_error(payload.get("product_id"))
+            product.quantity += change
+            product.updated_at = now
+            self._pending.products.add(product.id)
+            self._pending.events.append(_InventoryEvent(product.id, change, reason, now))
+            return product.as_dict()
+
+    def delete_product(self, product_id: int) -> None:
+        with self._lock:
+            product = self._get_or_error(product_id)
+            del self._products[product.id]
+            del self._slots[product.slot_code]
+            self._catalogue = None
+            self._pending.products.discard(product.id)
+            self._pending.deleted_products.add(product.id)
+        get_sales_columns().drop_product(product.id)
+
+    # Vending -------------------------------------------------------------
+
+    def vend(self, payload: dict) -> dict:
+        product_id = payload.get("product_id")
+        quantity = payload.get("quantity")
+        method = payload.get("payment_method")
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        if not isinstance(method, str) or not 2 <= len(method) <= 30:
+            raise ValueError("payment_method must be 2-30 characters")
+        paid_cents = ensure_cents(payload.get("amount_paid"), "amount_paid")
+
+        with self._lock:
+            product = self._products.get(product_id)
+            if product is None or not product.is_active:
+                raise ValueError("Product unavailable")
+            if product.quantity < quantity:
+                raise ValueError("Insufficient stock")
+            total_cents = product.price_cents * quantity
+            try:
+                with phase("authorise"):
+                    self.payments.authorise(total_cents, paid_cents, method)
+            except PaymentError as exc:
+                return self._record_sale(product, quantity, total_cents, method, "failed", str(exc))
+            # Reserve the stock before releasing the lock for the slow actuator.
+            product.quantity -= quantity
+            slot_code = product.slot_code
+
+        try:
+            with phase("dispense"):
+                get_hardware().dispense(slot_code, quantity)
+        except DispenseOutcomeUnknown as exc:
+            # The item may have dropped: keep the stock reserved and the sale pending.
+            logger.warning("Dispense of %s from slot %s has no known outcome: %s", quantity, slot_code, exc)
+            with self._lock:
+                sale = self._record_sale(product, quantity, total_cents, method, "pending", str(exc))
+                self._pending.products.add(product.id)
+                self._pending.events.append(_InventoryEvent(product.id, -quantity, "sale_pending", sale["created_at"]))
+            return sale
+        except HardwareError as exc:
+            with self._lock:
+                product.quantity += quantity
+                return self._record_sale(product, quantity, total_cents, method, "failed", str(exc))
+
+        with phase("record"), self._lock:
+            sale = self._record_sale(product, quantity, total_cents, method, "success")
+            self._pending.events.append(_InventoryEvent(product.id, -quantity, "sale", sale["created_at"]))
+        with phase("forecast"):
+            get_forecaster().observe(product.id, quantity, sale["created_at"])
+        return sale
+
+    def recent_sales(self, limit: int = 50) -> list[dict]:
+        with self._lock:
+            return [sale.as_dict() for sale in list(self._sales)[-limit:]]
+
+    # Telemetry and device state -----------------------------------------
+
+    def capture_telemetry(self) -> dict:
+        hardware = get_hardware()
+        with phase("sensors"):
+            try:
+                temperature = hardware.read_temperature()
+                humidity = hardware.read_humidity()
+            except HardwareError:
+                # Gracefully handle missing sensors by using placeholder values.
+                temperature = 0.0
+                humidity = 0.0
+            door_open = hardware.is_door_open()
+        with phase("record"), self._lock:
+            sample = self._new_telemetry(temperature, humidity, door_open, datetime.utcnow())
+            self._telemetry.append(sample)
+            self._pending.telemetry.append(sample)
+        get_monitor().observe(temperature, humidity, door_open, sample.created_at)
+        return sample.as_dict()
+
+    def ingest_telemetry(self, samples: list) -> dict:
+        """Add externally recorded ``TelemetryIn`` samples, skipping timestamps already known.
+
+        Timestamps are checked against the in-memory window, and against SQLite
+        for anything older than it.
+        """
+        unique = unique_by_timestamp(samples)
+        with self._lock:
+            oldest = self._telemetry[0].created_at if self._telemetry else None
+        stored: set[datetime] = set()
+        if unique and (oldest is None or unique[0].created_at < oldest):
+            end = unique[-1].created_at if oldest is None else min(unique[-1].created_at, oldest)
+            stored = self._stored_telemetry_times(unique[0].created_at, end)
+        with self._lock:
+            known = stored | {sample.created_at for sample in self._telemetry}
+            added = []
+            for sample in unique:
+                if sample.created_at in known:
+                    continue
+                added.append(
+                    self._new_telemetry(sample.temperature_c, sample.humidity, sample.door_open, sample.created_at)
+                )
+            self._pending.telemetry.extend(added)
+            if added and self._telemetry and added[0].created_at < self._telemetry[-1].created_at:
+                # Late uploads: keep the window in time order (maxlen then keeps the newest).
+                merged = sorted([*self._telemetry, *added], key=lambda sample: sample.created_at)
+                self._telemetry.clear()
+                self._telemetry.extend(merged)
+            else:
+                self._telemetry.extend(added)
+        monitor = get_monitor()
+        last_at = monitor.last_at
+        # Late samples are stored but not replayed into the live monitor.
+        for sample in added:
+            if last_at is not None and sample.created_at <= last_at:
+                continue
+            monitor.observe(sample.temperature_c, sample.humidity, sample.door_open, sample.created_at)
+        return {"received": len(samples), "inserted": len(added), "duplicates": len(samples) - len(added)}
+
+    def latest_telemetry(self, limit: int = 50) -> list[dict]:
+        with self._lock:
+            samples = list(self._telemetry)[-limit:] if limit > 0 else []
+            return [sample.as_dict() for sample in samples]
+
+    def get_device_state(self) -> dict:
+        with self._lock:
+            return {"door_locked": self._door_locked, "updated_at": self._device_updated_at}
+
+    def set_door_lock(self, locked: bool) -> dict:
+        get_hardware().set_door_lock(locked)
+        with self._lock:
+            self._door_locked = locked
+            self._device_updated_at = datetime.utcnow()
+            self._pending.device_state = True
+            return {"door_locked": self._door_locked, "updated_at": self._device_updated_at}
+
+    # Analytics -----------------------------------------------------------
+
+    def sales_summary(self, days: int = 30) -> dict:
+        """Summarise successful sales over the last ``days`` calendar days (today included).
+
+        Days before the retention horizon are read from the archive summaries.
+        """
+        archived = archived_sales(days) or _NOTHING_ARCHIVED
+        with self._lock:
+            count, revenue = archived["sales"], archived["revenue_cents"]
+            per_name: dict[str, int] = {}
+            for product in archived["products"].values():
+                per_name[product["name"]] = per_name.get(product["name"], 0) + product["sales"]
+            for rollup in self._rollups_since(days):
+                count += rollup.sales
+                revenue += rollup.revenue_cents
+                for product_id, (sales, _units) in rollup.products.items():
+                    if product_id in self._products:
+                        name = self._products[product_id].name
+                        per_name[name] = per_name.get(name, 0) + sales
+            ranked = sorted(per_name.items(), key=lambda item: item[1], reverse=True)
+            top_products = [{"name": name, "sales": sales} for name, sales in ranked[:5]]
+
+        return {
+            "total_sales": count,
+            "total_revenue": _money(revenue),
+            "average_ticket": _money(average_cents(revenue, count)) if count else "0",
+            "top_products": top_products,
+        }
+
+    def inventory_turnover(self, days: int = 30) -> dict:
+        archived = archived_sales(days) or _NOTHING_ARCHIVED
+        with self._lock:
+            sold: dict[int, int] = {}
+            for slot_code, product in archived["products"].items():
+                if slot_code in self._slots:
+                    sold[self._slots[slot_code]] = product["units"]
+            for rollup in self._rollups_since(days):
+                for product_id, (_sales, units) in rollup.products.items():
+                    sold[product_id] = sold.get(product_id, 0) + units
+            products = [product for product in self._ordered() if product.is_active]
+            return {
+                "as_of": datetime.utcnow(),
+                "products": [
+                    {
+                        "name": product.name,
+                        "slot_code": product.slot_code,
+                        "quantity_on_hand": product.quantity,
+                        "sold_last_period": sold.get(product.id, 0),
+                        "last_updated": product.updated_at,
+                    }
+                    for product in products
+                ],
+            }
+
+    def telemetry_trend(self, hours: int = 24) -> list[dict]:
+        return self.latest_telemetry(limit=max(1, hours * 2))
+
+    def restock_plan(self, horizon_hours: int = 168) -> dict:
+        with self._lock:
+            products = [
+                (product.id, product.name, product.slot_code, product.quantity)
+                for product in self._ordered()
+                if product.is_active
+            ]
+        return {
+            "as_of": datetime.utcnow(),
+            "horizon_hours": horizon_hours,
+            "items": get_forecaster().restock_plan(products, horizon_hours=horizon_hours),
+        }
+
+    # Persistence ---------------------------------------------------------
+
+    def load(self) -> None:
+        """Replace in-memory state with the contents of the configured database."""
+        from sqlalchemy import func, select
+
+        from . import models
+        from .database import get_engine
+
+        cutoff = datetime.utcnow() - timedelta(days=ROLLUP_RETENTION_DAYS)
+        success = models.Sale.status == models.SaleStatusEnum.SUCCESS
+        with get_engine().connect() as conn:
+            products = conn.execute(select(models.Product.__table__)).all()
+            recent_sales = conn.execute(
+                select(models.Sale.__table__).order_by(models.Sale.id.desc()).limit(self._sales.maxlen)
+            ).all()
+            daily = conn.execute(
+                select(
+                    func.date(models.Sale.created_at),
+                    models.Sale.product_id,
+                    func.count(models.Sale.id),
+                    func.sum(models.Sale.quantity),
+                    func.sum(models.Sale.total_cents),
+                )
+                .where(models.Sale.created_at >= cutoff, success)
+                .group_by(func.date(models.Sale.created_at), models.Sale.product_id)
+            ).all()
+            if telemetry_blocks.enabled():
+                telemetry = [
+                    _Telemetry(**row) for row in telemetry_blocks.TelemetryBlocks(conn).latest(self._telemetry.maxlen)
+                ]
+                max_telemetry_id = 0
+            else:
+                rows = conn.execute(
+                    select(models.Telemetry.__table__)
+                    .order_by(models.Telemetry.id.desc())
+                    .limit(self._telemetry.maxlen)
+                ).all()
+                telemetry = [
+                    _Telemetry(row.id, row.temperature_c, row.humidity, row.door_open, row.created_at)
+                    for row in reversed(rows)
+                ]
+                max_telemetry_id = conn.scalar(select(func.max(models.Telemetry.id))) or 0
+            max_sale_id = conn.scalar(select(func.max(models.Sale.id))) or 0
+            state = conn.execute(select(models.DeviceState.__table__).order_by(models.DeviceState.id)).first()
+
+        with self._lock:
+            self._products = {
+                row.id: _Product(
+                    row.id,
+                    row.name,
+                    row.slot_code,
+                    row.price_cents,
+                    row.quantity,
+                    row.is_active,
+                    row.created_at,
+                    row.updated_at,
+                )
+                for row in products
+            }
+            self._slots = {product.slot_code: product.id for product in self._products.values()}
+            self._catalogue = None
+            self._sales.clear()
+            self._sales.extend(
+                _Sale(
+                    row.id,
+                    row.product_id,
+                    row.quantity,
+                    row.total_cents,
+                    row.payment_method,
+                    row.status.value,
+                    row.error_message,
+                    row.created_at,
+                )
+                for row in reversed(recent_sales)
+            )
+            self._daily = {}
+            for day, product_id, sales, units, revenue in daily:
+                day = day if isinstance(day, date) else date.fromisoformat(day)
+                self._daily.setdefault(day, _DayRollup()).add(product_id, int(sales), int(units), int(revenue))
+            self._telemetry.clear()
+            self._telemetry.extend(telemetry)
+            self._next_product_id = max(self._products, default=0) + 1
+            self._next_sale_id = max_sale_id + 1
+            self._next_telemetry_id = max_telemetry_id + 1
+            if state is not None:
+                self._door_locked = state.door_locked
+                self._device_updated_at = state.updated_at
+            self._pending = _Pending()
+
+    def checkpoint(self) -> int:
+        """Write changes made since the last checkpoint; returns the number of rows written."""
+        with self._checkpoint_lock:
+            with self._lock:
+                pending, self._pending = self._pending, _Pending()
+                product_rows = [
+                    self._product_row(self._products[pid]) for pid in pending.products if pid in self._products
+                ]
+                device_row = {"door_locked": self._door_locked, "updated_at": self._device_updated_at}
+            if not pending:
+                return 0
+            try:
+                return self._write(pending, product_rows, device_row)
+            except Exception:
+                with self._lock:
+                    self._pending.merge(pending)
+                raise
+
+    def _write(self, pending: _Pending, product_rows: list[dict], device_row: dict) -> int:
+        from sqlalchemy import delete, insert, select, update
+
+        from . import models
+        from .database import get_engine
+
+        products = models.Product.__table__
+        with get_engine().begin() as conn:
+            for product_id in pending.deleted_products:
+                # Mirror the ORM's ``cascade="all,delete"`` on Product.
+                conn.execute(delete(models.Sale.__table__).where(models.Sale.product_id == product_id))
+                conn.execute(
+                    delete(models.InventoryEvent.__table__).where(models.InventoryEvent.product_id == product_id)
+                )
+                conn.execute(
+                    delete(models.InventoryCheckpoint.__table__).where(
+                        models.InventoryCheckpoint.product_id == product_id
+                    )
+                )
+                conn.execute(delete(products).where(products.c.id == product_id))
+            for row in product_rows:
+                result = conn.execute(update(products).where(products.c.id == row["id"]).values(**row))
+                if result.rowcount == 0:
+                    conn.execute(insert(products).values(**row))
+            if pending.sales:
+                conn.execute(
+                    insert(models.Sale.__table__),
+                    [
+                        {
+                            "id": sale.id,
+                            "product_id": sale.product_id,
+                            "quantity": sale.quantity,
+                            "total_cents": sale.total_cents,
+                            "payment_method": sale.payment_method,
+                            "status": models.SaleStatusEnum(sale.status),
+                            "error_message": sale.error_message,
+                            "created_at": sale.created_at,
+                        }
+                        for sale in pending.sales
+                    ],
+                )
+            if pending.events:
+                conn.execute(insert(models.InventoryEvent.__table__), [event._asdict() for event in pending.events])
+            if pending.telemetry and telemetry_blocks.enabled():
+                telemetry_blocks.TelemetryBlocks(conn).append(sample._asdict() for sample in pending.telemetry)
+            elif pending.telemetry:
+                conn.execute(insert(models.Telemetry.__table__), [sample._asdict() for sample in pending.telemetry])
+            if pending.device_state:
+                state = models.DeviceState.__table__
+                state_id = conn.scalar(select(state.c.id).order_by(state.c.id))
+                if state_id is None:
+                    conn.execute(insert(state).values(**device_row))
+                else:
+                    conn.execute(update(state).where(state.c.id == state_id).values(**device_row))
+        return (
+            len(pending.deleted_products)
+            + len(product_rows)
+            + len(pending.sales)
+            + len(pending.events)
+            + len(pending.telemetry)
+            + int(pending.device_state)
+        )
+
+    # Internals -----------------------------------------------------------
+
+    def _record_sale(
+        self,
+        product: _Product,
+        quantity: int,
+        total_cents: int,
+        method: str,
+        status: str,
+        error_message: str | None = None,
+    ) -> dict:
+        """Append a sale; the caller must hold ``self._lock``."""
+        now = datetime.utcnow()
+        sale = _Sale(self._next_sale_id, product.id, quantity, total_cents, method, status, error_message, now)
+        self._next_sale_id += 1
+        self._sales.append(sale)
+        self._pending.sales.append(sale)
+        get_sales_columns().append(sale.id, now, product.id, quantity, total_cents, method, status)
+        if status == "success":
+            product.updated_at = now
+            self._pending.products.add(product.id)
+            rollup = self._daily.get(now.date())
+            if rollup is None:
+                rollup = self._daily[now.date()] = _DayRollup()
+                self._prune_rollups(now.date())
+            rollup.add(product.id, 1, quantity, total_cents)
+        return sale.as_dict()
+
+    def _ordered(self) -> list[_Product]:
+        """Products in slot order; the sort is cached until a slot is added or removed."""
+        if self._catalogue is None:
+            self._catalogue = sorted(self._products.values(), key=lambda product: product.slot_code)
+        return self._catalogue
+
+    def _rollups_since(self, days: int) -> list[_DayRollup]:
+        first_day = (datetime.utcnow() - timedelta(days=days)).date()
+        archived_before = get_archive().archived_before
+        if archived_before is not None:
+            # Archived days are answered from the archive, even if still rolled up here.
+            first_day = max(first_day, archived_before.date())
+        return [rollup for day, rollup in self._daily.items() if day >= first_day]
+
+    def _new_telemetry(self, temperature: float, humidity: float, door_open: bool, created_at: datetime) -> _Telemetry:
+        """Build a sample with its id; the caller must hold ``self._lock``."""
+        if telemetry_blocks.enabled():
+            created_at = telemetry_blocks.truncate(created_at)
+            return _Telemetry(telemetry_blocks.sample_id(created_at), temperature, humidity, door_open, created_at)
+        self._next_telemetry_id += 1
+        return _Telemetry(self._next_telemetry_id - 1, temperature, humidity, door_open, created_at)
+
+    @staticmethod
+    def _stored_telemetry_times(start: datetime, end: datetime) -> set[datetime]:
+        from sqlalchemy import select
+
+        from . import models
+        from .database import get_engine
+
+        created_at = models.Telemetry.created_at
+        with get_engine().connect() as conn:
+            if telemetry_blocks.enabled():
+                return telemetry_blocks.TelemetryBlocks(conn).timestamps_between(start, end)
+            return set(conn.scalars(select(created_at).where(created_at.between(start, end))))
+
+    def _prune_rollups(self, today: date) -> None:
+        oldest = today - timedelta(days=ROLLUP_RETENTION_DAYS)
+        for day in [day for day in self._daily if day < oldest]:
+            del self._daily[day]
+
+    def _get_or_error(self, product_id: Any) -> _Product:
+        product = self._products.get(product_id)
+        if product is None:
+            raise ValueError(f"Product {product_id} not found")
+        return product
+
+    @staticmethod
+    def _product_row(product: _Product) -> dict:
+        return {
+            "id": product.id,
+            "name": product.name,
+            "slot_code": product.slot_code,
+            "price_cents": product.price_cents,
+            "quantity": product.quantity,
+            "is_active": product.is_active,
+            "created_at": product.created_at,
+            "updated_at": product.updated_at,
+        }
+
+    @staticmethod
+    def _validate_name(name: Any) -> str:
+        if not isinstance(name, str) or not 1 <= len(name) <= 120:
+            raise ValueError("name must be 1-120 characters")
+        return name
+
+    @staticmethod
+    def _validate_price(price: Any) -> int:
+        price_cents = ensure_cents(price, "price")
+        if price_cents <= 0:
+            raise ValueError("price must be greater than zero")
+        return price_cents
+
+    @staticmethod
+    def _validate_quantity(quantity: Any) -> int:
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 0:
+            raise ValueError("quantity must be a non-negative integer")
+        return quantity
+
+
+__all__ = ["VendingMachine", "ensure_decimal", "from_cents", "to_cents"]
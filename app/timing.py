@@ -0,0 +1,165 @@
+"""Per-request phase timings, sent as ``Server-Timing`` and logged for slow requests.
+
+:class:`TimingMiddleware` starts a :class:`RequestTimer` for every ``/api/``
+request and keeps it in a context variable. The variable follows the request
+into threadpool endpoints. Services wrap their steps in :func:`phase`, for
+example ``with phase("dispense"):``. Outside a request, such as in the
+maintenance loop, :func:`phase` does nothing. Engines registered with
+:func:`install_sql_timing` add each statement's text and duration. Parameters
+are never recorded.
+
+With ``settings.server_timing`` on, every API response carries a header like
+this::
+
+    Server-Timing: lookup;dur=0.4, authorise;dur=0.1, dispense;dur=801.9, record;dur=0.6,
+                   commit;dur=3.2, sql;dur=4.1;desc="5 statements", total;dur=809.7
+
+Browser dev tools show it as a waterfall, and ``curl -i`` shows it too. Totals
+are accumulated when a phase runs more than once. ``sql`` overlaps the phases
+that issued the statements.
+
+A request that takes longer than ``settings.slow_request_ms`` is also written
+as one JSON line to the ``app.slow_requests`` logger. The line holds the method,
+path, status, phases and up to ``settings.slow_request_statements`` SQL
+statements.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from .config import settings
+
+slow_log = logging.getLogger("app.slow_requests")
+
+TIMED_PREFIX = "/api/"
+_WHITESPACE = re.compile(r"\s+")
+
+
+class RequestTimer:
+    __slots__ = ("started", "phases", "sql_count", "sql_seconds", "statements")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.statements: list[tuple[float, str]] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_statement(self, statement: str, seconds: float) -> None:
+        self.sql_count += 1
+        self.sql_seconds += seconds
+        if len(self.statements) < settings.slow_request_statements:
+            self.statements.append((seconds, statement))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header(self) -> str:
+        metrics = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        if self.sql_count:
+            metrics.append(f'sql;dur={self.sql_seconds * 1000:.1f};desc="{self.sql_count} statements"')
+        metrics.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(metrics)
+
+    def report(self) -> dict:
+        return {
+            "ms": round(self.elapsed() * 1000, 1),
+            "phases": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            "sql": {
+                "count": self.sql_count,
+                "ms": round(self.sql_seconds * 1000, 1),
+                "statements": [
+                    {"ms": round(seconds * 1000, 2), "sql": _WHITESPACE.sub(" ", statement).strip()[:500]}
+                    for seconds, statement in self.statements
+                ],
+            },
+        }
+
+
+_current: ContextVar[RequestTimer | None] = ContextVar("request_timer", default=None)
+
+
+def current_timer() -> RequestTimer | None:
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Add the time spent in the block to the current request's ``name`` phase."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - started)
+
+
+def record_phase(name: str, seconds: float) -> None:
+    timer = _current.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault("timing_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    timer = _current.get()
+    started = conn.info.get("timing_started")
+    if timer is not None and started:
+        timer.add_statement(statement, time.perf_counter() - started.pop())
+
+
+def install_sql_timing(sync_engine) -> None:
+    """Report ``sync_engine``'s statements to the request timer (use ``.sync_engine`` for async engines)."""
+    from sqlalchemy import event
+
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class TimingMiddleware:
+    """ASGI middleware timing ``/api/`` requests; see the module docstring."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(TIMED_PREFIX):
+            await self.app(scope, receive, send)
+            return
+        timer = RequestTimer()
+        token = _current.set(timer)
+        status_code = 500
+
+        async def timed(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.server_timing:
+                    headers = [*message.get("headers", []), (b"server-timing", timer.header().encode())]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed)
+        finally:
+            _current.reset(token)
+            if settings.slow_request_ms > 0 and timer.elapsed() * 1000 >= settings.slow_request_ms:
+                entry = {"method": scope["method"], "path": scope["path"], "status": status_code, **timer.report()}
+                slow_log.warning("%s", json.dumps(entry, separators=(",", ":")))
@@ -0,0 +1,130 @@
+"""Compare threadpool-backed sync endpoints with native async endpoints.
+
+Both routers are mounted on separate FastAPI apps pointing at the same scratch
+SQLite database and driven in-process through ``httpx.ASGITransport`` at
+increasing concurrency, for a read-heavy mix and for purchases::
+
+    python benchmarks/bench_async_api.py --levels 1 8 32 128 --requests 400
+
+The mock actuator delay defaults to zero so the numbers reflect request
+handling overhead rather than the simulated motor pulse.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+READ_PATHS = (
+    "/api/v1/vending/products?active_only=true",
+    "/api/v1/vending/products?active_only=true",
+    "/api/v1/vending/products?active_only=true",
+    "/api/v1/analytics/sales/summary",
+    "/api/v1/analytics/inventory/turnover",
+)
+
+
+def build_apps():
+    from fastapi import FastAPI
+
+    from app.api.router import api_router, async_api_router
+
+    sync_app = FastAPI()
+    sync_app.include_router(api_router, prefix="/api/v1")
+    async_app = FastAPI()
+    async_app.include_router(async_api_router, prefix="/api/v1")
+    return {"sync": sync_app, "async": async_app}
+
+
+def seed(products: int) -> list[int]:
+    from app import models
+    from app.database import SessionLocal, init_db
+
+    init_db()
+    with SessionLocal() as session:
+        for index in range(products):
+            session.add(
+                models.Product(name=f"Item {index}", slot_code=f"S{index}", price_cents=150, quantity=10**9)
+            )
+        session.commit()
+        return [product.id for product in session.query(models.Product).all()]
+
+
+async def run_level(app, workload: str, concurrency: int, total: int, product_ids: list[int]) -> dict:
+    import httpx
+
+    latencies: list[float] = []
+    counter = itertools.count()
+    ids = itertools.cycle(product_ids)
+    errors = 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+
+        async def worker() -> None:
+            nonlocal errors
+            while next(counter) < total:
+                started = time.perf_counter()
+                if workload == "read":
+                    response = await client.get(READ_PATHS[len(latencies) % len(READ_PATHS)])
+                else:
+                    response = await client.post(
+                        "/api/v1/vending/purchase",
+                        json={"product_id": next(ids), "quantity": 1, "payment_method": "card", "amount_paid": "2"},
+                    )
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=400, help="requests per level")
+    parser.add_argument("--products", type=int, default=12)
+    parser.add_argument("--dispense-delay", type=float, default=0.0, help="mock actuator pulse in seconds")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="pivend-bench-")
+    os.environ["PIVEND_DATABASE_URL"] = f"sqlite:///{scratch}/bench.db"
+
+    from app.services.hardware import MockHardware
+
+    MockHardware.dispense_delay = args.dispense_delay
+    product_ids = seed(args.products)
+    apps = build_apps()
+
+    print(f"{'workload':<9}{'mode':<7}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    for workload in ("read", "purchase"):
+        for level in args.levels:
+            for mode, app in apps.items():
+                result = asyncio.run(run_level(app, workload, level, args.requests, product_ids))
+                print(
+                    f"{workload:<9}{mode:<7}{level:>6}{result['rps']:>10.1f}"
+                    f"{result['p50']:>10.2f}{result['p95']:>10.2f}{result['errors']:>8}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Fan the sales summary and turnover queries out over many machine databases.
+
+Seeds one machine database with ``--sales`` rows over the last 60 days, copies
+it ``--machines`` times, then times :class:`~app.services.fleet.FleetAnalytics`
+cold with one worker, cold with thread and process pools, warm from the
+per-file cache, and after one file changes::
+
+    python benchmarks/bench_fleet.py --machines 500 --sales 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def seed(path: Path, count: int) -> None:
+    import numpy as np
+    from sqlalchemy import create_engine, insert
+
+    from app import models
+    from app.database import Base
+
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    rng = np.random.default_rng(1)
+    now = datetime.utcnow()
+    seconds = rng.integers(0, 60 * 86_400, count)
+    product_ids = rng.integers(1, 41, count)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(models.Product.__table__),
+            [
+                {"id": pid, "name": f"Item {pid}", "slot_code": f"S{pid}", "price_cents": 125, "quantity": 9}
+                for pid in range(1, 41)
+            ],
+        )
+        conn.execute(
+            insert(models.Sale.__table__),
+            [
+                {
+                    "product_id": int(product_ids[i]),
+                    "quantity": 1,
+                    "total_cents": 125,
+                    "payment_method": "card",
+                    "created_at": now - timedelta(seconds=int(seconds[i])),
+                }
+                for i in range(count)
+            ],
+        )
+    engine.dispose()
+
+
+def timed(label: str, run) -> None:
+    started = time.perf_counter()
+    summary = run()
+    print(f"{label:>38}: {time.perf_counter() - started:7.2f} s   ({summary['machines']} machines)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--machines", type=int, default=500)
+    parser.add_argument("--sales", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    scratch = Path(tempfile.mkdtemp(prefix="pivend-fleet-"))
+    os.environ["PIVEND_DATABASE_URL"] = f"sqlite:///{scratch}/unused.db"
+    from app.services.fleet import FleetAnalytics
+
+    fleet_dir = scratch / "fleet"
+    fleet_dir.mkdir()
+    seed(scratch / "template.db", args.sales)
+    for index in range(args.machines):
+        shutil.copyfile(scratch / "template.db", fleet_dir / f"pi-{index:04d}.db")
+    print(f"{args.machines} databases of {args.sales:,} sales, {os.cpu_count()} CPUs")
+
+    try:
+        serial = FleetAnalytics(fleet_dir, workers=1)
+        timed("summary, 1 worker, cold", lambda: serial.sales_summary(days=30))
+        serial.close()
+        for kind in ("thread", "process"):
+            fleet = FleetAnalytics(fleet_dir, workers=args.workers, executor=kind)
+            # The first process run includes spawning the workers.
+            timed(f"summary, {args.workers} {kind} workers, cold", lambda: fleet.sales_summary(days=30))
+            timed(f"turnover, {args.workers} {kind} workers, cold", lambda: fleet.inventory_turnover(days=30))
+            timed(f"summary, {args.workers} {kind} workers, cached", lambda: fleet.sales_summary(days=30))
+            os.utime(fleet_dir / "pi-0000.db")
+            timed(f"summary, {args.workers} {kind} workers, 1 changed", lambda: fleet.sales_summary(days=30))
+            fleet.close()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Compare ad-hoc sales slices on the columnar copy with SQL GROUP BY queries.
+
+Seeds a scratch SQLite database with ``--sales`` rows spread over a year, times
+:func:`~app.services.sales_columns.load_from_history`, then runs each question
+both as a hand-written SQL aggregate and as a :meth:`SalesColumns.query`::
+
+    python benchmarks/bench_sales_query.py --sales 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+START = datetime(2030, 1, 1)
+END = START + timedelta(days=365)
+WINDOW = (END - timedelta(days=90), END)
+
+SQL = {
+    "revenue by hour, 90 d": (
+        "SELECT strftime('%H', created_at) AS hour, count(*), sum(quantity), sum(total_cents) FROM sales "
+        "WHERE status = 'SUCCESS' AND created_at >= :start AND created_at < :end GROUP BY hour"
+    ),
+    "payment mix, all time": (
+        "SELECT payment_method, count(*), sum(total_cents) FROM sales WHERE status = 'SUCCESS' GROUP BY payment_method"
+    ),
+    "failure rate per product": "SELECT product_id, avg(status = 'FAILED'), count(*) FROM sales GROUP BY product_id",
+    "daily units, product 7": (
+        "SELECT date(created_at) AS day, sum(quantity) FROM sales "
+        "WHERE status = 'SUCCESS' AND product_id = 7 GROUP BY day"
+    ),
+}
+
+COLUMNAR = {
+    "revenue by hour, 90 d": dict(start=WINDOW[0], end=WINDOW[1], group_by=["hour"]),
+    "payment mix, all time": dict(group_by=["payment_method"], metrics=["sales", "revenue_cents"]),
+    "failure rate per product": dict(group_by=["product_id"], metrics=["failure_rate", "sales", "failed"]),
+    "daily units, product 7": dict(product_ids=[7], group_by=["day"], metrics=["units"]),
+}
+
+
+def seed(count: int) -> None:
+    import numpy as np
+    from sqlalchemy import insert
+
+    from app import models
+    from app.database import get_engine, init_db
+
+    init_db()
+    rng = np.random.default_rng(1)
+    seconds = np.sort(rng.integers(0, 365 * 86_400, count))
+    product_ids = rng.integers(1, 41, count)
+    quantities = rng.integers(1, 3, count)
+    failed = rng.random(count) < 0.03
+    methods = np.array(["card", "cash", "mobile"])[rng.integers(0, 3, count)]
+    with get_engine().begin() as conn:
+        products = [
+            {"id": pid, "name": f"Item {pid}", "slot_code": f"S{pid}", "price_cents": 125, "quantity": 9}
+            for pid in range(1, 41)
+        ]
+        conn.execute(insert(models.Product.__table__), products)
+        for first in range(0, count, 100_000):
+            batch = range(first, min(first + 100_000, count))
+            conn.execute(
+                insert(models.Sale.__table__),
+                [
+                    {
+                        "product_id": int(product_ids[i]),
+                        "quantity": int(quantities[i]),
+                        "total_cents": 125 * int(quantities[i]),
+                        "payment_method": str(methods[i]),
+                        "status": models.SaleStatusEnum.FAILED if failed[i] else models.SaleStatusEnum.SUCCESS,
+                        "created_at": START + timedelta(seconds=int(seconds[i])),
+                    }
+                    for i in batch
+                ],
+            )
+
+
+def best_of(repeat: int, run) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sales", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="pivend-columns-")
+    os.environ["PIVEND_DATABASE_URL"] = f"sqlite:///{scratch}/sales.db"
+
+    from sqlalchemy import text
+
+    from app.database import get_read_engine
+    from app.services.sales_columns import SalesColumns, load_from_history
+
+    started = time.perf_counter()
+    seed(args.sales)
+    print(f"seeded {args.sales:,} sales in {time.perf_counter() - started:.1f} s")
+
+    columns = SalesColumns()
+    started = time.perf_counter()
+    load_from_history(columns)
+    print(f"columnar load: {time.perf_counter() - started:.2f} s")
+
+    params = {"start": WINDOW[0], "end": WINDOW[1]}
+    with get_read_engine().connect() as conn:
+        for label, sql in SQL.items():
+            sql_time = best_of(args.repeat, lambda: conn.execute(text(sql), params).all())
+            columnar_time = best_of(args.repeat, lambda: columns.query(**COLUMNAR[label]))
+            print(
+                f"{label:>26}: SQL {sql_time * 1e3:8.1f} ms   columnar {columnar_time * 1e3:7.1f} ms"
+                f"   ({sql_time / columnar_time:,.0f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
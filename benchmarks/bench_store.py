@@ -0,0 +1,68 @@
+"""Measure in-memory vend bookkeeping and checkpoint cost of ``app.store``.
+
+The mock actuator delay is set to zero so only the store's own work is timed::
+
+    python benchmarks/bench_store.py --vends 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vends", type=int, default=100_000)
+    parser.add_argument("--products", type=int, default=40)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="pivend-store-")
+    os.environ["PIVEND_DATABASE_URL"] = f"sqlite:///{scratch}/store.db"
+
+    from app.database import init_db
+    from app.services.hardware import MockHardware
+    from app.store import VendingMachine
+
+    MockHardware.dispense_delay = 0.0
+    init_db()
+    store = VendingMachine()
+    store.load()
+    ids = [
+        store.create_product({"name": f"Item {i}", "slot_code": f"S{i}", "price": "1.50", "quantity": 10**9})["id"]
+        for i in range(args.products)
+    ]
+
+    latencies = []
+    for index in range(args.vends):
+        payload = {"product_id": ids[index % len(ids)], "quantity": 1, "payment_method": "card", "amount_paid": "2"}
+        started = time.perf_counter()
+        store.vend(payload)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    print(f"vend: p50 {statistics.median(latencies) * 1e6:.1f} us, p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} us")
+
+    for label, call in (
+        ("list_products", lambda: store.list_products(active_only=True)),
+        ("sales_summary", lambda: store.sales_summary(days=30)),
+    ):
+        started = time.perf_counter()
+        for _ in range(1000):
+            call()
+        print(f"{label}: {(time.perf_counter() - started) * 1e3:.1f} us per call")
+
+    started = time.perf_counter()
+    written = store.checkpoint()
+    print(f"checkpoint: {written} rows in {(time.perf_counter() - started) * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
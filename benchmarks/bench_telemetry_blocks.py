@@ -0,0 +1,119 @@
+"""Compare row and block telemetry storage: file size and trend-query time.
+
+Fills two scratch SQLite databases with the same readings (``--days`` at one
+sample every ``--interval`` seconds), one in the ``telemetry`` table and one in
+``telemetry_blocks``, vacuums both and times reading a 24 h and a 7 day window
+into arrays, as a trend chart would::
+
+    python benchmarks/bench_telemetry_blocks.py --days 30 --interval 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+START = datetime(2030, 1, 1)
+
+
+def make_day(day: int, interval: int) -> list[dict]:
+    first = START + timedelta(days=day)
+    return [
+        {
+            "temperature_c": round(4.0 + (index % 60) * 0.05, 2),
+            "humidity": round(40.0 + (index % 13) * 0.5, 1),
+            "door_open": index % 700 == 0,
+            "created_at": first + timedelta(seconds=interval * index),
+        }
+        for index in range(86_400 // interval)
+    ]
+
+
+def fill(engine, days: int, interval: int, blocks: bool) -> None:
+    from sqlalchemy import insert
+
+    from app import models
+    from app.services.telemetry_blocks import TelemetryBlocks
+
+    for day in range(days):
+        with engine.begin() as conn:
+            if blocks:
+                TelemetryBlocks(conn).append(make_day(day, interval))
+            else:
+                conn.execute(insert(models.Telemetry.__table__), make_day(day, interval))
+    with engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+
+
+def query_rows(engine, start: datetime, end: datetime):
+    import numpy as np
+    from sqlalchemy import select
+
+    from app import models
+
+    table = models.Telemetry.__table__
+    stmt = select(table.c.created_at, table.c.temperature_c, table.c.humidity).where(
+        table.c.created_at.between(start, end)
+    )
+    with engine.connect() as conn:
+        rows = conn.execute(stmt.order_by(table.c.created_at)).all()
+    return np.array([row.temperature_c for row in rows], dtype=float)
+
+
+def query_blocks(engine, start: datetime, end: datetime):
+    from app.services.telemetry_blocks import TelemetryBlocks
+
+    with engine.connect() as conn:
+        return TelemetryBlocks(conn).arrays(start, end)["temperature_c"]
+
+
+def timed(query, engine, start: datetime, end: datetime, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        values = query(engine, start, end)
+        best = min(best, time.perf_counter() - started)
+    return best, len(values)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--interval", type=int, default=10, help="seconds between samples")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="pivend-blocks-")
+    os.environ["PIVEND_DATABASE_URL"] = f"sqlite:///{scratch}/unused.db"
+
+    from sqlalchemy import create_engine
+
+    from app import models
+
+    engines = {}
+    for label, blocks in (("rows", False), ("blocks", True)):
+        path = Path(scratch) / f"{label}.db"
+        engine = engines[label] = create_engine(f"sqlite:///{path}")
+        table = models.TelemetryBlock.__table__ if blocks else models.Telemetry.__table__
+        table.create(engine)
+        started = time.perf_counter()
+        fill(engine, args.days, args.interval, blocks)
+        print(f"{label:>7}: {path.stat().st_size / 1e6:8.2f} MB  (filled in {time.perf_counter() - started:.1f} s)")
+
+    end = START + timedelta(days=args.days)
+    for name, window in (("24 h", timedelta(hours=24)), ("7 d", timedelta(days=7))):
+        for label, query in (("rows", query_rows), ("blocks", query_blocks)):
+            elapsed, count = timed(query, engines[label], end - window, end, args.repeat)
+            print(f"{label:>7} {name:>4}: {elapsed * 1e3:8.1f} ms  ({count:,} samples)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Compare per-sample telemetry inserts with the bulk ingest endpoint.
+
+Each run uses a fresh scratch SQLite database. ``per-sample`` mimics one request
+per reading (insert, refresh and commit per sample); the other rows post the
+whole batch to ``/vending/telemetry/ingest`` on the SQL router::
+
+    python benchmarks/bench_telemetry_ingest.py --samples 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def make_samples(count: int, start: datetime) -> list[dict]:
+    return [
+        {
+            "temperature_c": 4.0 + (index % 7) * 0.1,
+            "humidity": 40.0 + index % 5,
+            "door_open": index % 500 == 0,
+            "created_at": (start + timedelta(seconds=30 * index)).isoformat(),
+        }
+        for index in range(count)
+    ]
+
+
+def per_sample(samples: list[dict]) -> float:
+    from app import models
+    from app.database import SessionLocal
+    from app.repositories import TelemetryRepository
+
+    started = time.perf_counter()
+    for sample in samples:
+        with SessionLocal() as session:
+            TelemetryRepository(session).log(
+                models.Telemetry(**{**sample, "created_at": datetime.fromisoformat(sample["created_at"])})
+            )
+            session.commit()
+    return time.perf_counter() - started
+
+
+def bulk(client, samples: list[dict], ndjson: bool) -> float:
+    started = time.perf_counter()
+    if ndjson:
+        body = "\n".join(json.dumps(sample) for sample in samples)
+        response = client.post(
+            "/api/v1/vending/telemetry/ingest", content=body, headers={"Content-Type": "application/x-ndjson"}
+        )
+    else:
+        response = client.post("/api/v1/vending/telemetry/ingest", json=samples)
+    elapsed = time.perf_counter() - started
+    assert response.json()["inserted"] == len(samples), response.text
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=5_000)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="pivend-ingest-")
+    os.environ["PIVEND_DATABASE_URL"] = f"sqlite:///{scratch}/ingest.db"
+    os.environ["PIVEND_STORAGE_BACKEND"] = "sql"
+    os.environ["PIVEND_RETENTION_DAYS"] = "0"
+    os.environ["PIVEND_RECONCILE_INTERVAL_HOURS"] = "0"
+
+    from fastapi.testclient import TestClient
+
+    from app.main import create_app
+
+    with TestClient(create_app()) as client:
+        base = datetime(2030, 1, 1)
+        results = {
+            "per-sample": per_sample(make_samples(args.samples, base)),
+            "bulk JSON": bulk(client, make_samples(args.samples, base + timedelta(days=100)), ndjson=False),
+            "bulk NDJSON": bulk(client, make_samples(args.samples, base + timedelta(days=200)), ndjson=True),
+        }
+        # Re-sending a batch exercises the duplicate check alone.
+        replay = make_samples(args.samples, base)
+        started = time.perf_counter()
+        response = client.post("/api/v1/vending/telemetry/ingest", json=replay)
+        results["bulk, all duplicates"] = time.perf_counter() - started
+        assert response.json()["duplicates"] == args.samples
+
+    for label, elapsed in results.items():
+        rate = args.samples / elapsed
+        print(f"{label:>22}: {elapsed * 1e3:8.1f} ms  ({rate:,.0f} samples/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Replay a production traffic capture against the current build.
+
+Capture files come from a machine running with ``PIVEND_CAPTURE_DIR`` set (see
+:mod:`app.capture`). They are replayed in-process against ``create_app()`` with
+mock hardware and a scratch copy of that machine's database, so purchases
+find the products and stock they found in production::
+
+    python benchmarks/replay_capture.py data/capture --seed-db vending.db --speed 10
+
+``--speed 1`` keeps the captured spacing, ``--speed 10`` compresses an hour
+into six minutes and ``--speed 0`` sends requests back to back. Any
+``PIVEND_*`` settings in the environment apply to the replayed app, so the
+same capture can be compared across storage backends or admission limits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def copy_database(source: str, target: str) -> None:
+    # The backup API gives a consistent copy even of a database with a live WAL.
+    with sqlite3.connect(f"file:{source}?mode=ro", uri=True) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+async def run(app, records, speed: float) -> dict:
+    from app.capture import replay
+
+    async with app.router.lifespan_context(app):
+        return await replay(records, app, speed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", nargs="+", help="capture files or directories of them")
+    parser.add_argument("--seed-db", help="machine database to start from (default: empty)")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression; 0 sends back to back")
+    parser.add_argument("--dispense-delay", type=float, help="mock actuator pulse in seconds")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="pivend-replay-")
+    database = f"{scratch}/replay.db"
+    if args.seed_db:
+        copy_database(args.seed_db, database)
+    os.environ["PIVEND_DATABASE_URL"] = f"sqlite:///{database}"
+    os.environ["PIVEND_GPIO_MODE"] = "mock"
+    os.environ["PIVEND_ARCHIVE_DIR"] = f"{scratch}/archive"
+    os.environ["PIVEND_RETENTION_DAYS"] = "0"
+    os.environ["PIVEND_RECONCILE_INTERVAL_HOURS"] = "0"
+    for name in ("PIVEND_HARDWARE_SOCKET", "PIVEND_CAPTURE_DIR"):
+        os.environ.pop(name, None)
+
+    from app.capture import format_report, read_capture
+    from app.main import create_app
+    from app.services.hardware import MockHardware
+
+    if args.dispense_delay is not None:
+        MockHardware.dispense_delay = args.dispense_delay
+    records = list(read_capture(args.capture))
+    report = asyncio.run(run(create_app(), records, args.speed))
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Report where cold-start time goes: module imports and time to first 200.
+
+Runs against a scratch database so it can be used on a development machine
+as well as on the Pi itself::
+
+    python benchmarks/startup_profile.py --top 15
+
+The import section is parsed from ``python -X importtime``; the second section
+spawns ``uvicorn app.main:app`` and polls ``/`` until it answers 200.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def scratch_env() -> dict[str, str]:
+    scratch = tempfile.mkdtemp(prefix="pivend-startup-")
+    env = dict(os.environ)
+    env["PIVEND_DATABASE_URL"] = f"sqlite:///{scratch}/vending.db"
+    env["PYTHONPATH"] = str(ROOT)
+    return env
+
+
+def import_times(env: dict[str, str], module: str) -> list[tuple[int, int, str]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_ok(env: dict[str, str], timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise TimeoutError(f"no 200 from uvicorn within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15, help="number of imports to list")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    env = scratch_env()
+    rows = import_times(env, args.module)
+    total_us = next((cumulative for _, cumulative, name in rows if name.strip() == args.module), 0)
+    print(f"import {args.module}: {total_us / 1000:.1f} ms total")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda row: row[1], reverse=True)[: args.top]:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {name}")
+
+    elapsed = time_to_first_ok(env, args.timeout)
+    print(f"\nuvicorn spawn to first 200 on /: {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from app.admission import AdmissionController, AdmissionMiddleware, Rejected  # noqa: E402
+
+
+def _scope(host: str) -> dict:
+    return {"type": "http", "method": "POST", "path": "/buy", "client": (host, 5000), "headers": []}
+
+
+def test_kiosk_jumps_the_queue_and_overflow_is_refused() -> None:
+    async def scenario() -> tuple[list[str], list, dict]:
+        controller = AdmissionController(1, {"kiosk": 2, "remote": 1}, max_wait=0.5, kiosk_hosts=["127.0.0.1"])
+        order: list[str] = []
+        statuses: list = []
+
+        async def route(scope, receive, send) -> None:
+            order.append(scope["client"][0])
+            await asyncio.sleep(0.05)
+            await send({"type": "http.response.start", "status": 201, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+        middleware = AdmissionMiddleware(route, ["/buy"], controller)
+
+        async def call(host: str) -> None:
+            sent = []
+
+            async def send(message) -> None:
+                sent.append(message)
+
+            await middleware(_scope(host), None, send)
+            start = sent[0]
+            statuses.append((host, start["status"], dict(start["headers"]).get(b"retry-after")))
+
+        first = asyncio.create_task(call("10.0.0.5"))
+        await asyncio.sleep(0.01)
+        calls = [asyncio.create_task(call(host)) for host in ("10.0.0.6", "10.0.0.7", "127.0.0.1")]
+        await asyncio.gather(first, *calls)
+        return order, statuses, controller.state()
+
+    order, statuses, state = asyncio.run(scenario())
+    # The remote queue holds one: 10.0.0.7 is refused at once (one ahead, ~1 s each) and the
+    # kiosk overtakes 10.0.0.6.
+    assert order == ["10.0.0.5", "127.0.0.1", "10.0.0.6"]
+    assert ("10.0.0.7", 429, b"2") in statuses
+    assert state["in_flight"] == 0 and state["classes"]["remote"]["rejected"] == 1
+    assert state["classes"]["kiosk"]["admitted"] == 1 and state["classes"]["kiosk"]["wait_ms_max"] > 0
+
+
+def test_queued_purchase_times_out_with_503() -> None:
+    async def scenario() -> None:
+        controller = AdmissionController(1, {"kiosk": 1, "remote": 1}, max_wait=0.05, kiosk_hosts=[])
+        await controller.acquire("remote")
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire("remote")
+        assert rejected.value.status_code == 503 and rejected.value.retry_after >= 1
+        controller.release(0.2)
+        assert controller.state()["in_flight"] == 0
+        assert controller.state()["classes"]["remote"]["timed_out"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_slot_handed_over_as_the_wait_expires_is_released(monkeypatch) -> None:
+    controller = AdmissionController(1, {"kiosk": 1, "remote": 1}, max_wait=0.05, kiosk_hosts=[])
+
+    async def handover_then_timeout(future, timeout):
+        controller.release()  # the running purchase finishes and hands its slot to the waiter...
+        raise asyncio.TimeoutError  # ...in the same tick its wait expires
+
+    async def scenario() -> None:
+        await controller.acquire("remote")
+        monkeypatch.setattr(asyncio, "wait_for", handover_then_timeout)
+        with pytest.raises(Rejected):
+            await controller.acquire("remote")
+
+    asyncio.run(scenario())
+    assert controller.state()["in_flight"] == 0
@@ -36,6 +36,9 @@ def test_full_vending_flow(client: TestClient) -> None:
     assert response.status_code == 201, response.json()
     product = response.json()
     product_id = product["id"]
+    # A fraction of a cent must not round down to a free product or payment.
+    free = client.post("/api/v1/admin/products", json={**product_payload, "slot_code": "A9", "price": "0.004"})
+    assert free.status_code in (400, 422)
 
     purchase_payload = {
         "product_id": product_id,
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import os
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from app.api.router import async_api_router  # noqa: E402
+from app.database import init_db  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    init_db()
+    app = FastAPI()
+    app.include_router(async_api_router, prefix="/api/v1")
+    with TestClient(app) as client:
+        yield client
+
+
+def test_async_vending_flow(client: TestClient) -> None:
+    response = client.post(
+        "/api/v1/admin/products",
+        json={"name": "Water", "slot_code": "B2", "price": "1.25", "quantity": 4},
+    )
+    assert response.status_code == 201, response.json()
+    product_id = response.json()["id"]
+
+    purchase = client.post(
+        "/api/v1/vending/purchase",
+        json={"product_id": product_id, "quantity": 3, "payment_method": "cash", "amount_paid": "5.00"},
+    )
+    assert purchase.status_code == 201, purchase.json()
+    assert purchase.json()["status"] == "success"
+    assert Decimal(purchase.json()["total_price"]) == Decimal("3.75")
+
+    rejected = client.post(
+        "/api/v1/vending/purchase",
+        json={"product_id": product_id, "quantity": 2, "payment_method": "cash", "amount_paid": "5.00"},
+    )
+    assert rejected.status_code == 400
+
+    products = client.get("/api/v1/vending/products").json()
+    assert next(item for item in products if item["id"] == product_id)["quantity"] == 1
+
+    assert client.post("/api/v1/vending/telemetry/capture").status_code == 200
+    turnover = client.get("/api/v1/analytics/inventory/turnover").json()
+    assert any(item["slot_code"] == "B2" and item["sold_last_period"] == 3 for item in turnover["products"])
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from app.capture import (  # noqa: E402
+    UNPARSED,
+    CaptureLog,
+    CaptureMiddleware,
+    read_capture,
+    redact_body,
+    redact_query,
+    replay,
+)
+
+
+async def _echo(scope, receive, send) -> None:
+    body = b""
+    if scope["method"] == "POST":
+        body = (await receive())["body"]
+    status = 404 if scope["path"].endswith("/999") else 200
+    await send({"type": "http.response.start", "status": status, "headers": []})
+    await send({"type": "http.response.body", "body": body or b"{}"})
+
+
+async def _call(middleware, path: str, body: bytes = b"", host: str = "127.0.0.1", headers=()) -> bytes:
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message) -> None:
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "POST" if body else "GET",
+        "path": path,
+        "query_string": b"",
+        "client": (host, 5000),
+        "headers": [(b"content-type", b"application/json"), *headers] if body else [],
+    }
+    await middleware(scope, receive, send)
+    return sent[-1]["body"]
+
+
+def test_capture_redacts_and_rotates(tmp_path) -> None:
+    payload = {"product_id": 3, "payment": {"method": "card", "card_number": "4111111111111111", "CVV": "123"}}
+    log = CaptureLog(tmp_path / "full")
+    middleware = CaptureMiddleware(_echo, log)
+    body = json.dumps(payload).encode()
+    key = [(b"idempotency-key", b"k-1")]
+    reply = asyncio.run(_call(middleware, "/api/v1/vending/purchase", body, "203.0.113.9", key))
+    asyncio.run(_call(middleware, "/ui/"))
+    log.close()
+
+    # The app still received the real body; only the capture is redacted.
+    assert json.loads(reply) == payload
+    (record,) = read_capture([tmp_path / "full"])
+    body = json.loads(record["body"])
+    assert body["payment"] == {"method": "card", "card_number": "[redacted]", "CVV": "[redacted]"}
+    assert record["status"] == 200 and record["kiosk"] is False and record["idempotency_key"] == "k-1"
+
+    log = CaptureLog(tmp_path / "rotated", file_bytes=1, keep_files=2)
+    middleware = CaptureMiddleware(_echo, log)
+    for product_id in (6, 7, 8):
+        asyncio.run(_call(middleware, f"/api/v1/vending/products/{product_id}"))
+    log.close()
+
+    # One record per file, and only the newest two files are kept.
+    assert len(list((tmp_path / "rotated").glob("capture-*.ndjson.gz"))) == 2
+    records = read_capture([tmp_path / "rotated"])
+    assert [record["path"] for record in records] == ["/api/v1/vending/products/7", "/api/v1/vending/products/8"]
+
+
+def test_replay_reports_latency_and_divergence() -> None:
+    records = [
+        {"at": 100.0, "method": "GET", "path": "/api/v1/vending/products/1", "status": 200, "ms": 3.0},
+        {"at": 100.1, "method": "GET", "path": "/api/v1/vending/products/999", "status": 200, "ms": 4.0},
+        {
+            "at": 100.2,
+            "method": "POST",
+            "path": "/api/v1/vending/purchase",
+            "content_type": "application/json",
+            "body": '{"product_id":1}',
+            "kiosk": True,
+            "status": 200,
+            "ms": 9.0,
+        },
+        {"at": 100.3, "method": "POST", "path": "/api/v1/admin/firmware", "body": None, "status": 201, "ms": 1.0},
+    ]
+
+    report = asyncio.run(replay(records, _echo, speed=2.0))
+
+    assert report["requests"] == 3 and report["skipped"] == 1
+    assert report["routes"]["GET /api/v1/vending/products/{id}"]["count"] == 2
+    assert report["routes"]["GET /api/v1/vending/products/{id}"]["captured_ms"]["max"] == 4.0
+    assert report["diverged"] == 1
+    (divergence,) = report["divergences"]
+    assert divergence["request"] == "GET /api/v1/vending/products/999" and divergence["replayed"] == 404
+
+
+def test_redaction_does_not_trust_content_type() -> None:
+    secret = b'{"card_number":"4111","pin":"1234"}'
+    for content_type in (None, "text/plain", "application/json"):
+        assert json.loads(redact_body(secret, content_type)) == {"card_number": "[redacted]", "pin": "[redacted]"}
+    assert redact_body(b'{"pin":"1234"}\n{"pin":"5678"}', None) == '{"pin":"[redacted]"}\n{"pin":"[redacted]"}'
+    form = redact_body(b"pin=1234&slot=A1", "application/x-www-form-urlencoded")
+    assert form == "pin=%5Bredacted%5D&slot=A1"
+    for unparseable in (b'{"pin":"1234"', b"pin 1234", b'"1234"'):
+        assert redact_body(unparseable, None) == UNPARSED
+    assert redact_query(b"token=abc&days=7") == "token=%5Bredacted%5D&days=7"
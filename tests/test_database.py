@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from app import models  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import _migrate_money_columns, get_read_session, get_session, init_db  # noqa: E402
+
+read_scope = contextmanager(get_read_session)
+write_scope = contextmanager(get_session)
+
+RUNAWAY = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT count(*) FROM n"
+
+
+def test_read_sessions_are_query_only() -> None:
+    init_db()
+    with read_scope() as session:
+        with pytest.raises(OperationalError, match="readonly"):
+            session.execute(text("DELETE FROM telemetry"))
+
+
+def test_open_report_does_not_block_writes_and_keeps_its_snapshot() -> None:
+    init_db()
+    with read_scope() as report:
+        before = report.scalar(text("SELECT count(*) FROM telemetry"))
+        with write_scope() as session:
+            session.add(models.Telemetry(temperature_c=4.0, humidity=40.0))
+        assert report.scalar(text("SELECT count(*) FROM telemetry")) == before
+    with read_scope() as session:
+        assert session.scalar(text("SELECT count(*) FROM telemetry")) == before + 1
+
+
+def test_runaway_report_is_interrupted(monkeypatch: pytest.MonkeyPatch) -> None:
+    init_db()
+    monkeypatch.setattr(settings, "read_statement_timeout_seconds", 0.1)
+    with read_scope() as session:
+        with pytest.raises(OperationalError, match="interrupted"):
+            session.execute(text(RUNAWAY))
+        # The connection stays usable once the runaway statement is gone.
+        session.rollback()
+        assert session.scalar(text("SELECT 1")) == 1
+
+
+def test_decimal_money_columns_migrate_to_cents(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE products (id INTEGER PRIMARY KEY, name VARCHAR(120), price NUMERIC(10, 2))"))
+        conn.execute(text("CREATE TABLE sales (id INTEGER PRIMARY KEY, total_price NUMERIC(10, 2) NOT NULL)"))
+        conn.execute(text("INSERT INTO products VALUES (1, 'Gum', 1.15), (2, 'Tea', 0.1)"))
+        conn.execute(text("INSERT INTO sales VALUES (1, 3.45), (2, 0.3)"))
+    with engine.begin() as conn:
+        _migrate_money_columns(conn)
+        _migrate_money_columns(conn)  # a second start finds nothing to do
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT id, name, price_cents FROM products")).all() == [(1, "Gum", 115), (2, "Tea", 10)]
+        assert conn.execute(text("SELECT * FROM sales")).all() == [(1, 345), (2, 30)]
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from sqlalchemy import select  # noqa: E402
+
+from app import models  # noqa: E402
+from app.database import get_engine, init_db  # noqa: E402
+from app.main import create_app  # noqa: E402
+from app.services.door import DoorSensor, persist_door_events  # noqa: E402
+from app.services.hardware import MockHardware, SimulatedDoor  # noqa: E402
+
+T0 = datetime(2021, 9, 1, 7, 0)
+
+
+def test_bounces_are_ignored_and_short_openings_kept() -> None:
+    sensor = DoorSensor(debounce_ms=50)
+    door = SimulatedDoor(sensor)
+
+    door.open(T0, bounces=3)
+    assert sensor.state(now=T0 + timedelta(milliseconds=20))["is_open"] is False
+    # A flick shorter than the debounce window is contact noise, not an opening.
+    sensor.edge(False, T0 + timedelta(milliseconds=30))
+    sensor.settle(T0 + timedelta(seconds=1))
+    assert sensor.state(now=T0 + timedelta(seconds=1))["events"] == []
+
+    # A two-second opening between telemetry captures is still recorded, with its edge times.
+    door.pulse(2, at=T0 + timedelta(seconds=5), bounces=2)
+    changes = sensor.drain(now=T0 + timedelta(seconds=8))
+    assert [(change.is_open, change.at) for change in changes] == [
+        (True, T0 + timedelta(seconds=5, milliseconds=4)),
+        (False, T0 + timedelta(seconds=7, milliseconds=4)),
+    ]
+    assert sensor.drain() == []
+
+
+def test_door_changes_are_persisted_in_one_batch() -> None:
+    init_db()
+    hardware = MockHardware()
+    start = datetime(2021, 9, 2, 7, 0)
+    for minute in range(3):
+        hardware.simulated_door.pulse(1.5, at=start + timedelta(minutes=minute), bounces=1)
+    assert hardware.door.is_open is False
+
+    assert persist_door_events(hardware.door) == 6
+    assert persist_door_events(hardware.door) == 0
+    table = models.DoorEvent.__table__
+    with get_engine().connect() as conn:
+        stored = conn.execute(select(table.c.is_open).where(table.c.created_at >= start).order_by(table.c.id)).all()
+    assert [row.is_open for row in stored] == [True, False] * 3
+
+
+def test_door_endpoint_reports_state() -> None:
+    with TestClient(create_app()) as client:
+        body = client.get("/api/v1/admin/door").json()
+    assert set(body) == {"is_open", "since", "events"}
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from app import models  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.services import fleet as fleet_module  # noqa: E402
+from app.services.fleet import FleetAnalytics  # noqa: E402
+
+
+def _sell(path: Path, product_id: int, count: int) -> None:
+    sale = {"product_id": product_id, "quantity": 1, "total_cents": 150, "payment_method": "card"}
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(insert(models.Sale.__table__), [{**sale, "created_at": datetime.utcnow()}] * count)
+    engine.dispose()
+
+
+def _machine(path: Path, sales: dict[str, int]) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for index, name in enumerate(sales, start=1):
+            product = {"id": index, "name": name, "slot_code": f"A{index}", "price_cents": 150, "quantity": 10}
+            conn.execute(insert(models.Product.__table__), product)
+    engine.dispose()
+    for index, count in enumerate(sales.values(), start=1):
+        if count:
+            _sell(path, index, count)
+
+
+def test_fleet_merges_partials_and_caches_by_mtime(tmp_path: Path, monkeypatch) -> None:
+    # Cola tops neither machine on its own but leads the fleet.
+    _machine(tmp_path / "pi-01.db", {"Water": 5, "Cola": 4, "Chips": 0})
+    _machine(tmp_path / "pi-02.db", {"Chips": 5, "Cola": 4})
+    (tmp_path / "pi-03.db").write_bytes(b"not a database")
+    calls = []
+    original = fleet_module.file_partial
+    monkeypatch.setattr(fleet_module, "file_partial", lambda *args: calls.append(args) or original(*args))
+
+    fleet = FleetAnalytics(tmp_path, workers=2)
+    try:
+        summary = fleet.sales_summary(days=7, top=1)
+        assert summary["total_sales"] == 18 and summary["total_revenue"] == Decimal("27")
+        assert summary["top_products"] == [{"name": "Cola", "sales": 8}]
+        assert summary["machines"] == 2 and [failure["machine"] for failure in summary["failed"]] == ["pi-03"]
+
+        turnover = {item["name"]: item for item in fleet.inventory_turnover(days=7)["products"]}
+        assert turnover["Chips"]["machines"] == 2 and turnover["Chips"]["quantity_on_hand"] == 20
+        assert turnover["Cola"]["sold_last_period"] == 8
+
+        calls.clear()
+        fleet.sales_summary(days=7)
+        assert [Path(call[0]).name for call in calls] == ["pi-03.db"]  # only the failed file is retried
+
+        calls.clear()
+        _sell(tmp_path / "pi-01.db", 2, 1)
+        assert fleet.sales_summary(days=7)["total_sales"] == 19
+        assert sorted(Path(call[0]).name for call in calls) == ["pi-01.db", "pi-03.db"]
+    finally:
+        fleet.close()
+
+
+def test_fleet_cache_is_bounded_and_forgets_removed_files(tmp_path: Path) -> None:
+    for name in ("pi-01", "pi-02", "pi-03"):
+        _machine(tmp_path / f"{name}.db", {"Cola": 1})
+
+    fleet = FleetAnalytics(tmp_path, workers=1, cache_entries=4)
+    try:
+        fleet.sales_summary(days=7)
+        fleet.inventory_turnover(days=7)
+        assert len(fleet._cache) == 4
+        assert list(fleet._cache)[-1] == ("pi-03", "turnover", 7)
+
+        (tmp_path / "pi-03.db").unlink()
+        assert fleet.sales_summary(days=7)["total_sales"] == 2
+        assert {machine for machine, _, _ in fleet._cache} == {"pi-01", "pi-02"}
+    finally:
+        fleet.close()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.forecasting import DepletionForecaster
+
+NOW = datetime(2024, 5, 15, 13, 20)
+
+
+def _history(seed: int = 7) -> list[tuple[int, int, datetime]]:
+    rng = random.Random(seed)
+    events = []
+    for _ in range(600):
+        at = NOW - timedelta(minutes=rng.randrange(0, 4 * 7 * 24 * 60))
+        events.append((rng.choice([1, 2, 3]), rng.randint(1, 3), at))
+    return sorted(events, key=lambda event: event[2])
+
+
+def test_rebuild_matches_incremental_updates() -> None:
+    events = _history()
+    incremental = DepletionForecaster(alpha=0.3, history_weeks=12)
+    for product_id, units, at in events:
+        incremental.observe(product_id, units, at)
+
+    rebuilt = DepletionForecaster(alpha=0.3, history_weeks=12)
+    rebuilt.rebuild(*zip(*events), now=NOW)
+
+    for product_id in (1, 2, 3):
+        assert rebuilt.rates(product_id, NOW) == pytest.approx(incremental.rates(product_id, NOW))
+        assert rebuilt.hours_until_stockout(product_id, 10, NOW) == pytest.approx(
+            incremental.hours_until_stockout(product_id, 10, NOW)
+        )
+
+
+def test_restock_plan_orders_by_predicted_stockout() -> None:
+    forecaster = DepletionForecaster(alpha=0.5)
+    events = [(1, 2, NOW - timedelta(weeks=w, hours=h)) for w in range(4) for h in range(168)]
+    events += [(2, 1, NOW - timedelta(weeks=w, hours=h)) for w in range(4) for h in range(0, 168, 12)]
+    for product_id, units, at in sorted(events, key=lambda event: event[2]):
+        forecaster.observe(product_id, units, at)
+
+    plan = forecaster.restock_plan(
+        [(1, "Cola", "A1", 40), (2, "Chips", "A2", 8), (3, "Gum", "A3", 5)], now=NOW, horizon_hours=168
+    )
+    assert [item["slot_code"] for item in plan] == ["A1", "A2", "A3"]
+    assert plan[0]["hours_until_stockout"] < plan[1]["hours_until_stockout"]
+    assert plan[2]["predicted_stockout_at"] is None
+
+
+def test_rebuild_keeps_sales_observed_while_it_runs() -> None:
+    history = _history()
+    # Sales committed after the history was read at NOW.
+    late = [
+        (product_id, units, NOW + timedelta(minutes=5 * i))
+        for i, (product_id, units, _) in enumerate(history[:20])
+    ]
+    events = history + late
+    incremental = DepletionForecaster(alpha=0.3, history_weeks=12)
+    for product_id, units, at in events:
+        incremental.observe(product_id, units, at)
+
+    rebuilt = DepletionForecaster(alpha=0.3, history_weeks=12)
+    rebuilt.begin_rebuild()
+    # History rows have ids 0..599; the rebuild must replay only the later ones.
+    for offset, (product_id, units, at) in enumerate(late):
+        rebuilt.observe(product_id, units, at, event_id=len(history) + offset)
+    rebuilt.observe(*history[-1], event_id=len(history) - 1)  # already in the history
+    rebuilt.rebuild(*zip(*history), now=NOW, last_event_id=len(history) - 1)
+
+    for product_id in (1, 2, 3):
+        later = NOW + timedelta(hours=3)
+        assert rebuilt.rates(product_id, later) == pytest.approx(incremental.rates(product_id, later))
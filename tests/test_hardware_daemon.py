@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from app.services.hardware import DispenseOutcomeUnknown, HardwareError, MockHardware
+from app.services.hardware_daemon import HardwareClient, HardwareDaemon
+
+
+@pytest.fixture()
+def daemon(tmp_path: Path):
+    hardware = MockHardware()
+    hardware.dispense_delay = 0.05
+    daemon = HardwareDaemon(hardware, str(tmp_path / "hw.sock"))
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    yield daemon
+    daemon.shutdown()
+    thread.join(timeout=5)
+
+
+def test_client_proxies_commands_and_errors(daemon: HardwareDaemon) -> None:
+    client = HardwareClient(daemon.path)
+    assert client.ping()["backend"] == "MockHardware"
+    assert 3.5 <= client.read_temperature() <= 6.5
+    client.set_door_lock(False)
+    assert daemon.hardware.door_locked is False
+
+    daemon.hardware.simulated_door.open(bounces=1)
+    time.sleep(0.06)
+    assert client.is_door_open() is True
+    assert client.door.state()["events"][0]["is_open"] is True
+
+    with pytest.raises(HardwareError, match="Quantity must be positive"):
+        client.dispense("A1", 0)
+    for malformed in (b'{"command": "ping"}\n', b"[]\n", b"42\n"):
+        conn, reader = client._connection()
+        conn.sendall(malformed)
+        assert reader.readline().startswith(b'[false,"Malformed request')
+    assert client.ping()["commands"] >= 4
+
+
+def test_dispenses_from_many_workers_run_one_at_a_time(daemon: HardwareDaemon) -> None:
+    client = HardwareClient(daemon.path)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda slot: client.dispense(slot, 1), ["A1", "A2", "B1", "B2"]))
+    assert time.perf_counter() - started >= 4 * daemon.hardware.dispense_delay
+
+
+def test_dispense_waits_past_the_call_timeout_and_a_lost_reply_is_unknown(daemon: HardwareDaemon) -> None:
+    daemon.hardware.dispense_delay = 0.3
+    client = HardwareClient(daemon.path, timeout=0.1)
+    client.dispense("A1", 1)  # queued or slow dispenses get their own timeout
+
+    impatient = HardwareClient(daemon.path, timeout=0.1, dispense_timeout=0.1)
+    with pytest.raises(DispenseOutcomeUnknown):
+        impatient.dispense("A1", 1)
+    time.sleep(0.3)
+    assert daemon.health()["commands"] == 2  # the daemon dispensed it all the same
+
+
+def test_client_reconnects_after_daemon_restart(tmp_path: Path) -> None:
+    path = str(tmp_path / "restart.sock")
+    client = HardwareClient(path, timeout=2)
+    with pytest.raises(HardwareError, match="unavailable"):
+        client.ping()
+    for _ in range(2):
+        daemon = HardwareDaemon(MockHardware(), path)
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+        assert client.ping()["commands"] == 0
+        daemon.shutdown()
+        thread.join(timeout=5)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime
+
+import httpx
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from app.database import init_db  # noqa: E402
+from app.idempotency import ResponseCache, StoredResponse, request_fingerprint  # noqa: E402
+from app.main import create_app  # noqa: E402
+
+
+def _purchase(product_id: int) -> dict:
+    return {"product_id": product_id, "quantity": 1, "payment_method": "card", "amount_paid": "2.00"}
+
+
+def test_retried_purchase_is_replayed_not_repeated() -> None:
+    with TestClient(create_app()) as client:
+        product = client.post(
+            "/api/v1/admin/products", json={"name": "Retry Soda", "slot_code": "I1", "price": "1.25", "quantity": 5}
+        ).json()
+        headers = {"Idempotency-Key": str(uuid.uuid4())}
+
+        first = client.post("/api/v1/vending/purchase", json=_purchase(product["id"]), headers=headers)
+        retry = client.post("/api/v1/vending/purchase", json=_purchase(product["id"]), headers=headers)
+        assert first.status_code == retry.status_code == 201
+        assert retry.json() == first.json()
+        assert retry.headers["idempotent-replayed"] == "true"
+        assert "idempotent-replayed" not in first.headers
+
+        reused = client.post(
+            "/api/v1/vending/purchase", json={**_purchase(product["id"]), "quantity": 2}, headers=headers
+        )
+        assert reused.status_code == 422
+        other_query = client.post("/api/v1/vending/purchase?repair=true", json=_purchase(product["id"]), headers=headers)
+        assert other_query.status_code == 422
+        stock = {item["id"]: item["quantity"] for item in client.get("/api/v1/admin/products").json()}
+        assert stock[product["id"]] == 4
+
+
+def test_concurrent_duplicates_wait_for_the_first() -> None:
+    init_db()
+    app = create_app()
+
+    async def scenario() -> tuple[list[httpx.Response], dict]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            product = (
+                await client.post(
+                    "/api/v1/admin/products",
+                    json={"name": "Race Chips", "slot_code": "I2", "price": "1.00", "quantity": 3},
+                )
+            ).json()
+            headers = {"Idempotency-Key": str(uuid.uuid4())}
+            purchase = _purchase(product["id"])
+            responses = await asyncio.gather(
+                *(client.post("/api/v1/vending/purchase", json=purchase, headers=headers) for _ in range(3))
+            )
+            listed = (await client.get("/api/v1/admin/products")).json()
+            return responses, next(item for item in listed if item["id"] == product["id"])
+
+    responses, product = asyncio.run(scenario())
+    assert {response.json()["id"] for response in responses} == {responses[0].json()["id"]}
+    assert sum(response.headers.get("idempotent-replayed") == "true" for response in responses) == 2
+    assert product["quantity"] == 2
+
+
+def test_stored_responses_outlive_the_lru() -> None:
+    init_db()
+    key = str(uuid.uuid4())
+    stored = StoredResponse("abc", 201, "application/json", b'{"id": 1}', datetime.utcnow())
+    ResponseCache(size=1).put(key, stored)
+    assert ResponseCache(size=1).get(key) == stored
+    assert ResponseCache(ttl_hours=0).get(key) is None
+
+
+def test_duplicate_waits_for_a_claim_held_by_another_worker() -> None:
+    init_db()
+    app = create_app()
+    key = str(uuid.uuid4())
+
+    async def scenario() -> tuple[httpx.Response, bool]:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            product = (
+                await client.post(
+                    "/api/v1/admin/products",
+                    json={"name": "Worker Gum", "slot_code": "I3", "price": "1.00", "quantity": 3},
+                )
+            ).json()
+            body = json.dumps(_purchase(product["id"])).encode()
+            # Another worker claims the key and is still dispensing.
+            other = ResponseCache()
+            fingerprint = request_fingerprint({"method": "POST", "path": "/api/v1/vending/purchase"}, body)
+            assert other.claim(key, fingerprint)
+            retry = asyncio.create_task(
+                client.post(
+                    "/api/v1/vending/purchase",
+                    content=body,
+                    headers={"Idempotency-Key": key, "content-type": "application/json"},
+                )
+            )
+            await asyncio.sleep(0.3)
+            waited = not retry.done()
+            other.put(key, StoredResponse(fingerprint, 201, "application/json", b'{"id": -1}', datetime.utcnow()))
+            return await retry, waited
+
+    response, waited = asyncio.run(scenario())
+    assert waited
+    assert response.status_code == 201 and response.json() == {"id": -1}
+    assert response.headers["idempotent-replayed"] == "true"
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import statistics
+from datetime import datetime, timedelta
+
+from app.services.monitoring import RunningStats, TelemetryMonitor
+
+START = datetime(2024, 5, 15, 12, 0)
+
+
+def _feed(monitor: TelemetryMonitor, temperatures: list[float], door: bool = False, start: int = 0) -> None:
+    for offset, temperature in enumerate(temperatures, start=start):
+        monitor.observe(temperature, 40.0, door, START + timedelta(seconds=10 * offset))
+
+
+def test_running_stats_match_batch_statistics() -> None:
+    values = [4.1, 5.3, 3.9, 6.2, 5.0, 4.4]
+    stats = RunningStats()
+    for value in values:
+        stats.update(value)
+    assert abs(stats.mean - statistics.mean(values)) < 1e-12
+    assert abs(stats.std - statistics.stdev(values)) < 1e-12
+
+
+def test_temperature_alert_is_debounced_with_hysteresis() -> None:
+    monitor = TelemetryMonitor(temperature_high_c=8.0, hysteresis_c=0.5, debounce_samples=3, warmup_samples=1000)
+    _feed(monitor, [5.0, 9.0, 9.0, 5.0, 9.0, 9.0])
+    assert monitor.state()["active"] == []
+
+    _feed(monitor, [9.5], start=6)
+    active = monitor.state()["active"]
+    assert [alert["kind"] for alert in active] == ["temperature_high"]
+
+    _feed(monitor, [10.5, 7.8], start=7)
+    assert monitor.state()["active"][0]["peak_value"] == 10.5
+
+    _feed(monitor, [7.4], start=9)
+    state = monitor.state()
+    assert state["active"] == []
+    assert state["recent"][0]["cleared_at"] == START + timedelta(seconds=90)
+    # Samples 1-2 and 4-7 were above the limit for the following 10 s interval each.
+    assert state["stats"]["seconds_above_threshold"] == 60.0
+
+
+def test_door_left_open_raises_alert() -> None:
+    monitor = TelemetryMonitor(door_open_alert_seconds=60, warmup_samples=1000)
+    _feed(monitor, [5.0] * 6, door=True)
+    assert monitor.state()["active"] == []
+    _feed(monitor, [5.0], door=True, start=6)
+    state = monitor.state(now=START + timedelta(seconds=60))
+    assert [alert["kind"] for alert in state["active"]] == ["door_open"]
+    assert state["stats"]["door_open_seconds"] == 60.0
+
+    _feed(monitor, [5.0], door=False, start=7)
+    state = monitor.state()
+    assert state["active"] == []
+    assert state["stats"]["door_openings"] == 1
+    assert state["stats"]["door_open_total_seconds"] == 70.0
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+
+from sqlalchemy import update
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from app import models  # noqa: E402
+from app.database import get_engine, get_session, init_db  # noqa: E402
+from app.schemas import InventoryAdjustment, ProductCreate  # noqa: E402
+from app.services.inventory import InventoryService  # noqa: E402
+from app.services.reconciliation import reconcile  # noqa: E402
+
+session_scope = contextmanager(get_session)
+
+
+def _drift(report: dict, product_id: int) -> list[dict]:
+    return [item for item in report["discrepancies"] if item["product_id"] == product_id]
+
+
+def test_reconcile_checks_only_new_events_and_repairs_drift() -> None:
+    init_db()
+    with session_scope() as session:
+        product = InventoryService(session).create_product(
+            ProductCreate(name="Audit Water", slot_code="K4", price="0.90", quantity=8)
+        )
+        product_id = product.id
+    reconcile()
+
+    with session_scope() as session:
+        adjustment = InventoryAdjustment(product_id=product_id, change=-2, reason="spoiled")
+        InventoryService(session).adjust_inventory(adjustment)
+    with get_engine().begin() as conn:
+        # A counter update that bypasses the event log.
+        conn.execute(update(models.Product).where(models.Product.id == product_id).values(quantity=5))
+
+    report = reconcile()
+    assert report["events_checked"] == 1
+    assert _drift(report, product_id) == [
+        {"product_id": product_id, "slot_code": "K4", "expected_quantity": 6, "actual_quantity": 5, "difference": -1}
+    ]
+    # Unrepaired drift keeps being reported.
+    assert _drift(reconcile(), product_id)[0]["difference"] == -1
+
+    assert reconcile(repair=True)["repaired"] is True
+    report = reconcile()
+    assert _drift(report, product_id) == []
+    assert report["events_checked"] == 1  # just the correction event
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from sqlalchemy import select  # noqa: E402
+
+from app import models  # noqa: E402
+from app.database import get_session, init_db  # noqa: E402
+from app.services import retention  # noqa: E402
+from app.services.analytics import AnalyticsService, _merge_archived_summary  # noqa: E402
+from app.services.retention import ArchiveStore, export_rows, run_retention  # noqa: E402
+from app.store import VendingMachine  # noqa: E402
+
+session_scope = contextmanager(get_session)
+
+
+@pytest.fixture()
+def archive(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> ArchiveStore:
+    archive = ArchiveStore(tmp_path / "archive")
+    monkeypatch.setattr(retention, "_archive", archive)
+    return archive
+
+
+def _seed_old_sales(now: datetime) -> tuple[int, list[int]]:
+    with session_scope() as session:
+        product = models.Product(name="Archived Cola", slot_code="R9", price_cents=150, quantity=10)
+        session.add(product)
+        session.flush()
+        sales = [
+            models.Sale(
+                product_id=product.id,
+                quantity=quantity,
+                total_cents=150 * quantity,
+                payment_method="card",
+                created_at=now - timedelta(days=380 + quantity),
+            )
+            for quantity in (1, 2, 3)
+        ]
+        session.add(models.Sale(product_id=product.id, quantity=1, total_cents=150, payment_method="card"))
+        session.add_all(sales)
+        session.flush()
+        return product.id, [sale.id for sale in sales]
+
+
+def test_retention_moves_rows_without_changing_answers(archive: ArchiveStore) -> None:
+    init_db()
+    now = datetime.utcnow()
+    product_id, old_ids = _seed_old_sales(now)
+    machine = VendingMachine()
+    machine.load()
+    with session_scope() as session:
+        service = AnalyticsService(session)
+        summary_before = service.sales_summary(days=395)
+        turnover_before = service.inventory_turnover(days=395)["products"]
+    store_before = machine.sales_summary(days=395)
+
+    moved = run_retention(now=now, retention_days=365, archive=archive)
+
+    assert moved["sales"] >= len(old_ids)
+    assert archive.archived_before is not None
+    with session_scope() as session:
+        assert session.scalars(select(models.Sale.id).where(models.Sale.id.in_(old_ids))).all() == []
+        service = AnalyticsService(session)
+        assert service.sales_summary(days=395) == summary_before
+        assert service.inventory_turnover(days=395)["products"] == turnover_before
+        # A window entirely after the horizon never touches the archive.
+        assert service.sales_summary(days=30)["total_sales"] >= 1
+
+    machine = VendingMachine()
+    machine.load()
+    assert machine.sales_summary(days=395) == store_before
+
+    exported = [row for row in export_rows("sales", start=now - timedelta(days=400)) if row["product_id"] == product_id]
+    assert [row["id"] for row in exported][:3] == sorted(old_ids, reverse=True)
+    assert len(exported) == 4
+
+
+def test_archived_summary_adds_up_live_products_sharing_a_name() -> None:
+    live = {
+        "total_sales": 5,
+        "total_revenue": Decimal("5.00"),
+        "top_products": [{"name": "Cola", "sales": 3}, {"name": "Chips", "sales": 4}, {"name": "Cola", "sales": 2}],
+    }
+    archived = {"sales": 1, "revenue_cents": 100, "products": {"A1": {"name": "Chips", "sales": 1, "units": 1}}}
+    merged = _merge_archived_summary(live, archived)
+    assert merged["top_products"][:2] == [{"name": "Cola", "sales": 5}, {"name": "Chips", "sales": 5}]
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import os
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from app.main import create_app  # noqa: E402
+from app.services.sales_columns import SalesColumns  # noqa: E402
+
+START = datetime(2031, 7, 1)
+
+
+def test_query_matches_a_plain_group_by() -> None:
+    rng = random.Random(7)
+    columns = SalesColumns(capacity=4)
+    sales = []
+    for sale_id in range(1, 2_001):
+        sale = (
+            sale_id,
+            START + timedelta(minutes=rng.randrange(60 * 24 * 14)),
+            rng.choice((3, 5, 8)),
+            rng.randint(1, 3),
+            rng.choice((125, 250)),
+            rng.choice(("card", "cash", "mobile")),
+            "failed" if rng.random() < 0.1 else "success",
+        )
+        sales.append(sale)
+        columns.append(*sale)
+
+    start, end = START + timedelta(days=2), START + timedelta(days=9)
+    expected: dict = defaultdict(lambda: {"sales": 0, "units": 0, "revenue_cents": 0, "failed": 0})
+    for _, at, product_id, quantity, cents, method, status in sales:
+        if not start <= at < end or method == "mobile":
+            continue
+        group = expected[(at.weekday(), product_id)]
+        if status == "success":
+            group["sales"] += 1
+            group["units"] += quantity
+            group["revenue_cents"] += cents
+        else:
+            group["failed"] += 1
+
+    rows = columns.query(
+        start,
+        end,
+        payment_methods=["card", "cash"],
+        group_by=["weekday", "product_id"],
+        metrics=["sales", "units", "revenue_cents", "failed"],
+    )
+    assert {(row.pop("weekday"), row.pop("product_id")): row for row in rows} == expected
+    assert [row["weekday"] for row in columns.query(group_by=["weekday"])] == list(range(7))
+
+
+def test_sales_query_endpoint_sees_new_vends() -> None:
+    with TestClient(create_app()) as client:
+        product = client.post(
+            "/api/v1/admin/products", json={"name": "Slice Tea", "slot_code": "Q7", "price": "1.50", "quantity": 5}
+        ).json()
+        for paid in ("2.00", "2.00", "1.00"):
+            client.post(
+                "/api/v1/vending/purchase",
+                json={"product_id": product["id"], "quantity": 1, "payment_method": "cash", "amount_paid": paid},
+            )
+        response = client.get(
+            "/api/v1/analytics/sales/query",
+            params={"product_id": product["id"], "group_by": "status", "metric": ["sales", "failed"]},
+        )
+        assert response.status_code == 200
+        assert sorted(response.json()["rows"], key=lambda row: row["status"]) == [
+            {"status": "failed", "sales": 0, "failed": 1},
+            {"status": "success", "sales": 2, "failed": 0},
+        ]
+        assert client.get("/api/v1/analytics/sales/query", params={"group_by": "slot"}).status_code == 422
+
+
+def test_only_committed_sales_reach_columns_and_forecasts(monkeypatch) -> None:
+    from app import models
+    from app.database import SessionLocal, init_db
+    from app.schemas import SaleBase
+    from app.services.forecasting import get_forecaster
+    from app.services.hardware import MockHardware
+    from app.services.sales_columns import get_sales_columns
+    from app.services.vending import VendingService
+
+    monkeypatch.setattr(MockHardware, "dispense_delay", 0)
+    init_db()
+    with SessionLocal() as session:
+        product = models.Product(name="Rollback Bar", slot_code="V5", price_cents=100, quantity=5)
+        session.add(product)
+        session.commit()
+        purchase = SaleBase(product_id=product.id, quantity=1, payment_method="card", amount_paid="1.00")
+        columns = get_sales_columns()
+        before = len(columns)
+
+        VendingService(session).vend(purchase)
+        session.rollback()
+        assert len(columns) == before
+        later = datetime.utcnow() + timedelta(hours=1)
+        assert sum(get_forecaster().rates(product.id, now=later)) == 0
+
+        VendingService(session).vend(purchase)
+        session.commit()
+        assert len(columns) == before + 1
+        assert sum(get_forecaster().rates(product.id, now=later)) > 0
+
+
+def test_two_sessions_cannot_both_sell_the_last_item(monkeypatch) -> None:
+    import pytest
+
+    from app import models
+    from app.database import SessionLocal, init_db
+    from app.schemas import SaleBase
+    from app.services.hardware import DispenseOutcomeUnknown, HardwareError, MockHardware
+    from app.services.vending import VendingError, VendingService
+
+    monkeypatch.setattr(MockHardware, "dispense_delay", 0)
+    init_db()
+    with SessionLocal() as first, SessionLocal() as second:
+        product = models.Product(name="Last Bar", slot_code="W6", price_cents=100, quantity=2)
+        first.add(product)
+        first.commit()
+        purchase = SaleBase(product_id=product.id, quantity=1, payment_method="card", amount_paid="1.00")
+
+        def jammed(self, slot_code: str, quantity: int) -> None:
+            raise HardwareError("Motor jammed")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(MockHardware, "dispense", jammed)
+            assert VendingService(first).vend(purchase).status == models.SaleStatusEnum.FAILED
+        first.commit()
+        assert first.get(models.Product, product.id).quantity == 2  # a failed dispense gives the stock back
+
+        def lost(self, slot_code: str, quantity: int) -> None:
+            raise DispenseOutcomeUnknown("No reply from hardware daemon")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(MockHardware, "dispense", lost)
+            assert VendingService(first).vend(purchase).status == models.SaleStatusEnum.PENDING
+        first.commit()
+        assert first.get(models.Product, product.id).quantity == 1  # it may have dropped, so it stays reserved
+
+        # Both sessions loaded the product while one item was left.
+        first.get(models.Product, product.id)
+        VendingService(second).vend(purchase)
+        second.commit()
+        with pytest.raises(VendingError, match="Insufficient stock"):
+            VendingService(first).vend(purchase)
+        first.rollback()
+        assert second.get(models.Product, product.id).quantity == 0
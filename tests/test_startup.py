@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Generous default for CI machines; tighten on the Pi via the environment.
+COLD_START_BUDGET_SECONDS = float(os.environ.get("PIVEND_COLD_START_BUDGET", "5.0"))
+
+
+def _run(code: str, cwd: Path) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(ROOT)
+    env["PIVEND_DATABASE_URL"] = f"sqlite:///{cwd / 'data' / 'vending.db'}"
+    return subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+
+
+def test_import_defers_engine_and_hardware(tmp_path: Path) -> None:
+    result = _run(
+        "import sys\n"
+        "import app.main\n"
+        "from app import database\n"
+        "from app.services import hardware\n"
+        "assert database._engine is None\n"
+        "assert hardware._hardware_instance is None\n"
+        "assert 'aiosqlite' not in sys.modules\n",
+        tmp_path,
+    )
+    assert result.returncode == 0, result.stderr
+    assert not (tmp_path / "data").exists()
+
+
+def test_cold_start_to_first_200_within_budget(tmp_path: Path) -> None:
+    started = time.perf_counter()
+    result = _run(
+        "from fastapi.testclient import TestClient\n"
+        "from app.main import app\n"
+        "with TestClient(app) as client:\n"
+        "    assert client.get('/').status_code == 200\n",
+        tmp_path,
+    )
+    elapsed = time.perf_counter() - started
+    assert result.returncode == 0, result.stderr
+    assert elapsed < COLD_START_BUDGET_SECONDS, f"cold start took {elapsed:.2f}s"
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import gzip
+import os
+
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from app.main import create_app  # noqa: E402
+from app.static_assets import ASSET_CACHE_CONTROL, build  # noqa: E402
+
+
+def test_kiosk_ui_is_fingerprinted_compressed_and_revalidated() -> None:
+    bundle = build()
+    script = bundle.renamed["app.js"]
+    client = TestClient(create_app())
+
+    index = client.get("/ui/", headers={"Accept-Encoding": "gzip"})
+    assert index.status_code == 200
+    assert index.headers["cache-control"] == "no-cache"
+    assert f'src="/ui/assets/{script}"' in index.text
+    again = client.get("/ui/", headers={"If-None-Match": index.headers["etag"]})
+    assert again.status_code == 304 and again.content == b""
+
+    url = f"/ui/assets/{script}"
+    raw = client.get(url, headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in raw.headers
+    compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["cache-control"] == ASSET_CACHE_CONTROL
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert compressed.content == raw.content
+    assert gzip.decompress(bundle.assets[script].bodies["gzip"]) == raw.content
+
+    cached = client.get(url, headers={"If-None-Match": f'W/{raw.headers["etag"]}'})
+    assert cached.status_code == 304
+    assert client.get("/ui/assets/app.0000000000.js").status_code == 404
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import os
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from app import database  # noqa: E402
+from app import store as store_module  # noqa: E402
+from app.database import init_db  # noqa: E402
+from app.services.hardware import HardwareError, MockHardware  # noqa: E402
+from app.money import ensure_cents  # noqa: E402
+from app.store import VendingMachine, ensure_decimal  # noqa: E402
+
+
+class JammedHardware(MockHardware):
+    def dispense(self, slot_code: str, quantity: int) -> None:
+        raise HardwareError("Motor jammed")
+
+
+@pytest.fixture()
+def machine(tmp_path, monkeypatch: pytest.MonkeyPatch) -> VendingMachine:
+    # A database of its own, so the hardcoded slots are free however often the file runs.
+    engine = create_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    monkeypatch.setattr(database, "get_engine", lambda: engine)
+    init_db()
+    machine = VendingMachine()
+    machine.load()
+    yield machine
+    engine.dispose()
+
+
+def test_fractions_of_a_cent_are_rejected() -> None:
+    assert ensure_cents("1.50") == 150 and ensure_cents("1.500") == 150
+    with pytest.raises(ValueError, match="price must have at most 2 decimal places"):
+        VendingMachine._validate_price("0.004")
+
+
+def test_ensure_decimal() -> None:
+    assert ensure_decimal("2.50") == Decimal("2.50")
+    assert ensure_decimal(2.5) == Decimal("2.5")
+    with pytest.raises(ValueError):
+        ensure_decimal("abc")
+    with pytest.raises(ValueError):
+        ensure_decimal(True)
+
+
+def test_vend_failures_keep_stock(machine: VendingMachine, monkeypatch: pytest.MonkeyPatch) -> None:
+    product = machine.create_product({"name": "Gum", "slot_code": "d4", "price": "0.75", "quantity": 1})
+    assert product["slot_code"] == "D4"
+    with pytest.raises(ValueError, match="Insufficient stock"):
+        machine.vend({"product_id": product["id"], "quantity": 2, "payment_method": "cash", "amount_paid": "5"})
+
+    with pytest.raises(ValueError, match="2 decimal places"):
+        machine.vend({"product_id": product["id"], "quantity": 1, "payment_method": "cash", "amount_paid": "0.751"})
+    underpaid = machine.vend({"product_id": product["id"], "quantity": 1, "payment_method": "cash", "amount_paid": "0.5"})
+    assert underpaid["status"] == "failed"
+
+    monkeypatch.setattr(store_module, "get_hardware", lambda: JammedHardware())
+    jammed = machine.vend({"product_id": product["id"], "quantity": 1, "payment_method": "cash", "amount_paid": "1"})
+    assert jammed["status"] == "failed"
+    assert machine.get_product(product["id"])["quantity"] == 1
+
+
+def test_checkpoint_round_trip(machine: VendingMachine) -> None:
+    product = machine.create_product({"name": "Chips", "slot_code": "C3", "price": "1.10", "quantity": 5})
+    sale = machine.vend({"product_id": product["id"], "quantity": 2, "payment_method": "card", "amount_paid": "5"})
+    assert sale["total_price"] == "2.20"
+    machine.capture_telemetry()
+    machine.set_door_lock(False)
+
+    assert machine.checkpoint() > 0
+    assert machine.checkpoint() == 0
+
+    restored = VendingMachine()
+    restored.load()
+    assert restored.get_by_slot("C3")["quantity"] == 3
+    assert restored.recent_sales(limit=1)[0]["id"] == sale["id"]
+    assert restored.get_device_state()["door_locked"] is False
+    assert restored.sales_summary() == machine.sales_summary()
+    assert restored.latest_telemetry(limit=1) == machine.latest_telemetry(limit=1)
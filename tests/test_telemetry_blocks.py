@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select, text
+
+from app import models
+from app.services import telemetry_blocks
+from app.services.telemetry_blocks import TelemetryBlocks
+
+START = datetime(2032, 5, 1, 8, 0)
+
+
+def _rows(count: int, step: timedelta, offset: timedelta = timedelta(0)) -> list[dict]:
+    return [
+        {
+            "temperature_c": 4.0 + index % 7 * 0.125,
+            "humidity": 41.5,
+            "door_open": index % 9 == 0,
+            "created_at": START + offset + step * index,
+        }
+        for index in range(count)
+    ]
+
+
+@pytest.fixture()
+def conn():
+    engine = create_engine("sqlite://")
+    models.TelemetryBlock.__table__.create(engine)
+    with engine.begin() as conn:
+        yield conn
+
+
+def test_blocks_round_trip_and_dedupe(conn) -> None:
+    blocks = TelemetryBlocks(conn)
+    # 90 minutes at 30 s: a full regular hour plus half of the next one.
+    assert blocks.append(_rows(180, timedelta(seconds=30))) == 180
+    stored = conn.execute(select(models.TelemetryBlock.__table__).order_by("start")).all()
+    assert [block.count for block in stored] == [120, 60]
+    assert stored[0].interval_ms == 30_000 and stored[0].offsets is None
+
+    # Overlapping, irregular upload: only the new timestamps land, out of order is fine.
+    late = _rows(3, timedelta(seconds=7), offset=timedelta(minutes=89, seconds=59))
+    assert blocks.append(late + _rows(5, timedelta(seconds=30))) == 3
+    merged = conn.execute(select(models.TelemetryBlock.__table__).order_by("start")).all()[1]
+    assert merged.count == 63 and merged.interval_ms is None
+
+    rows = blocks.rows()
+    assert [row["created_at"] for row in rows] == sorted(row["created_at"] for row in rows)
+    assert rows[:180:60] == [
+        {**row, "id": telemetry_blocks.sample_id(row["created_at"])} for row in _rows(180, timedelta(seconds=30))[::60]
+    ]
+    assert blocks.latest(2) == rows[-2:]
+    window = blocks.rows(START + timedelta(minutes=59), START + timedelta(minutes=60))
+    assert [row["created_at"].minute for row in window] == [59, 59, 0]
+
+
+def test_block_payload_size(conn) -> None:
+    TelemetryBlocks(conn).append(_rows(360, timedelta(seconds=10)))
+    size = conn.scalar(
+        select(
+            func.length(models.TelemetryBlock.temperature)
+            + func.length(models.TelemetryBlock.humidity)
+            + func.length(models.TelemetryBlock.door_open)
+        )
+    )
+    # float32 readings and one bit per door state: 4 + 4 bytes and 45 bytes of door bits.
+    assert size == 360 * 8 + 45
+
+
+def test_concurrent_appends_to_one_hour_keep_both(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'blocks.db'}")
+    models.TelemetryBlock.__table__.create(engine)
+    first_sample, capture, upload = _rows(3, timedelta(seconds=10))
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA journal_mode=WAL"))
+        TelemetryBlocks(conn).append([first_sample])
+
+    with engine.connect() as first, engine.connect() as second:
+        first.begin()
+        TelemetryBlocks(first).append([capture])
+
+        def other_worker() -> None:
+            second.begin()
+            TelemetryBlocks(second).append([upload])
+            second.commit()
+
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        time.sleep(0.2)  # the other append is now waiting on (or, without the lock, has read) the block
+        first.commit()
+        thread.join(timeout=10)
+
+    with engine.connect() as conn:
+        millis = TelemetryBlocks(conn).arrays()["millis"]
+    assert [(ms - telemetry_blocks.sample_id(START)) // 1000 for ms in millis.tolist()] == [0, 10, 20]
+    engine.dispose()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from app import ingest  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import get_session, init_db  # noqa: E402
+from app.main import create_app  # noqa: E402
+from app.schemas import TelemetryIn  # noqa: E402
+from app.services.tasks import TelemetryService  # noqa: E402
+
+session_scope = contextmanager(get_session)
+START = datetime(2031, 3, 1, 12, 0)
+
+
+def _samples(count: int, offset: int = 0) -> list[dict]:
+    return [
+        {
+            "temperature_c": 4.0 + index % 3,
+            "humidity": 40.0,
+            "door_open": False,
+            "created_at": (START + timedelta(seconds=30 * (index + offset))).isoformat(),
+        }
+        for index in range(count)
+    ]
+
+
+def test_ingest_json_and_ndjson_with_dedupe() -> None:
+    with TestClient(create_app()) as client:
+        first = client.post("/api/v1/vending/telemetry/ingest", json=_samples(100))
+        assert first.json() == {"received": 100, "inserted": 100, "duplicates": 0}
+
+        # Overlapping upload as NDJSON, with one timestamp repeated inside the batch too.
+        lines = _samples(100, offset=50) + _samples(1, offset=149)
+        body = "\n".join(json.dumps(sample) for sample in lines) + "\n"
+        second = client.post(
+            "/api/v1/vending/telemetry/ingest", content=body, headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert second.json() == {"received": 101, "inserted": 50, "duplicates": 51}
+
+        bad = client.post("/api/v1/vending/telemetry/ingest", json=[{"temperature_c": "warm", "humidity": 1}])
+        assert bad.status_code == 422
+        locations = {tuple(error["loc"]) for error in bad.json()["detail"]}
+        assert (0, "temperature_c") in locations and (0, "created_at") in locations
+
+
+def test_oversized_upload_is_refused_before_parsing(monkeypatch) -> None:
+    def unparsed():
+        raise AssertionError("the batch should not be parsed")
+
+    monkeypatch.setattr(settings, "telemetry_ingest_max_bytes", 1_000)
+    monkeypatch.setattr(ingest, "_batch_adapter", unparsed)
+    body = json.dumps(_samples(100)).encode()
+    with TestClient(create_app()) as client:
+        declared = client.post("/api/v1/vending/telemetry/ingest", content=body)
+        # Chunked, so no Content-Length: the cap applies while reading.
+        streamed = client.post("/api/v1/vending/telemetry/ingest", content=iter([body[:600], body[600:]]))
+    assert declared.status_code == streamed.status_code == 413
+
+
+def test_sql_ingest_skips_stored_timestamps() -> None:
+    init_db()
+    samples = [TelemetryIn(**sample) for sample in _samples(20, offset=10_000)]
+    with session_scope() as session:
+        assert TelemetryService(session).ingest(samples)["inserted"] == 20
+    with session_scope() as session:
+        result = TelemetryService(session).ingest(samples[10:] + samples[:5])
+    assert result == {"received": 15, "inserted": 0, "duplicates": 15}
+
+
+def test_late_samples_do_not_reach_the_monitor(monkeypatch) -> None:
+    from app.services import monitoring
+
+    monitor = monitoring.TelemetryMonitor(door_open_alert_seconds=120, warmup_samples=1000)
+    monkeypatch.setattr(monitoring, "_monitor", monitor)
+    now = datetime(2032, 6, 1, 12, 0)
+
+    def sample(at: datetime, door_open: bool) -> dict:
+        return {"temperature_c": 9.0, "humidity": 40.0, "door_open": door_open, "created_at": at.isoformat()}
+
+    with TestClient(create_app()) as client:
+        for batch in (
+            [sample(now, True), sample(now + timedelta(seconds=30), True)],
+            [sample(now - timedelta(hours=3), True)],  # uploaded three hours late
+            [sample(now + timedelta(seconds=60), False)],
+        ):
+            assert client.post("/api/v1/vending/telemetry/ingest", json=batch).json()["inserted"] == len(batch)
+
+    state = monitor.state(now=now + timedelta(seconds=60))
+    assert state["stats"]["door_open_total_seconds"] == 60.0
+    assert monitor.seconds_above_threshold == 60.0
+    assert "door_open" not in [alert["kind"] for alert in state["active"]]
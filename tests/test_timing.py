@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+os.environ.setdefault("PIVEND_DATABASE_URL", "sqlite:///./data/test_vending.db")
+
+from starlette.concurrency import run_in_threadpool  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.timing import TimingMiddleware, current_timer, phase  # noqa: E402
+
+
+def _slow_dispense() -> None:
+    with phase("dispense"):
+        time.sleep(0.02)
+    current_timer().add_statement("SELECT *\n  FROM products", 0.001)
+
+
+async def _route(scope, receive, send) -> None:
+    with phase("lookup"):
+        pass
+    # Sync work in the threadpool still reports to the request's timer.
+    await run_in_threadpool(_slow_dispense)
+    await send({"type": "http.response.start", "status": 201, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def test_phases_reach_server_timing_and_slow_log(monkeypatch, caplog) -> None:
+    monkeypatch.setattr(settings, "slow_request_ms", 10.0)
+    middleware = TimingMiddleware(_route)
+    sent = []
+
+    async def send(message) -> None:
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/api/v1/vending/purchase", "headers": []}
+    with caplog.at_level(logging.WARNING, logger="app.slow_requests"):
+        asyncio.run(middleware(scope, None, send))
+
+    header = dict(sent[0]["headers"])[b"server-timing"].decode()
+    names = [metric.split(";")[0] for metric in header.split(", ")]
+    assert names == ["lookup", "dispense", "sql", "total"]
+    assert 'desc="1 statements"' in header
+    (record,) = caplog.records
+    entry = json.loads(record.getMessage())
+    assert entry["status"] == 201 and entry["phases"]["dispense"] >= 20
+    assert entry["sql"]["statements"] == [{"ms": 1.0, "sql": "SELECT * FROM products"}]
+    # Outside a request, phases are no-ops.
+    with phase("idle"):
+        assert current_timer() is None